@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark dashboard queries on a large pr_history table
+
+Fills a temporary database with synthetic history spread over a year and
+times the queries the dashboard runs on every refresh, next to the
+pre-index, pre-rollup versions of the same queries.
+
+Usage:
+    python benchmarks/bench_database.py [--rows 1000000] [--repeat 5]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from database import Database
+
+STATUSES = ['approved', 'approved', 'approved', 'needs_work', 'rejected', 'declined']
+
+# Queries as they were before the epoch column and indexes (full scans)
+LEGACY_QUERIES = {
+    'recent_prs(50)': "SELECT * FROM pr_history ORDER BY timestamp DESC LIMIT 50",
+    'stats(7 days)': """
+        SELECT COUNT(*), SUM(CASE WHEN status = 'approved' THEN 1 ELSE 0 END),
+               AVG(confidence_score), SUM(files_changed)
+        FROM pr_history WHERE timestamp >= datetime('now', '-7 days')
+    """,
+    'stats(all time)': """
+        SELECT COUNT(*), SUM(CASE WHEN status = 'approved' THEN 1 ELSE 0 END),
+               AVG(confidence_score), SUM(files_changed)
+        FROM pr_history WHERE timestamp >= datetime('now', '-9999 days')
+    """,
+    'daily_stats(30 days)': """
+        SELECT DATE(timestamp) as date, COUNT(*) FROM pr_history
+        WHERE timestamp >= datetime('now', '-30 days')
+        GROUP BY DATE(timestamp) ORDER BY date
+    """,
+}
+
+
+def populate(db: Database, rows: int) -> None:
+    """Insert synthetic PR history spread over the last 365 days"""
+    rng = random.Random(42)
+    now = int(time.time())
+    conn = db._connect()
+
+    def generate():
+        for i in range(rows):
+            epoch = now - rng.randrange(365 * 86400)
+            yield (i, 'PROJ', f"repo-{rng.randrange(200)}", f"PR {i}", f"user{rng.randrange(50)}",
+                   rng.choice(STATUSES), rng.randrange(40, 100), rng.randrange(1, 30),
+                   rng.randrange(500), rng.randrange(300), epoch, epoch)
+
+    with conn:
+        conn.executemany("""
+            INSERT INTO pr_history (pr_id, project_key, repo_slug, title, author, status,
+                                    confidence_score, files_changed, additions, deletions,
+                                    timestamp, ts_epoch)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime(?, 'unixepoch'), ?)
+        """, generate())
+    db.rebuild_rollups()
+    conn.execute("ANALYZE")
+
+
+def measure(fn, repeat: int) -> float:
+    """Median wall time of fn() in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000, help='History rows to generate')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per query (median is reported)')
+    parser.add_argument('--plans', action='store_true', help='Print EXPLAIN QUERY PLAN output')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / 'bench.db'))
+
+        started = time.perf_counter()
+        populate(db, args.rows)
+        print(f"Generated {args.rows:,} rows in {time.perf_counter() - started:.1f}s\n")
+
+        queries = {
+            'recent_prs(50)': lambda: db.get_recent_prs(limit=50),
+            'stats(1 day)': lambda: db.get_stats(days=1),
+            'stats(7 days)': lambda: db.get_stats(days=7),
+            'daily_stats(7 days)': lambda: db.get_daily_stats(days=7),
+            'daily_stats(30 days)': lambda: db.get_daily_stats(days=30),
+            'stats(all time)': lambda: db.get_stats(days=9999),
+            'repo_stats(30 days)': lambda: db.get_repo_stats(days=30),
+        }
+
+        conn = db._connect()
+        print(f"{'query':<24}{'current ms':>12}{'legacy ms':>12}")
+        for name, fn in queries.items():
+            current = measure(fn, args.repeat)
+            legacy_sql = LEGACY_QUERIES.get(name)
+            legacy = measure(lambda: conn.execute(legacy_sql).fetchall(), args.repeat) if legacy_sql else None
+            legacy_text = f"{legacy:>12.2f}" if legacy is not None else f"{'-':>12}"
+            print(f"{name:<24}{current:>12.2f}{legacy_text}")
+
+        if args.plans:
+            print()
+            for sql in ("SELECT * FROM pr_history ORDER BY ts_epoch DESC LIMIT 50",
+                        "SELECT COUNT(*) FROM pr_history WHERE ts_epoch >= 0",
+                        "SELECT day, COUNT(*) FROM pr_history WHERE day >= '2000-01-01' GROUP BY day"):
+                plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+                print(sql)
+                for row in plan:
+                    print(f"    {row[3]}")
+
+
+if __name__ == '__main__':
+    main()
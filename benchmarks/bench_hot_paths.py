@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the per-PR parsing and prompt building hot paths
+
+Times calculate_pr_stats, StashClient's diff/changes parsing and
+OllamaAgent's prompt summaries on synthetic diffs (the mock Stash's hunk
+generator) from 100 to 50,000 changed lines. Reports median CPU time and
+peak traced allocation per call, and compares them against a baseline
+file so optimisations and regressions are visible.
+
+CPU times depend on the machine; compare against a baseline recorded on
+the same one. Peak allocations are mostly machine independent.
+
+Usage:
+    python benchmarks/bench_hot_paths.py                       # compare with the saved baseline
+    python benchmarks/bench_hot_paths.py --save                # record a new baseline
+    python benchmarks/bench_hot_paths.py --sizes 1000 --check  # exit 1 on regressions
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).parent.parent
+
+# Add src and tests (mock Stash corpus) to path
+sys.path.insert(0, str(ROOT / 'src'))
+sys.path.insert(0, str(ROOT / 'tests'))
+
+from mock_stash_server import CorpusSpec, MockStash
+from ollama_agent import OllamaAgent
+from pr_analyzer import calculate_pr_stats
+from stash_client import StashClient
+
+DEFAULT_SIZES = [100, 1_000, 10_000, 50_000]
+LINES_PER_FILE = 250
+BASELINE = ROOT / 'benchmarks' / 'baselines' / 'hot_paths.json'
+
+
+def synthetic_payloads(lines: int, files: int) -> Dict:
+    """
+    /diff and /changes responses of one PR with about `lines` changed lines
+
+    Args:
+        lines: Changed lines in total
+        files: Number of files they are spread over
+
+    Returns:
+        Dictionary with 'diff_json' and 'changes_json'
+    """
+    spec = CorpusSpec(prs=1, projects=1, repos_per_project=1, files_median=files,
+                      lines_median=max(1, lines / files), spread=0.0, max_files=files)
+    stash = MockStash(spec)
+    key = next(iter(stash.prs))
+    return {
+        'diff_json': stash._diff(key, {}, {}, {})[1],
+        'changes_json': stash._changes(key, {}, {'limit': [str(files)]}, {})[1],
+    }
+
+
+def build_cases(agent: OllamaAgent, lines: int) -> Dict[str, Callable]:
+    """Benchmarked calls on a PR of the given size"""
+    pr = synthetic_payloads(lines, max(1, lines // LINES_PER_FILE))
+    changes = StashClient._parse_changes(pr['changes_json'])
+    pr_details = {
+        'title': 'Synthetic change', 'description': 'Benchmark input',
+        'author': {'name': 'bench'}, 'changes': changes,
+        'diff': StashClient._parse_diff(pr['diff_json']),
+    }
+    # Worst case for per-file summaries: all lines in one (generated) file
+    single = StashClient._parse_changes(synthetic_payloads(lines, 1)['changes_json'])[0]
+
+    return {
+        'parse_diff': lambda: StashClient._parse_diff(pr['diff_json']),
+        'parse_changes': lambda: StashClient._parse_changes(pr['changes_json']),
+        'calculate_pr_stats': lambda: calculate_pr_stats(pr_details),
+        'prepare_pr_summary': lambda: agent._prepare_pr_summary(pr_details),
+        'prepare_file_change_summary': lambda: agent._prepare_file_change_summary(single['path'], single['hunks']),
+    }
+
+
+def measure(fn: Callable, repeat: int, budget: float) -> Dict:
+    """
+    Median CPU time and peak allocation of fn()
+
+    Args:
+        fn: Function to call
+        repeat: Maximum timed runs
+        budget: Stop timing after this many CPU seconds (at least one run)
+
+    Returns:
+        Dictionary with cpu_ms, runs and peak_kb
+    """
+    fn()  # warm-up
+    timings: List[float] = []
+    spent = 0.0
+    while len(timings) < repeat and (not timings or spent < budget):
+        started = time.process_time()
+        fn()
+        elapsed = time.process_time() - started
+        timings.append(elapsed)
+        spent += elapsed
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        fn()
+        peak = tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+    return {'cpu_ms': round(statistics.median(timings) * 1000, 3), 'runs': len(timings),
+            'peak_kb': round(peak / 1024, 1)}
+
+
+def run(sizes: List[int], repeat: int, budget: float, only: List[str]) -> Dict[str, Dict]:
+    """Results keyed '<case>@<lines>'"""
+    agent = OllamaAgent(base_url='http://localhost:11434', model='bench')
+    results = {}
+    for lines in sizes:
+        for name, fn in build_cases(agent, lines).items():
+            if only and name not in only:
+                continue
+            results[f"{name}@{lines}"] = measure(fn, repeat, budget)
+    return results
+
+
+def print_results(results: Dict[str, Dict], baseline: Dict[str, Dict]) -> None:
+    print(f"{'case':<36}{'cpu ms':>11}{'base ms':>11}{'peak KB':>11}{'base KB':>11}{'us/line':>10}")
+    for key, result in results.items():
+        base = baseline.get(key, {})
+        lines = int(key.rsplit('@', 1)[1])
+        per_line = result['cpu_ms'] * 1000 / lines
+        base_ms = f"{base['cpu_ms']:>11.3f}" if base else f"{'-':>11}"
+        base_kb = f"{base['peak_kb']:>11.1f}" if base else f"{'-':>11}"
+        print(f"{key:<36}{result['cpu_ms']:>11.3f}{base_ms}{result['peak_kb']:>11.1f}{base_kb}{per_line:>10.2f}")
+
+
+def regressions(results: Dict[str, Dict], baseline: Dict[str, Dict],
+                cpu_tolerance: float, alloc_tolerance: float) -> List[str]:
+    """Cases slower or allocating more than the baseline allows"""
+    failed = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        # Sub-millisecond timings are mostly noise; give them an absolute floor
+        if result['cpu_ms'] > max(base['cpu_ms'] * (1 + cpu_tolerance), base['cpu_ms'] + 0.5):
+            failed.append(f"{key} cpu {base['cpu_ms']} -> {result['cpu_ms']} ms")
+        if result['peak_kb'] > max(base['peak_kb'] * (1 + alloc_tolerance), base['peak_kb'] + 4):
+            failed.append(f"{key} peak {base['peak_kb']} -> {result['peak_kb']} KB")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Changed lines per PR')
+    parser.add_argument('--case', action='append', default=[], help='Only run this case (repeatable)')
+    parser.add_argument('--repeat', type=int, default=15, help='Maximum timed runs per case')
+    parser.add_argument('--budget', type=float, default=2.0, help='CPU seconds per case')
+    parser.add_argument('--baseline', default=str(BASELINE), help='Baseline JSON path')
+    parser.add_argument('--save', action='store_true', help='Write results as the new baseline')
+    parser.add_argument('--check', action='store_true', help='Exit 1 if a case regressed')
+    parser.add_argument('--cpu-tolerance', type=float, default=0.5, help='Allowed CPU time increase (0.5 = 50%%)')
+    parser.add_argument('--alloc-tolerance', type=float, default=0.1, help='Allowed peak allocation increase')
+    args = parser.parse_args()
+
+    baseline_path = Path(args.baseline)
+    baseline = {}
+    if baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text(encoding='utf-8')).get('results', {})
+
+    results = run(args.sizes, args.repeat, args.budget, args.case)
+    print_results(results, baseline)
+
+    if args.save:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        saved = dict(baseline, **results)
+        baseline_path.write_text(json.dumps({
+            'recorded': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'machine': f"{platform.system()} {platform.machine()} ({platform.processor() or 'unknown cpu'})",
+            'results': dict(sorted(saved.items())),
+        }, indent=2) + '\n', encoding='utf-8')
+        print(f"\nBaseline written to {baseline_path}")
+        return
+
+    failed = regressions(results, baseline, args.cpu_tolerance, args.alloc_tolerance)
+    if failed:
+        print("\n❌ Regressions against the baseline:")
+        for line in failed:
+            print(f"   {line}")
+        if args.check:
+            sys.exit(1)
+    elif baseline:
+        print("\n✅ Within baseline tolerances")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput benchmark of the review pipeline
+
+Runs StashAgentApp against the mock Stash and mock Ollama servers
+(tests/mock_*_server.py) with a scenario file describing the corpus, the
+injected Stash latency/faults, the LLM latency model and re-push rounds.
+Reports PRs/hour, time-to-verdict percentiles, Stash calls and LLM tokens
+per review and peak RSS, and writes them as JSON so runs on different
+commits can be compared.
+
+Timings are in scaled wall-clock time (ollama.time_scale), so results are
+only comparable between runs of the same scenario on the same machine.
+The mocks run in-process, so peak RSS includes their (small) corpus.
+
+Usage:
+    python benchmarks/bench_pipeline.py benchmarks/scenarios/smoke.yaml
+    python benchmarks/bench_pipeline.py benchmarks/scenarios/baseline.yaml \\
+        --output new.json --compare benchmarks/results/baseline-abc1234.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).parent.parent
+
+# Add src and tests (mock servers) to path
+sys.path.insert(0, str(ROOT / 'src'))
+sys.path.insert(0, str(ROOT / 'tests'))
+
+import yaml
+
+from mock_ollama_server import MockOllamaServer, OllamaModel
+from mock_stash_server import CorpusSpec, MockStashServer, StashFaults
+
+# Compared metrics and whether higher is better
+COMPARED = {
+    'prs_per_hour': True,
+    'verdict_p50': False,
+    'verdict_p95': False,
+    'verdict_p99': False,
+    'stash_calls_per_review': False,
+    'llm_tokens_per_review': False,
+    'peak_rss_mb': False,
+}
+
+# Applied under the scenario's own config overrides
+BENCHMARK_CONFIG = {
+    'logging': {'console': False},
+    'retention': {'enabled': False},
+    'metrics': {'enabled': False},
+}
+
+
+def deep_merge(base: Dict, overrides: Dict) -> Dict:
+    """Recursively merge overrides into a copy of base"""
+    merged = dict(base)
+    for key, value in (overrides or {}).items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def percentile(values: List[float], q: float) -> float:
+    """q-th percentile (0-100) with linear interpolation"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def git_revision() -> Dict:
+    """Current commit and whether the tree has local changes"""
+    def git(*args) -> str:
+        try:
+            return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True,
+                                  timeout=30).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ''
+    return {'commit': git('rev-parse', '--short', 'HEAD') or 'unknown',
+            'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))}
+
+
+def load_scenario(path: str) -> Dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        scenario = yaml.safe_load(f) or {}
+    scenario.setdefault('name', Path(path).stem)
+    return scenario
+
+
+def build_app(config_overrides: Dict):
+    """StashAgentApp with the repo config plus benchmark and scenario overrides"""
+    from main import StashAgentApp
+
+    class BenchmarkApp(StashAgentApp):
+        def _load_config(self) -> Dict:
+            config = deep_merge(super()._load_config() or {}, BENCHMARK_CONFIG)
+            return deep_merge(config, config_overrides)
+
+    return BenchmarkApp()
+
+
+async def play(stash, scenario: Dict, cycle) -> List[float]:
+    """
+    Run review cycles until every round settles
+
+    Round 0 reviews the corpus; each re-push round pushes a new revision to
+    a fraction of the open PRs and reviews again. A round ends when all its
+    PRs have a verdict or a cycle adds none.
+
+    Args:
+        stash: MockStash state
+        scenario: Scenario dictionary
+        cycle: Coroutine function running one agent cycle
+
+    Returns:
+        Time-to-verdict of every reviewed revision, in seconds
+    """
+    repush = scenario.get('repush', {})
+    rounds = 1 + int(repush.get('rounds', 0))
+    max_cycles = int(scenario.get('max_cycles_per_round', 5))
+    rng = random.Random(scenario.get('corpus', {}).get('seed', 42))
+
+    timings = []
+    now = time.monotonic()
+    targets = list(stash.prs)
+    for key in targets:
+        stash.visible_at[key] = now
+
+    for round_index in range(rounds):
+        if round_index:
+            open_keys = [key for key, pr in stash.prs.items() if pr['state'] == 'OPEN']
+            targets = rng.sample(open_keys, round(len(open_keys) * float(repush.get('fraction', 0))))
+            for key in targets:
+                stash.push(key)
+
+        for _ in range(max_cycles):
+            before = len(stash.verdicts)
+            await cycle()
+            pending = [key for key in targets if key not in stash.verdicts]
+            if not pending or len(stash.verdicts) == before:
+                break
+
+        timings += [stash.verdicts[key][1] - stash.visible_at[key] for key in targets if key in stash.verdicts]
+    return timings
+
+
+def run_scenario(scenario: Dict, log_level: str = 'WARNING') -> Dict:
+    """
+    Run one scenario in a temporary working directory
+
+    Args:
+        scenario: Scenario dictionary
+        log_level: Agent log level (logs go to agent.log in the work dir)
+
+    Returns:
+        Results dictionary
+    """
+    spec = CorpusSpec(**scenario.get('corpus', {}))
+    faults = StashFaults(**scenario.get('stash', {}))
+    model = OllamaModel(**scenario.get('ollama', {}))
+    runtime = scenario.get('runtime', 'sync')
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, \
+            MockStashServer(spec, faults) as stash_server, MockOllamaServer(model) as ollama_server:
+        os.environ.update({
+            'STASH_URL': stash_server.url,
+            'STASH_TOKEN': 'benchmark',
+            'STASH_USERNAME': spec.username,
+            'AI_PROVIDER': 'ollama',
+            'OLLAMA_URL': ollama_server.url,
+            'OLLAMA_MODEL': model.models[0],
+            'RUNTIME': runtime,
+            'DRY_RUN': 'false',
+            'METRICS_ENABLED': 'false',
+            'LOG_LEVEL': log_level,
+            'LOG_FILE': str(Path(tmp) / 'agent.log'),
+        })
+        # Database() and relative paths land in the temporary directory
+        os.chdir(tmp)
+        try:
+            app = build_app(scenario.get('config', {}))
+            stash, ollama = stash_server.stash, ollama_server.ollama
+            stash.requests.clear()
+            ollama.requests = ollama.prompt_tokens = ollama.cached_tokens = ollama.generated_tokens = 0
+            rss_at_start = peak_rss_mb()
+
+            async def drive() -> List[float]:
+                if runtime != 'async':
+                    return await play(stash, scenario, lambda: asyncio.to_thread(app.process_pull_requests))
+                agent_runtime = app._async_runtime()
+                async with agent_runtime._session():
+                    return await play(stash, scenario, agent_runtime.process_pull_requests)
+
+            started = time.monotonic()
+            try:
+                timings = asyncio.run(drive())
+            finally:
+                wall = time.monotonic() - started
+                app._shutdown()
+        finally:
+            os.chdir(cwd)
+
+        reviews = len(timings)
+        stash_calls = sum(stash.requests.values())
+        llm_tokens = ollama.prompt_tokens + ollama.generated_tokens
+        return {
+            'reviews': reviews,
+            'unreviewed_open_prs': sum(1 for key, pr in stash.prs.items()
+                                       if pr['state'] == 'OPEN' and key not in stash.verdicts),
+            'verdicts': dict(Counter(verdict for verdict, _ in stash.verdicts.values())),
+            'wall_seconds': round(wall, 3),
+            'prs_per_hour': round(reviews / wall * 3600, 1) if wall else 0.0,
+            'verdict_p50': round(percentile(timings, 50), 3),
+            'verdict_p95': round(percentile(timings, 95), 3),
+            'verdict_p99': round(percentile(timings, 99), 3),
+            'stash_calls': stash_calls,
+            'stash_calls_by_endpoint': dict(stash.requests),
+            'stash_errors': dict(stash.errors),
+            'stash_calls_per_review': round(stash_calls / reviews, 2) if reviews else 0.0,
+            'llm_requests': ollama.requests,
+            'llm_prompt_tokens': ollama.prompt_tokens,
+            'llm_cached_prompt_tokens': ollama.cached_tokens,
+            'llm_generated_tokens': ollama.generated_tokens,
+            'llm_model_loads': ollama.loads,
+            'llm_tokens_per_review': round(llm_tokens / reviews, 1) if reviews else 0.0,
+            'rss_at_start_mb': round(rss_at_start, 1),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+        }
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Print current vs baseline results and list regressions
+
+    Args:
+        current: Results dictionary of this run
+        baseline: Results dictionary of an earlier run
+        tolerance: Allowed relative change in the bad direction (0.1 = 10%)
+
+    Returns:
+        Names of regressed metrics
+    """
+    regressions = []
+    print(f"\n{'metric':<26}{'baseline':>12}{'current':>12}{'change':>10}")
+    for metric, higher_is_better in COMPARED.items():
+        old, new = baseline.get(metric), current.get(metric)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old if old else 0.0
+        worse = -change if higher_is_better else change
+        flag = ''
+        if worse > tolerance:
+            regressions.append(metric)
+            flag = '  ❌'
+        print(f"{metric:<26}{old:>12}{new:>12}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('scenario', help='Scenario YAML (see benchmarks/scenarios)')
+    parser.add_argument('--output', help='Results JSON path (default benchmarks/results/<name>-<commit>.json)')
+    parser.add_argument('--compare', help='Earlier results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Relative change counted as a regression (default 0.10)')
+    parser.add_argument('--log-level', default='WARNING', help='Agent log level')
+    args = parser.parse_args()
+
+    scenario = load_scenario(args.scenario)
+    print(f"Scenario '{scenario['name']}': {scenario.get('description', '')}")
+
+    results = run_scenario(scenario, args.log_level)
+    revision = git_revision()
+    report = {
+        'scenario': scenario['name'],
+        'scenario_file': str(Path(args.scenario)),
+        **revision,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'spec': scenario,
+        'results': results,
+    }
+
+    print(f"\n{'reviews':<26}{results['reviews']:>12} ({results['unreviewed_open_prs']} open PR(s) unreviewed)")
+    for metric in ('wall_seconds', 'prs_per_hour', 'verdict_p50', 'verdict_p95', 'verdict_p99',
+                   'stash_calls_per_review', 'llm_tokens_per_review', 'llm_cached_prompt_tokens',
+                   'rss_at_start_mb', 'peak_rss_mb'):
+        print(f"{metric:<26}{results[metric]:>12}")
+
+    output = Path(args.output) if args.output else \
+        ROOT / 'benchmarks' / 'results' / f"{scenario['name']}-{revision['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('scenario') != scenario['name']:
+            print(f"⚠️  Comparing against scenario '{baseline.get('scenario')}'")
+        regressions = compare(results, baseline['results'], args.tolerance)
+        if regressions:
+            print(f"\n❌ Regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""
+Agent status channel - Heartbeat, live progress and control commands via the shared DB
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Commands the dashboard may send ('name' or 'name:argument')
+COMMANDS = ('stop', 'run_now', 'profile', 'profile_pr')
+
+
+class _ErrorCapture(logging.Handler):
+    """Remembers the last ERROR log record as the agent's last error"""
+
+    def __init__(self, reporter: 'StatusReporter'):
+        super().__init__(level=logging.ERROR)
+        self.reporter = reporter
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.reporter.update(last_error=f"{time.strftime('%H:%M:%S')} {record.getMessage()}"[:500])
+        except Exception:
+            pass
+
+
+class StatusReporter:
+    """
+    Publishes the agent's live status and executes dashboard commands
+
+    A heartbeat thread upserts one agent_status row per instance every
+    heartbeat_interval seconds (state, cycle, queue depth, in-flight PRs,
+    last error, model) and picks up pending agent_commands addressed to
+    this instance. The dashboard reads the row instead of forking pgrep
+    and stops the agent with a command instead of pkill.
+    """
+
+    def __init__(self, db, config: Dict, instance_id: Optional[str] = None,
+                 model: str = "", runtime: str = "sync"):
+        """
+        Initialize status reporter
+
+        Args:
+            db: Database instance
+            config: Configuration dictionary
+            instance_id: Unique name of this instance (default host-pid)
+            model: AI model in use
+            runtime: 'sync' or 'async'
+        """
+        status_config = config.get('status', {})
+        self.db = db
+        self.interval = float(status_config.get('heartbeat_interval', 5))
+        self.instance_id = instance_id or f"{socket.gethostname()}-{os.getpid()}"
+
+        self.stop_requested = threading.Event()
+        self._run_now = threading.Event()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._error_handler = _ErrorCapture(self)
+        self._handlers: Dict[str, Callable[[str, str], None]] = {}
+
+        self._status = {
+            'instance_id': self.instance_id,
+            'pid': os.getpid(),
+            'host': socket.gethostname(),
+            'state': 'starting',
+            'runtime': runtime,
+            'model': model,
+            'cycle': 0,
+            'queue_depth': 0,
+            'in_flight': {},
+            'last_cycle': None,
+            'last_error': None,
+            'started_at': time.time(),
+        }
+
+    def start(self) -> None:
+        """Start publishing heartbeats and listening for commands"""
+        if self._thread:
+            return
+        logging.getLogger().addHandler(self._error_handler)
+        self._publish()
+        self._thread = threading.Thread(target=self._heartbeat_loop, name="agent-status", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Publish the final 'stopped' state and stop the heartbeat thread"""
+        logging.getLogger().removeHandler(self._error_handler)
+        self.stop_requested.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.update(state='stopped', in_flight={})
+        self._publish()
+
+    def update(self, **fields) -> None:
+        """
+        Update status fields (published with the next heartbeat)
+
+        Args:
+            **fields: Status fields (state, cycle, queue_depth, last_cycle, last_error)
+        """
+        with self._lock:
+            self._status.update(fields)
+
+    def pr_started(self, pr: Dict) -> None:
+        """
+        Mark a PR as in flight
+
+        Args:
+            pr: Pull request dictionary
+        """
+        with self._lock:
+            self._status['in_flight'][str(pr.get('id'))] = {
+                'title': pr.get('title', ''),
+                'started_at': time.time(),
+            }
+
+    def pr_finished(self, pr: Dict) -> None:
+        """
+        Mark a PR as done
+
+        Args:
+            pr: Pull request dictionary
+        """
+        with self._lock:
+            self._status['in_flight'].pop(str(pr.get('id')), None)
+            self._status['queue_depth'] = max(0, self._status['queue_depth'] - 1)
+
+    def register_command(self, name: str, handler: Callable[[str, str], None]) -> None:
+        """
+        Handle a dashboard command outside the status channel
+
+        Args:
+            name: Command name
+            handler: Called with (name, argument) on the heartbeat thread
+        """
+        self._handlers[name] = handler
+
+    def take_run_now(self) -> bool:
+        """
+        Consume a pending 'run now' command
+
+        Returns:
+            True if a cycle should start immediately
+        """
+        if self._run_now.is_set():
+            self._run_now.clear()
+            return True
+        return False
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Sleep until timeout or until a command arrives
+
+        Args:
+            timeout: Seconds to wait
+
+        Returns:
+            True if woken by a command
+        """
+        woken = self._wakeup.wait(timeout)
+        self._wakeup.clear()
+        return woken
+
+    def snapshot(self) -> Dict:
+        """Copy of the current status"""
+        with self._lock:
+            status = dict(self._status)
+            status['in_flight'] = dict(status['in_flight'])
+            return status
+
+    def _publish(self) -> None:
+        status = self.snapshot()
+        status['heartbeat_at'] = time.time()
+        self.db.upsert_agent_status(status)
+
+    def _heartbeat_loop(self) -> None:
+        while not self.stop_requested.wait(self.interval):
+            try:
+                self._publish()
+                for command in self.db.take_agent_commands(self.instance_id):
+                    self._handle_command(command)
+            except Exception as e:
+                logger.debug(f"Status heartbeat failed: {e}")
+
+    def _handle_command(self, command: str) -> None:
+        logger.info(f"📨 Received '{command}' command from dashboard")
+        name, _, argument = command.partition(':')
+        if command == 'stop':
+            self.update(state='stopping')
+            self.stop_requested.set()
+        elif command == 'run_now':
+            self._run_now.set()
+        elif name in self._handlers:
+            self._handlers[name](name, argument)
+        else:
+            logger.warning(f"Unknown agent command: {command}")
+        self._wakeup.set()
@@ -64,41 +64,13 @@ Cevabını şu JSON formatında ver (sadece JSON, başka açıklama ekleme):
         Returns:
             Enhanced prompt with repository rules
         """
-        # Get repository specific prompts
-        repo_prompts = self.rules_manager.get_repository_prompts(repository_name)
-        repo_rules = self.rules_manager.get_repository_rules(repository_name)
-        repo_config = self.rules_manager.get_repository_config(repository_name)
+        context = self.rules_manager.get_prompt_context(repository_name, prompt_type)
         
         # If no repository specific config exists, return base prompt
-        if not repo_config:
+        if not context:
             return base_prompt
-            
-        # Build tech stack section
-        tech_stack = repo_config.get('tech_stack', {})
-        tech_stack_prompt = "\nRepository Technology Stack:\n"
-        for key, value in tech_stack.items():
-            tech_stack_prompt += f"- {key}: {value}\n"
-            
-        # Build rules section
-        rules_prompt = "\nRepository Specific Rules:\n"
-        for rule in repo_rules:
-            rules_prompt += f"- {rule}\n"
-            
-        # Get repository specific prompt for this type if exists
-        specific_prompt = repo_prompts.get(prompt_type, "")
         
-        # Combine all prompts
-        enhanced_prompt = f"""
-{base_prompt}
-
-Repository Context:
-{tech_stack_prompt}
-{rules_prompt}
-
-Repository Specific Guidelines:
-{specific_prompt}
-"""
-        return enhanced_prompt.strip()
+        return f"{base_prompt}\n\n{context}"
 
     def analyze_pr(self, pr_data: Dict, repository_name: str) -> Dict:
         """
@@ -0,0 +1,428 @@
+"""
+asyncio runtime - Review many PRs concurrently on a single event loop
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+import httpx
+
+from stash_client import StashClient, observe_stash_request
+from ollama_agent import OllamaAgent, repository_slug
+from tracing import traced
+from traffic_recorder import TRAFFIC, recorded_headers, replayed_httpx_response, response_body
+from circuit_breaker import CLOSED, CircuitOpenError
+from review_pipeline import BlockingIO, ReviewPipeline
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncStashClient:
+    """Async Stash/Bitbucket Server API client (mirrors StashClient)"""
+
+    def __init__(self, sync_client: StashClient, max_connections: int = 100, timeout: float = 30.0):
+        """
+        Initialize async Stash client
+
+        Args:
+            sync_client: Configured synchronous client (URL, auth and parsing are reused)
+            max_connections: Connection pool size
+            timeout: Request timeout in seconds
+        """
+        self.sync_client = sync_client
+        self.base_url = sync_client.base_url
+        self.username = sync_client.username
+
+        headers = {'Content-Type': 'application/json'}
+        auth = None
+        if sync_client.token:
+            headers['Authorization'] = f'Bearer {sync_client.token}'
+        else:
+            auth = (sync_client.username, sync_client.password)
+
+        self.client = httpx.AsyncClient(
+            base_url=f"{self.base_url}/rest/api/1.0",
+            headers=headers,
+            auth=auth,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections)
+        )
+
+    async def aclose(self) -> None:
+        """Close the connection pool"""
+        await self.client.aclose()
+
+    async def _make_request(self, method: str, endpoint: str, **kwargs) -> httpx.Response:
+        """Make HTTP request to Stash API (shares the sync client's throttle)"""
+
+        async def attempt() -> httpx.Response:
+            started = time.monotonic()
+            status = 'error'
+            try:
+                if TRAFFIC.replaying:
+                    entry = TRAFFIC.lookup('stash', method, endpoint, kwargs.get('params'))
+                    await asyncio.sleep(TRAFFIC.replay_delay(entry))
+                    response = replayed_httpx_response(entry, method, f"{self.base_url}/rest/api/1.0{endpoint}")
+                else:
+                    response = await self.client.request(method, endpoint, **kwargs)
+                    TRAFFIC.record('stash', method, endpoint, kwargs.get('params'), kwargs.get('json'),
+                                   response.status_code, response_body(response), time.monotonic() - started,
+                                   headers=recorded_headers(response.headers))
+                status = str(response.status_code)
+                return response
+            finally:
+                observe_stash_request(method, endpoint, started, status)
+
+        try:
+            response = await self.sync_client.throttle.send_async(method, attempt, errors=(httpx.TransportError,))
+            response.raise_for_status()
+            return response
+        except httpx.HTTPError as e:
+            logger.error(f"Request failed: {e}")
+            raise
+
+    @staticmethod
+    def _pr_endpoint(project_key: str, repo_slug: str, pr_id: int) -> str:
+        return f"/projects/{project_key}/repos/{repo_slug}/pull-requests/{pr_id}"
+
+    async def get_assigned_pull_requests(self) -> List[Dict]:
+        """Get pull requests assigned to the current user as reviewer"""
+        params = {'role': 'REVIEWER', 'state': 'OPEN', 'limit': 100, 'start': 0}
+        try:
+            response = await self._make_request('GET', '/inbox/pull-requests', params=params)
+            pull_requests = response.json().get('values', [])
+            logger.info(f"Found {len(pull_requests)} assigned pull requests (inbox API)")
+            return pull_requests
+        except Exception as e:
+            logger.debug(f"Inbox API failed, falling back to project scan: {e}")
+            return await asyncio.to_thread(self.sync_client.get_assigned_pull_requests)
+
+    @traced('stash.get_pull_request_details')
+    async def get_pull_request_details(self, project_key: str, repo_slug: str, pr_id: int) -> Optional[Dict]:
+        """Get detailed information about a pull request"""
+        try:
+            response = await self._make_request('GET', self._pr_endpoint(project_key, repo_slug, pr_id))
+            return response.json()
+        except Exception as e:
+            logger.error(f"Failed to fetch PR details: {e}")
+            return None
+
+    @traced('stash.get_pull_request_changes')
+    async def get_pull_request_changes(self, project_key: str, repo_slug: str, pr_id: int) -> List[Dict]:
+        """Get detailed file changes for a pull request"""
+        try:
+            endpoint = self._pr_endpoint(project_key, repo_slug, pr_id) + "/changes"
+            response = await self._make_request('GET', endpoint, params={'limit': 1000})
+            changes = StashClient._parse_changes(response.json())
+            logger.info(f"Retrieved {len(changes)} file changes for PR #{pr_id}")
+            return changes
+        except Exception as e:
+            logger.error(f"Failed to get PR changes: {e}")
+            return []
+
+    @traced('stash.get_pull_request_diff')
+    async def get_pull_request_diff(self, project_key: str, repo_slug: str, pr_id: int) -> str:
+        """Get diff of a pull request"""
+        try:
+            endpoint = self._pr_endpoint(project_key, repo_slug, pr_id) + "/diff"
+            response = await self._make_request('GET', endpoint, params={'contextLines': 3})
+            return StashClient._parse_diff(response.json())
+        except Exception as e:
+            logger.error(f"Failed to fetch PR diff: {e}")
+            return ""
+
+    @traced('stash.get_pull_request_activities')
+    async def get_pull_request_activities(self, project_key: str, repo_slug: str, pr_id: int) -> List[Dict]:
+        """Get activities (comments, approvals, etc.) for a pull request"""
+        try:
+            endpoint = self._pr_endpoint(project_key, repo_slug, pr_id) + "/activities"
+            response = await self._make_request('GET', endpoint, params={'limit': 100})
+            return response.json().get('values', [])
+        except Exception as e:
+            logger.error(f"Failed to fetch PR activities: {e}")
+            return []
+
+    @traced('stash.check_my_approval_status')
+    async def check_my_approval_status(self, project_key: str, repo_slug: str, pr_id: int) -> Optional[str]:
+        """Check if current user has already approved the PR"""
+        try:
+            response = await self._make_request('GET', self._pr_endpoint(project_key, repo_slug, pr_id))
+            return self.sync_client._find_my_status(response.json())
+        except Exception as e:
+            logger.error(f"Failed to check approval status: {e}")
+            return await asyncio.to_thread(
+                self.sync_client.check_my_approval_status, project_key, repo_slug, pr_id
+            )
+
+    @traced('stash.approve_pull_request')
+    async def approve_pull_request(self, project_key: str, repo_slug: str, pr_id: int) -> bool:
+        """Approve a pull request"""
+        try:
+            endpoint = self._pr_endpoint(project_key, repo_slug, pr_id) + "/approve"
+            await self._make_request('POST', endpoint)
+            logger.info(f"Successfully approved PR #{pr_id} in {project_key}/{repo_slug}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to approve PR: {e}")
+            return False
+
+    @traced('stash.add_comment_to_pull_request')
+    async def add_comment_to_pull_request(self, project_key: str, repo_slug: str,
+                                          pr_id: int, comment_text: str) -> bool:
+        """Add a general comment to a pull request"""
+        try:
+            endpoint = self._pr_endpoint(project_key, repo_slug, pr_id) + "/comments"
+            await self._make_request('POST', endpoint, json={'text': comment_text})
+            logger.info(f"Successfully added comment to PR #{pr_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to add comment: {e}")
+            return False
+
+    @traced('stash.add_inline_comment')
+    async def add_inline_comment(self, project_key: str, repo_slug: str, pr_id: int,
+                                 file_path: str, line_number: int, comment_text: str,
+                                 line_type: str = "ADDED") -> bool:
+        """Add an inline comment to a specific line in a file"""
+        try:
+            endpoint = self._pr_endpoint(project_key, repo_slug, pr_id) + "/comments"
+            payload = {
+                'text': comment_text,
+                'anchor': {
+                    'path': file_path,
+                    'line': line_number,
+                    'lineType': line_type,
+                    'fileType': 'TO'
+                }
+            }
+            await self._make_request('POST', endpoint, json=payload)
+            logger.info(f"Successfully added inline comment to {file_path}:{line_number}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to add inline comment: {e}")
+            return False
+
+    @traced('stash.decline_pull_request')
+    async def decline_pull_request(self, project_key: str, repo_slug: str,
+                                   pr_id: int, version: int) -> bool:
+        """Decline/reject a pull request"""
+        try:
+            endpoint = self._pr_endpoint(project_key, repo_slug, pr_id) + "/decline"
+            await self._make_request('POST', endpoint, json={'version': version})
+            logger.info(f"Successfully declined PR #{pr_id} in {project_key}/{repo_slug}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to decline PR: {e}")
+            return False
+
+    @traced('stash.mark_needs_work')
+    async def mark_needs_work(self, project_key: str, repo_slug: str, pr_id: int) -> bool:
+        """Mark pull request as "Needs Work" """
+        try:
+            endpoint = self._pr_endpoint(project_key, repo_slug, pr_id) + f"/participants/{self.username}"
+            payload = {'user': {'name': self.username}, 'status': 'NEEDS_WORK'}
+            await self._make_request('PUT', endpoint, json=payload)
+            logger.info(f"Successfully marked PR #{pr_id} as NEEDS_WORK in {project_key}/{repo_slug}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to mark PR as needs work: {e}")
+            return False
+
+
+class AsyncOllamaAgent:
+    """Async wrapper around OllamaAgent's chat calls"""
+
+    def __init__(self, agent: OllamaAgent, concurrency: int = 1):
+        """
+        Initialize async Ollama agent
+
+        Args:
+            agent: Configured OllamaAgent (prompts and parsing are reused)
+            concurrency: Max concurrent chat requests (match OLLAMA_NUM_PARALLEL)
+        """
+        self.agent = agent
+        self.model = agent.model
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.client = httpx.AsyncClient(base_url=agent.base_url)
+
+    async def aclose(self) -> None:
+        """Close the connection pool"""
+        await self.client.aclose()
+
+    async def _chat(self, body: Dict, timeout: float, call: str, context: str = '') -> Optional[Dict]:
+        """Post a chat request, bounded by the concurrency limit and the circuit breaker"""
+        breaker = self.agent.breaker
+        async with self._semaphore:
+            if breaker.state != CLOSED:
+                # May run the (blocking) health probe
+                await asyncio.to_thread(breaker.check)
+            started = time.monotonic()
+            try:
+                if TRAFFIC.replaying:
+                    entry = TRAFFIC.lookup('ollama', 'POST', '/api/chat', context=context)
+                    await asyncio.sleep(TRAFFIC.replay_delay(entry))
+                    response = replayed_httpx_response(entry, 'POST', f"{self.agent.base_url}/api/chat")
+                else:
+                    response = await self.client.post("/api/chat", json=body, timeout=timeout)
+                    TRAFFIC.record('ollama', 'POST', '/api/chat', None, body, response.status_code,
+                                   response_body(response), time.monotonic() - started, context=context)
+            except httpx.TimeoutException:
+                self.agent.observe_chat(call, started, 'timeout')
+                breaker.record_failure()
+                raise
+            except Exception:
+                self.agent.observe_chat(call, started, 'error')
+                breaker.record_failure()
+                raise
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        if response.status_code != 200:
+            self.agent.observe_chat(call, started, 'error')
+            logger.error(f"Ollama API returned status {response.status_code}: {response.text}")
+            return None
+        response_data = response.json()
+        self.agent.observe_chat(call, started, 'ok', response_data)
+        return response_data
+
+    @traced('ollama.analyze_pull_request')
+    async def analyze_pull_request(self, pr_info: Dict) -> Optional[Dict]:
+        """Analyze a pull request using Ollama"""
+        logger.info(f"Analyzing PR #{pr_info.get('id')} with Ollama ({self.model})...")
+        pr_summary = self.agent._prepare_pr_summary(pr_info)
+        system_prompt = self.agent.system_prompt_for(repository_slug(pr_info), 'pr_analysis')
+        body = self.agent._build_chat_request(system_prompt, pr_summary, num_predict=2000)
+
+        try:
+            response_data = await self._chat(body, timeout=60, call='analysis')
+            if response_data is None:
+                logger.warning("⚠️  Ollama API hatası - AI analizi başarısız")
+                return None
+            return self.agent._parse_analysis_response(response_data)
+        except httpx.TimeoutException:
+            logger.error("Ollama request timed out after 60 seconds")
+            return None
+        except CircuitOpenError:
+            logger.warning("🔌 Ollama devre dışı (circuit open) - AI analizi atlanıyor")
+            return None
+        except Exception as e:
+            logger.error(f"Ollama analysis failed: {e}")
+            return None
+
+    @traced('ollama.analyze_file_changes')
+    async def analyze_file_changes(self, file_path: str, file_changes: List[Dict],
+                                   repository: str = '') -> Optional[Dict]:
+        """Analyze file changes and generate inline comment suggestions"""
+        change_summary = self.agent._prepare_file_change_summary(file_path, file_changes)
+        if not change_summary or len(change_summary) < 50:
+            return {'comments': []}
+
+        system_prompt = self.agent.system_prompt_for(repository, 'code_review')
+        body = self.agent._build_chat_request(system_prompt, change_summary, num_predict=1500)
+        try:
+            response_data = await self._chat(body, timeout=45, call='file_review', context=file_path)
+            if response_data is None:
+                return None
+            return self.agent._parse_file_review_response(file_path, response_data)
+        except CircuitOpenError:
+            return None
+        except Exception as e:
+            logger.error(f"Failed to analyze file changes: {e}")
+            return None
+
+
+class AsyncAgentRuntime:
+    """
+    Runs StashAgentApp review cycles on an asyncio event loop
+
+    Each PR goes through the same ReviewPipeline as the sync runtime, with
+    the async clients as its I/O and blocking database calls in threads.
+    """
+
+    def __init__(self, app):
+        """
+        Initialize async runtime
+
+        Args:
+            app: Configured StashAgentApp (config, analyzer, scheduler, db are shared)
+        """
+        self.app = app
+        runtime_config = app.config.get('async_runtime', {})
+        self.max_concurrent_prs = int(runtime_config.get('max_concurrent_prs', 50))
+        self.llm_concurrency = int(os.getenv('OLLAMA_NUM_PARALLEL',
+                                             runtime_config.get('llm_concurrency', 1)))
+        self.max_connections = int(runtime_config.get('max_connections', 100))
+
+        self.stash: Optional[AsyncStashClient] = None
+        self.llm: Optional[AsyncOllamaAgent] = None
+        self.pipeline: Optional[ReviewPipeline] = None
+
+    @asynccontextmanager
+    async def _session(self):
+        """Create the async clients for the lifetime of the event loop"""
+        self.stash = AsyncStashClient(self.app.stash_client, max_connections=self.max_connections)
+        if isinstance(self.app.ai_agent, OllamaAgent):
+            self.llm = AsyncOllamaAgent(self.app.ai_agent, concurrency=self.llm_concurrency)
+        # Other providers have no async client: their blocking calls run in threads
+        llm = self.llm or BlockingIO(self.app.ai_agent, offload=True)
+        self.pipeline = ReviewPipeline(self.app, self.stash, llm, offload=True)
+        try:
+            yield
+        finally:
+            await self.stash.aclose()
+            if self.llm:
+                await self.llm.aclose()
+
+    async def run_once(self) -> None:
+        """Run a single review cycle"""
+        async with self._session():
+            await self.process_pull_requests()
+
+    async def run_forever(self) -> None:
+        """Run review cycles every check_interval seconds"""
+        status = self.app.status
+        async with self._session():
+            while not status.stop_requested.is_set():
+                started = time.monotonic()
+                await self.process_pull_requests()
+                # Sleep until the next cycle, waking early on dashboard commands
+                while not status.stop_requested.is_set() and not status.take_run_now():
+                    remaining = self.app.check_interval - (time.monotonic() - started)
+                    if remaining <= 0:
+                        break
+                    await asyncio.to_thread(status.wait, min(remaining, 1.0))
+            logger.info("Stop requested from dashboard, shutting down...")
+
+    async def process_pull_requests(self) -> None:
+        """Fetch assigned PRs and process them concurrently"""
+        status = self.app.status
+        status.update(state='processing')
+        try:
+            logger.info("-" * 60)
+            logger.info("Checking for assigned pull requests...")
+
+            pull_requests = await self.stash.get_assigned_pull_requests()
+            if not pull_requests:
+                logger.info("No assigned pull requests found")
+                return
+
+            pull_requests = self.app.sharding.filter(pull_requests)
+            logger.info(f"Processing {len(pull_requests)} pull request(s) "
+                        f"(up to {self.max_concurrent_prs} concurrently)...")
+            status.update(queue_depth=len(pull_requests))
+            pull_requests = self.app.scheduler.order(pull_requests)
+
+            summary = await self.app.cycle_runner.run_cycle_async(
+                pull_requests, self.pipeline.run, self.max_concurrent_prs
+            )
+            status.update(last_cycle=summary)
+        except Exception as e:
+            logger.error(f"Error processing pull requests: {e}", exc_info=True)
+        finally:
+            await asyncio.to_thread(self.app.retention.run_if_due)
+            status.update(state='idle', cycle=self.app.cycle_runner.cycles, queue_depth=0)
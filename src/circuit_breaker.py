@@ -0,0 +1,161 @@
+"""
+Circuit breaker - Fail fast while the LLM backend is down
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+CIRCUIT_STATE = REGISTRY.gauge('llm_circuit_state', 'LLM circuit breaker state (0 closed, 1 half-open, 2 open)')
+CIRCUIT_REJECTIONS = REGISTRY.counter('llm_circuit_rejections_total', 'LLM calls failed fast by the open circuit')
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend whose circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+
+    closed -> open after failure_threshold failures in a row. While open,
+    calls fail immediately. After reset_timeout the next caller runs the
+    probe (a cheap health check) in half-open state: success closes the
+    circuit, failure reopens it with the timeout doubled up to
+    max_reset_timeout. Other callers keep failing fast during the probe.
+    """
+
+    def __init__(self, name: str = 'llm', failure_threshold: int = 3, reset_timeout: float = 30.0,
+                 max_reset_timeout: float = 300.0, probe: Optional[Callable[[], bool]] = None,
+                 enabled: bool = True):
+        """
+        Initialize breaker
+
+        Args:
+            name: Backend name for logs
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds open before the first probe
+            max_reset_timeout: Longest wait between probes
+            probe: Health check returning True if the backend is back (none = let one call through)
+            enabled: False never opens the circuit
+        """
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max(reset_timeout, max_reset_timeout)
+        self.probe = probe
+        self.enabled = enabled
+        self.state = CLOSED
+        self.failures = 0
+        self.listeners: List[Callable[[str], None]] = []
+        self._timeout = reset_timeout
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def configure(self, config: Dict) -> None:
+        """
+        Read the 'ai.circuit_breaker' config section
+
+        Args:
+            config: Configuration dictionary
+        """
+        breaker = config.get('ai', {}).get('circuit_breaker', {})
+        self.enabled = breaker.get('enabled', True)
+        self.failure_threshold = max(1, int(breaker.get('failure_threshold', 3)))
+        self.reset_timeout = float(breaker.get('reset_timeout', 30))
+        self.max_reset_timeout = max(self.reset_timeout, float(breaker.get('max_reset_timeout', 300)))
+        self._timeout = self.reset_timeout
+
+    def _set_state(self, state: str) -> None:
+        """Change state (caller holds the lock)"""
+        if state == self.state:
+            return
+        self.state = state
+        CIRCUIT_STATE.set(_STATE_VALUES[state])
+        for listener in self.listeners:
+            try:
+                listener(state)
+            except Exception as e:
+                logger.debug(f"Circuit listener failed: {e}")
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go to the backend now (may run the probe)
+
+        Returns:
+            False while the circuit is open
+        """
+        if not self.enabled:
+            return True
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN or time.monotonic() - self._opened_at < self._timeout:
+                CIRCUIT_REJECTIONS.inc()
+                return False
+            self._set_state(HALF_OPEN)
+
+        if self.probe is None:
+            # The call itself is the probe
+            return True
+        try:
+            healthy = self.probe()
+        except Exception as e:
+            logger.debug(f"{self.name} probe failed: {e}")
+            healthy = False
+        if healthy:
+            self.record_success()
+            return True
+        self.record_failure()
+        CIRCUIT_REJECTIONS.inc()
+        return False
+
+    def check(self) -> None:
+        """
+        Raise CircuitOpenError unless a call may go through
+
+        Raises:
+            CircuitOpenError: The circuit is open
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            if self.state != CLOSED:
+                logger.info(f"✅ {self.name} is back - circuit closed")
+                self._timeout = self.reset_timeout
+                self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                self._timeout = min(self.max_reset_timeout, self._timeout * 2)
+                self._open()
+            elif self.state == CLOSED and self.enabled and self.failures >= self.failure_threshold:
+                self._open()
+
+    def trip(self) -> None:
+        """Open the circuit now (e.g. the backend was unreachable at startup)"""
+        with self._lock:
+            if self.enabled and self.state != OPEN:
+                self._open()
+
+    def _open(self) -> None:
+        self._opened_at = time.monotonic()
+        self._set_state(OPEN)
+        logger.warning(f"🔌 {self.name} circuit open after {self.failures} failure(s) - "
+                       f"failing fast, next probe in {self._timeout:.0f}s")
@@ -0,0 +1,393 @@
+"""
+Cycle Scheduler - Time-boxed review cycles with per-PR deadlines
+"""
+
+import time
+import asyncio
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from metrics import REGISTRY
+from pr_scheduler import pr_key
+
+logger = logging.getLogger(__name__)
+
+# [monotonic deadline] of the PR being processed in the current context; a
+# list so that expiring it early is seen by every copy of the context
+_DEADLINE: ContextVar[Optional[List[float]]] = ContextVar('pr_deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised by check_deadline once the current PR's deadline has passed"""
+
+
+@contextmanager
+def pr_deadline(seconds: float):
+    """
+    Set the deadline checked by check_deadline for the enclosed work
+
+    The deadline is a context variable, so it follows the PR into
+    asyncio.run, tasks and asyncio.to_thread calls.
+
+    Args:
+        seconds: Seconds from now
+    """
+    token = _DEADLINE.set([time.monotonic() + seconds])
+    try:
+        yield
+    finally:
+        _DEADLINE.reset(token)
+
+
+def check_deadline(step: str) -> None:
+    """
+    Stop the current PR if its deadline has passed
+
+    Called between job stages and before every Stash write, so a
+    preempted PR never comments on or approves a PR it no longer owns.
+
+    Args:
+        step: What was about to happen (for the log)
+
+    Raises:
+        DeadlineExceeded: If the deadline has passed
+    """
+    deadline_timeout(None, step)
+
+
+def deadline_timeout(timeout: Optional[float], step: str) -> Optional[float]:
+    """
+    Cap a blocking call's timeout at the time left before the current PR's deadline
+
+    Args:
+        timeout: Timeout the call would use (None for no limit)
+        step: What is about to happen (for the log)
+
+    Returns:
+        The smaller of timeout and the time left (timeout outside a PR)
+
+    Raises:
+        DeadlineExceeded: If the deadline has passed
+    """
+    deadline = _DEADLINE.get()
+    if deadline is None:
+        return timeout
+    left = deadline[0] - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded(f"deadline passed before {step}")
+    return left if timeout is None else min(timeout, left)
+
+
+def check_wait(seconds: float, step: str) -> None:
+    """
+    Stop the current PR now rather than wait past its deadline
+
+    The deadline is expired on the spot, so the PR's later checkpoints
+    stop it too even if the caller swallows the exception.
+
+    Args:
+        seconds: Seconds the caller is about to sleep
+        step: What the caller is waiting for (for the log)
+
+    Raises:
+        DeadlineExceeded: If the wait would outlast the deadline
+    """
+    deadline = _DEADLINE.get()
+    left = deadline_timeout(None, step)
+    if left is not None and seconds >= left:
+        deadline[0] = time.monotonic()
+        raise DeadlineExceeded(f"{step} ({seconds:.1f}s) would outlast the deadline")
+
+
+class CycleRunner:
+    """
+    Runs one review cycle within a wall-clock budget
+
+    PRs run one after another on the calling thread (reusing its database
+    connection) under a cooperative deadline: the review pipeline calls
+    check_deadline between job stages, before every Stash write and before
+    every LLM call, and stops with DeadlineExceeded once the PR's deadline
+    (or the remaining cycle budget) has passed. Stash requests are capped
+    at the time left; an LLM call already in flight is not, so a PR can
+    overrun by at most one LLM timeout. PRs that did not finish are
+    carried over to the front of the next cycle.
+    """
+
+    def __init__(self, config: Dict, check_interval: int):
+        """
+        Initialize cycle runner
+
+        Args:
+            config: Configuration dictionary
+            check_interval: Seconds between cycles (default budget source)
+        """
+        scheduling = config.get('scheduling', {})
+        self.cycle_budget = float(scheduling.get('cycle_budget', check_interval * 0.9))
+        self.pr_deadline = float(scheduling.get('pr_deadline', 600))
+        self.max_attempts = int(scheduling.get('max_pr_attempts', 3))
+
+        # PR key -> {'pr', 'attempts', 'first_seen', 'reason'}, in carry-over order
+        self.carry_over: Dict[Tuple[str, str, int], Dict] = {}
+        # PR key -> updatedDate of PRs that used up all attempts
+        self._given_up: Dict[Tuple[str, str, int], int] = {}
+
+        self.cycle_histogram = REGISTRY.histogram('cycle_duration_seconds', 'Review cycle wall time')
+        self.pr_histogram = REGISTRY.histogram('pr_duration_seconds', 'Single PR processing wall time')
+        self.cycles = 0
+
+    def run_cycle(self, pull_requests: List[Dict], process_fn: Callable[[Dict], None]) -> Dict:
+        """
+        Process pull requests until done or the cycle budget is spent
+
+        Args:
+            pull_requests: PRs in scheduled order
+            process_fn: Function processing a single PR
+
+        Returns:
+            Cycle summary dictionary
+        """
+        started = time.monotonic()
+        self.cycles += 1
+
+        queue = self._build_queue(pull_requests)
+        processed = 0
+        timed_out = 0
+        skipped = 0
+
+        for index, pr in enumerate(queue):
+            key = pr_key(pr)
+
+            if self._should_skip(pr):
+                skipped += 1
+                continue
+
+            remaining = self.cycle_budget - (time.monotonic() - started)
+            if remaining <= 0:
+                left = queue[index:]
+                logger.warning(f"⏱️  Cycle budget ({self.cycle_budget:.0f}s) exhausted - "
+                               f"carrying over {len(left)} PR(s)")
+                for pending in left:
+                    self._carry(pending, 'cycle budget exhausted', attempted=False)
+                break
+
+            timeout = min(self.pr_deadline, remaining)
+            pr_started = time.monotonic()
+            finished = self._run_with_deadline(process_fn, pr, timeout)
+            self.pr_histogram.observe(time.monotonic() - pr_started)
+
+            if finished:
+                processed += 1
+                self.carry_over.pop(key, None)
+            else:
+                timed_out += 1
+                logger.error(f"⏱️  PR #{pr.get('id')} exceeded its deadline ({timeout:.0f}s), stopped")
+                self._carry(pr, 'deadline exceeded', attempted=True)
+
+        return self._finish_cycle(started, processed, timed_out, skipped)
+
+    async def run_cycle_async(self, pull_requests: List[Dict],
+                              process_coro: Callable[[Dict], Awaitable[None]],
+                              concurrency: int) -> Dict:
+        """
+        Process pull requests concurrently within the cycle budget
+
+        PRs stop at the same checkpoints as in run_cycle and are
+        additionally cancelled at their deadline.
+
+        Args:
+            pull_requests: PRs in scheduled order
+            process_coro: Coroutine function processing a single PR
+            concurrency: Maximum PRs in flight at once
+
+        Returns:
+            Cycle summary dictionary
+        """
+        started = time.monotonic()
+        self.cycles += 1
+
+        queue = self._build_queue(pull_requests)
+        runnable = [pr for pr in queue if not self._should_skip(pr)]
+        skipped = len(queue) - len(runnable)
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        begun = set()
+        finished = {}
+
+        async def run_one(pr: Dict) -> None:
+            key = pr_key(pr)
+            async with semaphore:
+                pr_started = time.monotonic()
+                remaining = self.cycle_budget - (pr_started - started)
+                if remaining <= 0:
+                    # Budget ran out while waiting for a slot: carried over, not an attempt
+                    return
+                begun.add(key)
+                timeout = min(self.pr_deadline, remaining)
+                try:
+                    with pr_deadline(timeout):
+                        await asyncio.wait_for(process_coro(pr), timeout)
+                    finished[key] = True
+                except (asyncio.TimeoutError, DeadlineExceeded):
+                    finished[key] = False
+                except Exception as e:
+                    logger.error(f"Error processing PR #{pr.get('id')}: {e}", exc_info=True)
+                    finished[key] = True
+                finally:
+                    self.pr_histogram.observe(time.monotonic() - pr_started)
+
+        tasks = [asyncio.create_task(run_one(pr)) for pr in runnable]
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=self.cycle_budget)
+            if pending:
+                logger.warning(f"⏱️  Cycle budget ({self.cycle_budget:.0f}s) exhausted - "
+                               f"cancelling {len(pending)} PR(s)")
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        processed = 0
+        timed_out = 0
+        for pr in runnable:
+            key = pr_key(pr)
+            if finished.get(key):
+                processed += 1
+                self.carry_over.pop(key, None)
+            elif key in finished:
+                timed_out += 1
+                logger.error(f"⏱️  PR #{pr.get('id')} exceeded its deadline "
+                             f"({self.pr_deadline:.0f}s), stopped")
+                self._carry(pr, 'deadline exceeded', attempted=True)
+            else:
+                self._carry(pr, 'cycle budget exhausted', attempted=key in begun)
+
+        return self._finish_cycle(started, processed, timed_out, skipped)
+
+    def _should_skip(self, pr: Dict) -> bool:
+        """
+        Check whether a PR must sit out this cycle
+
+        Args:
+            pr: Pull request dictionary
+
+        Returns:
+            True if the PR was given up on and has not changed since
+        """
+        key = pr_key(pr)
+
+        if key in self._given_up:
+            if self._given_up[key] == pr.get('updatedDate'):
+                return True
+            # PR was updated since we gave up, try again
+            del self._given_up[key]
+
+        return False
+
+    def _finish_cycle(self, started: float, processed: int, timed_out: int, skipped: int) -> Dict:
+        """
+        Record cycle timing and build the cycle summary
+
+        Args:
+            started: Monotonic start time of the cycle
+            processed: PRs finished
+            timed_out: PRs preempted at their deadline
+            skipped: PRs skipped this cycle
+
+        Returns:
+            Cycle summary dictionary
+        """
+        duration = time.monotonic() - started
+        self.cycle_histogram.observe(duration)
+
+        summary = {
+            'cycle': self.cycles,
+            'duration': duration,
+            'processed': processed,
+            'timed_out': timed_out,
+            'skipped': skipped,
+            'carried_over': len(self.carry_over),
+        }
+        logger.info(f"🔁 Cycle #{self.cycles} finished in {duration:.1f}s: "
+                    f"{processed} processed, {timed_out} timed out, "
+                    f"{len(self.carry_over)} carried over")
+        logger.info(f"   {self.cycle_histogram.summary()} | {self.pr_histogram.summary()}")
+        return summary
+
+    def _build_queue(self, pull_requests: List[Dict]) -> List[Dict]:
+        """
+        Put carried-over PRs first, refreshing their payload from the inbox
+
+        Args:
+            pull_requests: PRs in scheduled order
+
+        Returns:
+            Processing queue
+        """
+        current = {pr_key(pr): pr for pr in pull_requests}
+
+        for key in list(self._given_up):
+            if key not in current:
+                del self._given_up[key]
+
+        # Drop carry-over entries that left the inbox (merged, declined, unassigned)
+        for key in list(self.carry_over):
+            if key not in current:
+                del self.carry_over[key]
+
+        queue = []
+        for key, state in self.carry_over.items():
+            state['pr'] = current[key]
+            queue.append(current[key])
+
+        queue.extend(pr for key, pr in current.items() if key not in self.carry_over)
+        return queue
+
+    def _carry(self, pr: Dict, reason: str, attempted: bool) -> None:
+        """
+        Carry a PR over to the next cycle, preserving its state
+
+        Args:
+            pr: Pull request dictionary
+            reason: Why it did not finish
+            attempted: Whether processing was started (counts as an attempt)
+        """
+        key = pr_key(pr)
+        state = self.carry_over.setdefault(key, {
+            'pr': pr,
+            'attempts': 0,
+            'first_seen': time.time(),
+            'reason': reason,
+        })
+        state['reason'] = reason
+        if attempted:
+            state['attempts'] += 1
+
+        if state['attempts'] >= self.max_attempts:
+            logger.error(f"❌ PR #{pr.get('id')} failed {state['attempts']} attempt(s), "
+                         f"giving up until it changes")
+            self._given_up[key] = pr.get('updatedDate')
+            del self.carry_over[key]
+
+    def _run_with_deadline(self, process_fn: Callable[[Dict], None], pr: Dict,
+                           timeout: float) -> bool:
+        """
+        Run process_fn(pr) with a cooperative deadline
+
+        Args:
+            process_fn: Function processing a single PR
+            pr: Pull request dictionary
+            timeout: Seconds until the PR's checkpoints stop it
+
+        Returns:
+            True if the PR finished (or failed) before its deadline
+        """
+        try:
+            with pr_deadline(timeout):
+                process_fn(pr)
+        except DeadlineExceeded as e:
+            logger.warning(f"⏱️  PR #{pr.get('id')}: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"Error processing PR #{pr.get('id')}: {e}", exc_info=True)
+        return True
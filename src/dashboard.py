@@ -20,6 +20,8 @@ import logging
 sys.path.insert(0, str(Path(__file__).parent))
 
 from database import Database
+from dashboard_data import DashboardData
+from log_tail import LogFollower
 from logger import setup_logger
 
 # Page config
@@ -30,8 +32,19 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Initialize database
-db = Database()
+# Initialize database and cached data layer (one per server process, reused across reruns)
+@st.cache_resource
+def get_database() -> Database:
+    return Database()
+
+
+@st.cache_resource
+def get_dashboard_data() -> DashboardData:
+    return DashboardData(get_database())
+
+
+db = get_database()
+data = get_dashboard_data()
 
 # Custom CSS
 st.markdown("""
@@ -65,12 +78,8 @@ st.markdown("""
 
 
 def load_config():
-    """Load configuration from YAML"""
-    config_path = Path(__file__).parent.parent / 'config' / 'config.yaml'
-    if config_path.exists():
-        with open(config_path, 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f)
-    return {}
+    """Load configuration from YAML (re-read only when the file changes)"""
+    return data.load_yaml(Path(__file__).parent.parent / 'config' / 'config.yaml')
 
 
 def save_config(config):
@@ -80,17 +89,29 @@ def save_config(config):
         yaml.dump(config, f, default_flow_style=False, allow_unicode=True)
 
 
+def get_live_agents():
+    """Agent instances with a fresh heartbeat (one cached DB query, no subprocess)"""
+    interval = float(load_config().get('status', {}).get('heartbeat_interval', 5))
+    statuses = data.cached('agent_status', db.get_agent_statuses, max_age=2, track_db=False)
+    now = time.time()
+    return [
+        status for status in statuses
+        if status.get('state') != 'stopped' and now - status.get('heartbeat_at', 0) < interval * 3
+    ]
+
+
 def check_agent_status():
     """Check if agent is running"""
-    try:
-        result = subprocess.run(
-            ["pgrep", "-f", "src/main.py"],
-            capture_output=True,
-            text=True
-        )
-        return bool(result.stdout.strip())
-    except:
-        return False
+    return bool(get_live_agents())
+
+
+def send_agent_command(command):
+    """Send a control command to every live agent instance"""
+    agents = get_live_agents()
+    for agent in agents:
+        db.add_agent_command(agent['instance_id'], command)
+    data.invalidate_key('agent_status')
+    return bool(agents)
 
 
 def start_agent():
@@ -109,34 +130,88 @@ def start_agent():
         return False
 
 
-def stop_agent():
-    """Stop the agent"""
-    try:
-        result = subprocess.run(
-            ["pkill", "-f", "src/main.py"],
-            capture_output=True
-        )
-        db.add_agent_run("stopped", "Agent stopped from dashboard")
-        return True
-    except Exception as e:
-        st.error(f"Failed to stop agent: {e}")
+def stop_agent(wait=0):
+    """
+    Ask running agents to stop through the status channel
+    
+    Args:
+        wait: Seconds to wait for them to report 'stopped'
+    """
+    if not send_agent_command('stop'):
         return False
+    db.add_agent_run("stopped", "Agent stopped from dashboard")
+    
+    deadline = time.time() + wait
+    while time.time() < deadline and check_agent_status():
+        time.sleep(1)
+        data.invalidate_key('agent_status')
+    return True
+
+
+@st.cache_resource
+def get_log_follower() -> LogFollower:
+    return LogFollower(Path(__file__).parent.parent / 'logs' / 'agent.log', max_lines=500)
 
 
 def get_log_tail(lines=100):
-    """Get last N lines from log file"""
-    log_file = Path(__file__).parent.parent / 'logs' / 'agent.log'
-    if not log_file.exists():
-        return "No logs available"
-    
+    """Get last N lines from log file (reads only what was appended since the last refresh)"""
     try:
-        with open(log_file, 'r') as f:
-            all_lines = f.readlines()
-            return ''.join(all_lines[-lines:])
+        tail = get_log_follower().read(lines)
+        if tail is None:
+            return "No logs available"
+        return '\n'.join(tail)
     except Exception as e:
         return f"Error reading logs: {e}"
 
 
+def build_recent_frame(recent_prs):
+    """Build the Recent PRs table from PR records"""
+    df = pd.DataFrame(recent_prs)
+    
+    # Format timestamp
+    df['timestamp'] = pd.to_datetime(df['timestamp']).dt.strftime('%Y-%m-%d %H:%M')
+    
+    # Add status emoji
+    status_emoji = {
+        'approved': '✅',
+        'rejected': '❌',
+        'needs_work': '⚠️'
+    }
+    df['status_display'] = df['status'].map(lambda x: f"{status_emoji.get(x, '○')} {x}")
+    return df
+
+
+def build_trace_figure(trace):
+    """Build a waterfall chart of a stored review trace"""
+    spans = trace['spans']
+    
+    # Indent span names by nesting depth
+    depth = {}
+    labels = []
+    for span in spans:
+        level = depth.get(span['parent_id'], -1) + 1
+        depth[span['span_id']] = level
+        labels.append(f"{'· ' * level}{span['name']}")
+    
+    fig = go.Figure(go.Bar(
+        y=list(range(len(spans))),
+        x=[span['duration'] for span in spans],
+        base=[span['offset'] for span in spans],
+        orientation='h',
+        marker_color=['red' if span['status'] == 'error' else 'steelblue' for span in spans],
+        hovertext=[f"{span['name']}: {span['duration']:.2f}s at +{span['offset']:.2f}s" for span in spans],
+        hoverinfo='text'
+    ))
+    fig.update_yaxes(tickvals=list(range(len(spans))), ticktext=labels, autorange='reversed')
+    fig.update_layout(
+        title=f"Review took {trace['duration']:.1f}s",
+        xaxis_title='Seconds',
+        height=max(250, 22 * len(spans) + 100),
+        margin=dict(l=10, r=10, t=40, b=10)
+    )
+    return fig
+
+
 # Header
 st.markdown('<h1 class="main-header">🤖 Gordion PR Agent Dashboard</h1>', unsafe_allow_html=True)
 st.markdown("---")
@@ -145,21 +220,58 @@ st.markdown("---")
 with st.sidebar:
     st.header("⚙️ Agent Control")
     
-    is_running = check_agent_status()
+    live_agents = get_live_agents()
+    is_running = bool(live_agents)
     
     if is_running:
         st.markdown('<p class="status-running">● Running</p>', unsafe_allow_html=True)
+        for agent in live_agents:
+            last_cycle = agent.get('last_cycle') or {}
+            st.caption(
+                f"**{agent['instance_id']}** · {agent.get('state')} · cycle {agent.get('cycle', 0)} · "
+                f"queue {agent.get('queue_depth', 0)} · {agent.get('model', '')} · "
+                f"heartbeat {time.time() - agent['heartbeat_at']:.0f}s ago"
+            )
+            if last_cycle:
+                st.caption(f"Last cycle: {last_cycle.get('processed', 0)} processed in "
+                           f"{last_cycle.get('duration', 0):.0f}s, {last_cycle.get('carried_over', 0)} carried over")
+            for pr_id, pr in agent.get('in_flight', {}).items():
+                st.caption(f"⏳ PR #{pr_id} {pr.get('title', '')[:40]} "
+                           f"({time.time() - pr.get('started_at', time.time()):.0f}s)")
+            if agent.get('last_error'):
+                st.caption(f"⚠️ {agent['last_error']}")
+            if agent.get('llm_circuit', 'closed') != 'closed':
+                st.caption(f"🔌 LLM circuit {agent['llm_circuit'].replace('_', '-')} - AI reviews fail fast")
     else:
         st.markdown('<p class="status-stopped">○ Stopped</p>', unsafe_allow_html=True)
     
-    col1, col2 = st.columns(2)
+    # A restart starts the new agent only once the old one has exited,
+    # otherwise two unsharded agents would review the same inbox
+    if st.session_state.get('restart_pending'):
+        if is_running:
+            st.info("↻ Restart pending - waiting for the agent to finish its current cycle")
+        else:
+            st.session_state.restart_pending = False
+            if start_agent():
+                st.success("Agent restarted!")
+                time.sleep(1)
+                st.rerun()
+    
+    col1, col2, col3 = st.columns(3)
     
     with col1:
-        if st.button("▶️ Start" if not is_running else "↻ Restart"):
+        if st.button("▶️ Start" if not is_running else "↻ Restart",
+                     disabled=st.session_state.get('restart_pending', False)):
+            stopped = True
             if is_running:
-                stop_agent()
-                time.sleep(1)
-            if start_agent():
+                stop_agent(wait=30)
+                data.invalidate_key('agent_status')
+                stopped = not check_agent_status()
+                if not stopped:
+                    st.session_state.restart_pending = True
+                    st.info("↻ Restart pending - the agent is still finishing its cycle and "
+                            "the new one starts once it has stopped")
+            if stopped and start_agent():
                 st.success("Agent started!")
                 time.sleep(1)
                 st.rerun()
@@ -167,10 +279,25 @@ with st.sidebar:
     with col2:
         if st.button("⏹️ Stop", disabled=not is_running):
             if stop_agent():
-                st.success("Agent stopped!")
+                st.success("Stop requested - agent exits after the current cycle")
                 time.sleep(1)
                 st.rerun()
     
+    with col3:
+        if st.button("⚡ Run Now", disabled=not is_running):
+            if send_agent_command('run_now'):
+                st.success("Cycle requested")
+    
+    with st.expander("🔥 Profiling", expanded=False):
+        window = st.number_input("Window (s)", min_value=5, max_value=600, value=30, step=5)
+        if st.button("Sample all threads", disabled=not is_running):
+            if send_agent_command(f"profile:{window}"):
+                st.success(f"Profiling for {window}s - flamegraph data in logs/profile-*-window.folded")
+        profile_pr = st.text_input("PR to profile", placeholder="PROJECT/repo/123")
+        if st.button("Profile next review", disabled=not is_running or not profile_pr):
+            if send_agent_command(f"profile_pr:{profile_pr.strip()}"):
+                st.success(f"Next review of {profile_pr} will be profiled (logs/profile-*.prof/.folded/.json)")
+    
     st.markdown("---")
     
     # Configuration
@@ -180,10 +307,7 @@ with st.sidebar:
     
     # Load prompts config for language
     prompts_path = Path(__file__).parent.parent / 'config' / 'prompts.yaml'
-    prompts_config = {}
-    if prompts_path.exists():
-        with open(prompts_path, 'r', encoding='utf-8') as f:
-            prompts_config = yaml.safe_load(f)
+    prompts_config = data.load_yaml(prompts_path)
     
     # Language selection
     current_language = prompts_config.get('language', 'tr')
@@ -253,6 +377,7 @@ with st.sidebar:
     st.header("🗑️ Actions")
     if st.button("Clear History"):
         if db.clear_history():
+            data.invalidate()
             st.success("History cleared!")
             st.rerun()
 
@@ -263,8 +388,8 @@ with tab1:
     # Stats
     col1, col2, col3, col4 = st.columns(4)
     
-    stats_today = db.get_stats(days=1)
-    stats_week = db.get_stats(days=7)
+    stats_today = data.stats(days=1)
+    stats_week = data.stats(days=7)
     
     with col1:
         st.metric(
@@ -312,7 +437,7 @@ with tab1:
         st.metric("Lines Deleted", f"-{stats_week.get('total_deletions', 0)}")
     
     # Daily trend chart
-    daily_stats = db.get_daily_stats(days=7)
+    daily_stats = data.daily_stats(days=7)
     
     if daily_stats:
         df_daily = pd.DataFrame(daily_stats)
@@ -344,26 +469,11 @@ with tab1:
 with tab2:
     st.subheader("📋 Recent Pull Requests")
     
-    recent_prs = db.get_recent_prs(limit=50)
+    recent_prs = data.recent_prs(limit=50)
     
     if recent_prs:
-        # Convert to DataFrame
-        df = pd.DataFrame(recent_prs)
-        
-        # Format timestamp
-        df['timestamp'] = pd.to_datetime(df['timestamp']).dt.strftime('%Y-%m-%d %H:%M')
-        
-        # Select columns to display
-        display_cols = ['pr_id', 'project_key', 'repo_slug', 'title', 'author', 
-                       'status', 'confidence_score', 'files_changed', 'timestamp']
-        
-        # Add status emoji
-        status_emoji = {
-            'approved': '✅',
-            'rejected': '❌',
-            'needs_work': '⚠️'
-        }
-        df['status_display'] = df['status'].map(lambda x: f"{status_emoji.get(x, '○')} {x}")
+        # DataFrame is rebuilt only when new PRs were logged
+        df = data.cached('recent_prs_frame', build_recent_frame, recent_prs)
         
         # Display table
         st.dataframe(
@@ -427,6 +537,13 @@ with tab2:
                         st.warning(concern)
                 except:
                     st.warning(pr_detail['concerns'])
+            
+            # Where the time went in the latest review of this PR
+            trace_key = (pr_detail['project_key'], pr_detail['repo_slug'], int(selected_pr_id))
+            traces = data.cached(('pr_traces',) + trace_key, db.get_pr_traces, *trace_key, 1)
+            if traces:
+                st.write("**⏱️ Review Timing:**")
+                st.plotly_chart(build_trace_figure(traces[0]), use_container_width=True)
     else:
         st.info("No PR history yet. The agent will log PRs as it processes them.")
 
@@ -438,7 +555,7 @@ with tab3:
     
     days = 7 if time_range == "Last 7 Days" else 30 if time_range == "Last 30 Days" else 9999
     
-    stats = db.get_stats(days=days)
+    stats = data.stats(days=days)
     
     if stats.get('total', 0) > 0:
         # Approval rate pie chart
@@ -464,7 +581,7 @@ with tab3:
             st.metric("Average Confidence", f"{stats['avg_confidence']}%")
             
         # Daily trends
-        daily_stats = db.get_daily_stats(days=days)
+        daily_stats = data.daily_stats(days=days)
         
         if daily_stats:
             df_daily = pd.DataFrame(daily_stats)
@@ -477,6 +594,23 @@ with tab3:
                 labels={'value': 'Count', 'variable': 'Status'}
             )
             st.plotly_chart(fig_line, use_container_width=True)
+        
+        # Busiest repositories
+        repo_stats = data.repo_stats(days=days, limit=10)
+        
+        if repo_stats:
+            df_repos = pd.DataFrame(repo_stats)
+            df_repos['repository'] = df_repos['project_key'] + '/' + df_repos['repo_slug']
+            
+            fig_repos = px.bar(
+                df_repos,
+                x='repository',
+                y=['approved', 'rejected'],
+                title='Top Repositories',
+                labels={'value': 'Count', 'variable': 'Status'},
+                color_discrete_map={'approved': 'green', 'rejected': 'red'}
+            )
+            st.plotly_chart(fig_repos, use_container_width=True)
     else:
         st.info(f"No data available for {time_range.lower()}")
 
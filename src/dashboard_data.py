@@ -0,0 +1,171 @@
+"""
+Dashboard data layer - Cached, incrementally refreshed queries for the UI
+"""
+
+import copy
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardData:
+    """
+    Memoises dashboard queries across Streamlit reruns
+
+    Query results are keyed by the pr_history watermark (highest row id),
+    which is read at most once per ttl seconds. While no PR is logged,
+    reruns cost a dictionary lookup. New rows are fetched by id and
+    prepended to the cached recent-PR list instead of re-reading it.
+    Results also expire after max_age seconds, because windows like
+    "last 7 days" move even when nothing is written.
+    """
+
+    def __init__(self, db, ttl: float = 2.0, max_age: float = 60.0):
+        """
+        Initialize dashboard data layer
+
+        Args:
+            db: Database instance
+            ttl: Seconds between watermark checks
+            max_age: Seconds after which any cached result is recomputed
+        """
+        self.db = db
+        self.ttl = ttl
+        self.max_age = max_age
+
+        self._lock = threading.RLock()
+        self._watermark = 0
+        self._watermark_checked = 0.0
+        # key -> (watermark, computed_at, value)
+        self._cache: Dict[Any, tuple] = {}
+        # path -> (mtime_ns, parsed YAML)
+        self._files: Dict[Path, tuple] = {}
+
+        self._recent: List[Dict] = []
+        self._recent_limit = 0
+        self._recent_watermark = -1
+
+    def watermark(self) -> int:
+        """
+        Current pr_history watermark, refreshed at most every ttl seconds
+
+        Returns:
+            Highest pr_history row id
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now - self._watermark_checked >= self.ttl:
+                self._watermark = self.db.get_history_watermark()
+                self._watermark_checked = now
+            return self._watermark
+
+    def cached(self, key: Any, fn: Callable, *args, max_age: Optional[float] = None,
+               track_db: bool = True):
+        """
+        Return fn(*args), recomputing only when stale
+
+        Args:
+            key: Cache key
+            fn: Function computing the value
+            *args: Arguments for fn
+            max_age: Override of the default max_age
+            track_db: Also recompute when the history watermark moves
+
+        Returns:
+            Cached or fresh value
+        """
+        max_age = self.max_age if max_age is None else max_age
+        watermark = self.watermark() if track_db else None
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and entry[0] == watermark and now - entry[1] < max_age:
+                return entry[2]
+
+        value = fn(*args)
+        with self._lock:
+            self._cache[key] = (watermark, now, value)
+        return value
+
+    def invalidate(self) -> None:
+        """Drop all cached results (after the dashboard itself writes)"""
+        with self._lock:
+            self._cache.clear()
+            self._recent = []
+            self._recent_watermark = -1
+            self._watermark_checked = 0.0
+
+    def invalidate_key(self, key: Any) -> None:
+        """Drop one cached result"""
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def stats(self, days: int) -> Dict:
+        """Cached Database.get_stats"""
+        return self.cached(('stats', days), self.db.get_stats, days)
+
+    def daily_stats(self, days: int) -> List[Dict]:
+        """Cached Database.get_daily_stats"""
+        return self.cached(('daily_stats', days), self.db.get_daily_stats, days)
+
+    def repo_stats(self, days: int, limit: int = 10) -> List[Dict]:
+        """Cached Database.get_repo_stats"""
+        return self.cached(('repo_stats', days, limit), self.db.get_repo_stats, days, limit)
+
+    def recent_prs(self, limit: int = 50) -> List[Dict]:
+        """
+        Newest PR records, fetching only rows logged since the last call
+
+        Args:
+            limit: Maximum number of records
+
+        Returns:
+            List of PR records, newest first
+        """
+        watermark = self.watermark()
+        with self._lock:
+            if (self._recent_watermark < 0 or watermark < self._recent_watermark
+                    or limit > self._recent_limit):
+                # First call, larger page, or history was cleared
+                self._recent = self.db.get_recent_prs(limit=limit)
+                self._recent_limit = limit
+            elif watermark > self._recent_watermark:
+                new_rows = self.db.get_prs_after(self._recent_watermark, limit=self._recent_limit)
+                self._recent = (new_rows + self._recent)[:self._recent_limit]
+            else:
+                return self._recent[:limit]
+
+            # Rows may be newer than the watermark read above; track what we hold
+            self._recent_watermark = max([row['id'] for row in self._recent] + [watermark])
+            return self._recent[:limit]
+
+    def load_yaml(self, path: Path) -> Dict:
+        """
+        Parse a YAML file, re-reading it only when its mtime changes
+
+        Args:
+            path: YAML file path
+
+        Returns:
+            Parsed content (a copy, safe to modify), {} if missing
+        """
+        path = Path(path)
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return {}
+
+        with self._lock:
+            entry = self._files.get(path)
+            if not entry or entry[0] != mtime:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = (mtime, yaml.safe_load(f) or {})
+                self._files[path] = entry
+            return copy.deepcopy(entry[1])
@@ -4,6 +4,10 @@ Database module for storing PR history and statistics
 
 import sqlite3
 import json
+import time
+import threading
+import weakref
+import zlib
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional
@@ -11,19 +15,236 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Pre-aggregated counters kept per day and per repo/day, so dashboard
+# queries read a few hundred rollup rows instead of the whole history
+ROLLUP_COUNTERS = ('total', 'approved', 'rejected', 'needs_work', 'declined',
+                   'confidence_sum', 'confidence_count', 'files_changed', 'additions', 'deletions')
+
+ROLLUP_AGGREGATES = """
+    COUNT(*),
+    SUM(status = 'approved'), SUM(status = 'rejected'),
+    SUM(status = 'needs_work'), SUM(status = 'declined'),
+    COALESCE(SUM(confidence_score), 0), COUNT(confidence_score),
+    COALESCE(SUM(files_changed), 0), COALESCE(SUM(additions), 0), COALESCE(SUM(deletions), 0)
+"""
+
+ROLLUP_TABLES = {
+    'pr_rollup_daily': ('day',),
+    'pr_rollup_repo_daily': ('day', 'project_key', 'repo_slug'),
+}
+
+
+def _create_rollup_sql(table: str) -> str:
+    keys = ROLLUP_TABLES[table]
+    columns = ',\n'.join(f"    {key} TEXT NOT NULL" for key in keys)
+    counters = ',\n'.join(f"    {name} INTEGER NOT NULL DEFAULT 0" for name in ROLLUP_COUNTERS)
+    return f"CREATE TABLE IF NOT EXISTS {table} (\n{columns},\n{counters},\n    PRIMARY KEY ({', '.join(keys)})\n)"
+
+
+def _upsert_rollup_sql(table: str, where: str) -> str:
+    """INSERT ... SELECT aggregating matching pr_history rows into a rollup table"""
+    keys = ', '.join(ROLLUP_TABLES[table])
+    counters = ', '.join(ROLLUP_COUNTERS)
+    updates = ', '.join(f"{name} = {name} + excluded.{name}" for name in ROLLUP_COUNTERS)
+    return (f"INSERT INTO {table} ({keys}, {counters}) "
+            f"SELECT {keys}, {ROLLUP_AGGREGATES} FROM pr_history WHERE {where} GROUP BY {keys} "
+            f"ON CONFLICT({keys}) DO UPDATE SET {updates}")
+
+
+# Large text columns that retention may store zlib-compressed (as BLOB)
+COMPRESSIBLE_COLUMNS = ('reasoning', 'concerns')
+
+
+def _decode_row(row: sqlite3.Row) -> Dict:
+    """Row to dict, inflating compressed text columns"""
+    record = dict(row)
+    for column in COMPRESSIBLE_COLUMNS:
+        if isinstance(record.get(column), bytes):
+            record[column] = zlib.decompress(record[column]).decode('utf-8')
+    return record
+
+
+# Schema migrations: (version, description, statements), applied in order.
+# The current version is stored in PRAGMA user_version; never edit a
+# released migration, append a new one instead.
+MIGRATIONS = [
+    (1, "epoch timestamp, generated day key and analytics indexes", [
+        "ALTER TABLE pr_history ADD COLUMN ts_epoch INTEGER",
+        "UPDATE pr_history SET ts_epoch = CAST(strftime('%s', timestamp) AS INTEGER)",
+        """ALTER TABLE pr_history ADD COLUMN day TEXT
+           GENERATED ALWAYS AS (date(ts_epoch, 'unixepoch')) VIRTUAL""",
+        # Covering indexes: stats and daily charts never touch the table rows
+        """CREATE INDEX IF NOT EXISTS idx_pr_history_ts ON pr_history(
+               ts_epoch, status, confidence_score, files_changed, additions, deletions)""",
+        "CREATE INDEX IF NOT EXISTS idx_pr_history_day ON pr_history(day, status)",
+        "CREATE INDEX IF NOT EXISTS idx_pr_history_status_ts ON pr_history(status, ts_epoch)",
+        "CREATE INDEX IF NOT EXISTS idx_pr_history_repo_ts ON pr_history(project_key, repo_slug, ts_epoch)",
+        "CREATE INDEX IF NOT EXISTS idx_pr_jobs_updated ON pr_jobs(updated_at)",
+    ]),
+    (2, "daily and per-repo rollup tables", [
+        *(_create_rollup_sql(table) for table in ROLLUP_TABLES),
+        *(_upsert_rollup_sql(table, 'ts_epoch IS NOT NULL') for table in ROLLUP_TABLES),
+    ]),
+    (3, "history archive and maintenance bookkeeping", [
+        "CREATE TABLE IF NOT EXISTS pr_history_archive AS SELECT * FROM pr_history WHERE 0",
+        "CREATE INDEX IF NOT EXISTS idx_pr_history_archive_ts ON pr_history_archive(ts_epoch)",
+        """CREATE TABLE IF NOT EXISTS maintenance_runs (
+               task TEXT PRIMARY KEY,
+               last_run REAL NOT NULL,
+               result TEXT
+           )""",
+    ]),
+    (4, "agent status channel", [
+        """CREATE TABLE IF NOT EXISTS agent_status (
+               instance_id TEXT PRIMARY KEY,
+               status TEXT NOT NULL,
+               heartbeat_at REAL NOT NULL
+           )""",
+        """CREATE TABLE IF NOT EXISTS agent_commands (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               instance_id TEXT NOT NULL,
+               command TEXT NOT NULL,
+               created_at REAL NOT NULL,
+               handled_at REAL
+           )""",
+        "CREATE INDEX IF NOT EXISTS idx_agent_commands_pending ON agent_commands(instance_id, handled_at)",
+    ]),
+    (5, "per-PR trace waterfalls", [
+        """CREATE TABLE IF NOT EXISTS pr_traces (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               trace_id TEXT UNIQUE NOT NULL,
+               project_key TEXT,
+               repo_slug TEXT,
+               pr_id INTEGER,
+               started_at REAL NOT NULL,
+               duration REAL NOT NULL,
+               status TEXT,
+               spans TEXT NOT NULL
+           )""",
+        "CREATE INDEX IF NOT EXISTS idx_pr_traces_pr ON pr_traces(project_key, repo_slug, pr_id, started_at)",
+        "CREATE INDEX IF NOT EXISTS idx_pr_traces_started ON pr_traces(started_at)",
+    ]),
+]
+
+
+class _ConnectionSlot:
+    """Holder of a thread's connection (see Database._connect)"""
+    
+    __slots__ = ('conn', 'finalizer', '__weakref__')
+    
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.finalizer = None
+
 
 class Database:
-    """Simple SQLite database for PR history"""
+    """
+    Simple SQLite database for PR history
+    
+    Each thread uses one connection in WAL mode, so the agent and the
+    dashboard can read and write concurrently without "database is
+    locked" errors. When a thread exits its connection goes back to a
+    small pool of idle, already tuned connections that the next thread
+    takes over, so short-lived threads (Streamlit reruns, per-PR workers)
+    neither reconnect nor leak connections.
+    """
+    
+    BUSY_TIMEOUT_MS = 10000
+    CACHE_SIZE_KIB = 16384          # page cache per connection (16 MB)
+    MMAP_SIZE = 64 * 1024 * 1024    # memory-mapped reads (64 MB)
+    CACHED_STATEMENTS = 256         # prepared statement cache per connection
+    POOL_SIZE = 4                   # idle connections kept for new threads
     
     def __init__(self, db_path: str = "data/pr_history.db"):
         """Initialize database connection"""
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._pool: List[sqlite3.Connection] = []
+        self._pool_lock = threading.Lock()
         self._init_db()
     
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Get this thread's connection, taking an idle one or opening one on first use
+        
+        Use as ``with self._connect() as conn:`` - the context manager
+        commits or rolls back the transaction but keeps the connection open.
+        
+        Returns:
+            SQLite connection owned by the calling thread until it exits
+        """
+        slot = getattr(self._local, 'slot', None)
+        if slot is not None:
+            return slot.conn
+        
+        with self._pool_lock:
+            conn = self._pool.pop() if self._pool else None
+        if conn is None:
+            conn = self._open()
+        
+        # The slot dies with the thread's locals, which hands the
+        # connection back to the pool
+        slot = _ConnectionSlot(conn)
+        slot.finalizer = weakref.finalize(slot, self._release, conn)
+        self._local.slot = slot
+        return conn
+    
+    def _open(self) -> sqlite3.Connection:
+        """Open and tune a new connection"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.BUSY_TIMEOUT_MS / 1000,
+            cached_statements=self.CACHED_STATEMENTS,
+            check_same_thread=False,  # handed between threads, never shared
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={self.BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA cache_size=-{self.CACHE_SIZE_KIB}")
+        conn.execute(f"PRAGMA mmap_size={self.MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+    
+    def _release(self, conn: sqlite3.Connection):
+        """Return the connection of an exited thread to the pool (or close it)"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            return
+        with self._pool_lock:
+            if len(self._pool) < self.POOL_SIZE:
+                self._pool.append(conn)
+                return
+        conn.close()
+    
+    def close(self):
+        """
+        Close the calling thread's connection and the idle pool
+        
+        Connections still held by other threads are pooled or closed
+        when those threads exit.
+        """
+        slot = getattr(self._local, 'slot', None)
+        if slot is not None:
+            self._local.slot = None
+            slot.finalizer.detach()
+            slot.conn.close()
+        with self._pool_lock:
+            idle, self._pool = self._pool, []
+        for conn in idle:
+            conn.close()
+    
     def _init_db(self):
         """Create tables if they don't exist"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
+            # Only takes effect on a new database; existing ones are
+            # converted by the retention job (needs a full VACUUM)
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS pr_history (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -54,7 +275,52 @@ class Database:
                 )
             """)
             
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pr_jobs (
+                    job_key TEXT PRIMARY KEY,
+                    project_key TEXT NOT NULL,
+                    repo_slug TEXT NOT NULL,
+                    pr_id INTEGER NOT NULL,
+                    stage TEXT NOT NULL,
+                    state TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pr_leases (
+                    pr_key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    heartbeat_at REAL NOT NULL
+                )
+            """)
+            
             conn.commit()
+        
+        self._migrate()
+    
+    def _migrate(self):
+        """Apply pending schema migrations"""
+        conn = self._connect()
+        for version, description, statements in MIGRATIONS:
+            # IMMEDIATE takes the write lock first, so concurrent instances
+            # starting together apply each migration exactly once
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                    conn.rollback()
+                    continue
+                
+                logger.info(f"Migrating database to schema v{version}: {description}")
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {version}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
     
     def add_pr_record(self, pr_data: Dict) -> bool:
         """
@@ -66,37 +332,73 @@ class Database:
         Returns:
             True if successful
         """
+        return self.add_pr_records([pr_data]) == 1
+    
+    def add_pr_records(self, records: List[Dict]) -> int:
+        """
+        Add PR records to history in a single transaction
+        
+        Args:
+            records: PR information dictionaries; 'ts_epoch' (when the PR
+                was processed) defaults to now
+            
+        Returns:
+            Number of records inserted (duplicates are skipped), or -1 if
+            the transaction failed
+        """
+        now = int(time.time())
+        inserted = 0
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("""
-                    INSERT INTO pr_history (
-                        pr_id, project_key, repo_slug, title, author,
-                        status, confidence_score, reasoning, concerns,
-                        files_changed, additions, deletions, ai_model
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    pr_data.get('pr_id'),
-                    pr_data.get('project_key'),
-                    pr_data.get('repo_slug'),
-                    pr_data.get('title'),
-                    pr_data.get('author'),
-                    pr_data.get('status'),
-                    pr_data.get('confidence_score'),
-                    pr_data.get('reasoning'),
-                    json.dumps(pr_data.get('concerns', [])),
-                    pr_data.get('files_changed'),
-                    pr_data.get('additions'),
-                    pr_data.get('deletions'),
-                    pr_data.get('ai_model')
-                ))
+            with self._connect() as conn:
+                for pr_data in records:
+                    try:
+                        self._insert_pr_record(conn, pr_data, now)
+                        inserted += 1
+                    except sqlite3.IntegrityError:
+                        # Only the failing statement is rolled back
+                        logger.warning(f"PR record already exists: {pr_data.get('pr_id')}")
                 conn.commit()
-                return True
-        except sqlite3.IntegrityError:
-            logger.warning(f"PR record already exists: {pr_data.get('pr_id')}")
-            return False
+                return inserted
         except Exception as e:
-            logger.error(f"Error adding PR record: {e}")
-            return False
+            logger.error(f"Error adding PR records: {e}")
+            return -1
+    
+    def _insert_pr_record(self, conn: sqlite3.Connection, pr_data: Dict, now: int) -> None:
+        """
+        Insert one history row and update the rollups (caller commits)
+        
+        Args:
+            conn: Connection with an open transaction
+            pr_data: Dictionary containing PR information
+            now: Epoch second to record unless the record carries its own ts_epoch
+        """
+        ts_epoch = int(pr_data.get('ts_epoch') or now)
+        cursor = conn.execute("""
+            INSERT INTO pr_history (
+                pr_id, project_key, repo_slug, title, author,
+                status, confidence_score, reasoning, concerns,
+                files_changed, additions, deletions, ai_model,
+                timestamp, ts_epoch
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime(?, 'unixepoch'), ?)
+        """, (
+            pr_data.get('pr_id'),
+            pr_data.get('project_key'),
+            pr_data.get('repo_slug'),
+            pr_data.get('title'),
+            pr_data.get('author'),
+            pr_data.get('status'),
+            pr_data.get('confidence_score'),
+            pr_data.get('reasoning'),
+            json.dumps(pr_data.get('concerns', [])),
+            pr_data.get('files_changed'),
+            pr_data.get('additions'),
+            pr_data.get('deletions'),
+            pr_data.get('ai_model'),
+            ts_epoch, ts_epoch
+        ))
+        # Same transaction: history and rollups never disagree
+        for table in ROLLUP_TABLES:
+            conn.execute(_upsert_rollup_sql(table, 'id = ?'), (cursor.lastrowid,))
     
     def get_recent_prs(self, limit: int = 50) -> List[Dict]:
         """
@@ -109,61 +411,190 @@ class Database:
             List of PR records
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self._connect() as conn:
                 cursor = conn.execute("""
                     SELECT * FROM pr_history
-                    ORDER BY timestamp DESC
+                    ORDER BY ts_epoch DESC
                     LIMIT ?
                 """, (limit,))
                 
-                return [dict(row) for row in cursor.fetchall()]
+                return [_decode_row(row) for row in cursor.fetchall()]
         except Exception as e:
             logger.error(f"Error fetching recent PRs: {e}")
             return []
     
+    def get_history_watermark(self) -> int:
+        """
+        Get the newest pr_history row id (cheap change counter for caches)
+        
+        Returns:
+            Highest row id, 0 if history is empty
+        """
+        try:
+            with self._connect() as conn:
+                return conn.execute("SELECT MAX(id) FROM pr_history").fetchone()[0] or 0
+        except Exception as e:
+            logger.error(f"Error reading history watermark: {e}")
+            return 0
+    
+    def get_prs_after(self, after_id: int, limit: int = 50) -> List[Dict]:
+        """
+        Get PR records inserted after a row id, newest first
+        
+        Args:
+            after_id: Watermark of the previous fetch
+            limit: Maximum number of records to return
+            
+        Returns:
+            List of PR records
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute("""
+                    SELECT * FROM pr_history
+                    WHERE id > ?
+                    ORDER BY id DESC
+                    LIMIT ?
+                """, (after_id, limit))
+                
+                return [_decode_row(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error fetching new PRs: {e}")
+            return []
+    
+    @staticmethod
+    def _since(days: int) -> int:
+        """Epoch second N days ago (lower bound for ts_epoch range scans)"""
+        return int(time.time()) - days * 86400
+    
     def get_stats(self, days: int = 7) -> Dict:
         """
         Get statistics for the last N days
         
+        Whole days are read from the daily rollup; only the partial first
+        day of the window is aggregated from pr_history.
+        
         Args:
             days: Number of days to look back
             
         Returns:
             Dictionary with statistics
         """
+        since = self._since(days)
+        next_midnight = (since // 86400 + 1) * 86400
+        sums = ', '.join(f"SUM({name})" for name in ROLLUP_COUNTERS)
+        counters = ', '.join(ROLLUP_COUNTERS)
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute("""
-                    SELECT 
-                        COUNT(*) as total,
-                        SUM(CASE WHEN status = 'approved' THEN 1 ELSE 0 END) as approved,
-                        SUM(CASE WHEN status = 'rejected' THEN 1 ELSE 0 END) as rejected,
-                        SUM(CASE WHEN status = 'needs_work' THEN 1 ELSE 0 END) as needs_work,
-                        AVG(confidence_score) as avg_confidence,
-                        SUM(files_changed) as total_files,
-                        SUM(additions) as total_additions,
-                        SUM(deletions) as total_deletions
-                    FROM pr_history
-                    WHERE timestamp >= datetime('now', '-' || ? || ' days')
-                """, (days,))
+            with self._connect() as conn:
+                cursor = conn.execute(f"""
+                    SELECT {sums} FROM (
+                        SELECT {counters} FROM pr_rollup_daily
+                        WHERE day >= date(?, 'unixepoch')
+                        UNION ALL
+                        SELECT {ROLLUP_AGGREGATES} FROM pr_history
+                        WHERE ts_epoch >= ? AND ts_epoch < ?
+                    )
+                """, (next_midnight, since, next_midnight))
                 
-                row = cursor.fetchone()
+                row = dict(zip(ROLLUP_COUNTERS, cursor.fetchone()))
+                confidence_count = row['confidence_count'] or 0
+                avg_confidence = (row['confidence_sum'] or 0) / confidence_count if confidence_count else 0
                 
                 return {
-                    'total': row[0] or 0,
-                    'approved': row[1] or 0,
-                    'rejected': row[2] or 0,
-                    'needs_work': row[3] or 0,
-                    'avg_confidence': round(row[4] or 0, 1),
-                    'total_files': row[5] or 0,
-                    'total_additions': row[6] or 0,
-                    'total_deletions': row[7] or 0
+                    'total': row['total'] or 0,
+                    'approved': row['approved'] or 0,
+                    'rejected': row['rejected'] or 0,
+                    'needs_work': row['needs_work'] or 0,
+                    'declined': row['declined'] or 0,
+                    'avg_confidence': round(avg_confidence, 1),
+                    'total_files': row['files_changed'] or 0,
+                    'total_additions': row['additions'] or 0,
+                    'total_deletions': row['deletions'] or 0
                 }
         except Exception as e:
             logger.error(f"Error getting stats: {e}")
             return {}
     
+    def get_repo_stats(self, days: int = 7, limit: int = 10) -> List[Dict]:
+        """
+        Get per-repository statistics from the repo rollup
+        
+        Args:
+            days: Number of whole days to look back
+            limit: Maximum number of repositories (busiest first)
+            
+        Returns:
+            List of per-repository statistics
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute("""
+                    SELECT project_key, repo_slug,
+                           SUM(total) as total,
+                           SUM(approved) as approved,
+                           SUM(rejected) + SUM(needs_work) + SUM(declined) as rejected
+                    FROM pr_rollup_repo_daily
+                    WHERE day >= date(?, 'unixepoch')
+                    GROUP BY project_key, repo_slug
+                    ORDER BY total DESC
+                    LIMIT ?
+                """, (self._since(days), limit))
+                
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error getting repo stats: {e}")
+            return []
+    
+    def rebuild_rollups(self) -> int:
+        """
+        Recompute rollup tables from pr_history (backfill/repair)
+        
+        Days older than the oldest detailed row were compacted by retention;
+        their rollups are the only record left and are kept as they are.
+        
+        Returns:
+            Number of daily rollup rows, or -1 on error
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            first_day = conn.execute("SELECT MIN(day) FROM pr_history").fetchone()[0]
+            for table in ROLLUP_TABLES:
+                if first_day is None:
+                    continue
+                conn.execute(f"DELETE FROM {table} WHERE day >= ?", (first_day,))
+                conn.execute(_upsert_rollup_sql(table, 'ts_epoch IS NOT NULL'))
+            conn.commit()
+            return conn.execute("SELECT COUNT(*) FROM pr_rollup_daily").fetchone()[0]
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error rebuilding rollups: {e}")
+            return -1
+    
+    def get_pr_size_hints(self) -> Dict[tuple, int]:
+        """
+        Get the latest known size of each reviewed PR
+        
+        Returns:
+            Mapping of (project_key, repo_slug, pr_id) to files + changed lines
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute("""
+                    SELECT project_key, repo_slug, pr_id,
+                           COALESCE(files_changed, 0) + COALESCE(additions, 0) + COALESCE(deletions, 0)
+                    FROM pr_history
+                    WHERE id IN (
+                        SELECT MAX(id) FROM pr_history
+                        GROUP BY project_key, repo_slug, pr_id
+                    )
+                """)
+                
+                return {(row[0], row[1], row[2]): row[3] for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Error getting PR size hints: {e}")
+            return {}
+    
     def get_daily_stats(self, days: int = 7) -> List[Dict]:
         """
         Get daily statistics for charts
@@ -175,19 +606,13 @@ class Database:
             List of daily statistics
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self._connect() as conn:
                 cursor = conn.execute("""
-                    SELECT 
-                        DATE(timestamp) as date,
-                        COUNT(*) as total,
-                        SUM(CASE WHEN status = 'approved' THEN 1 ELSE 0 END) as approved,
-                        SUM(CASE WHEN status = 'rejected' THEN 1 ELSE 0 END) as rejected
-                    FROM pr_history
-                    WHERE timestamp >= datetime('now', '-' || ? || ' days')
-                    GROUP BY DATE(timestamp)
-                    ORDER BY date
-                """, (days,))
+                    SELECT day as date, total, approved, rejected
+                    FROM pr_rollup_daily
+                    WHERE day >= date(?, 'unixepoch')
+                    ORDER BY day
+                """, (self._since(days),))
                 
                 return [dict(row) for row in cursor.fetchall()]
         except Exception as e:
@@ -205,23 +630,529 @@ class Database:
         Returns:
             True if successful
         """
+        return self.add_agent_runs([(status, message)]) == 1
+    
+    def add_agent_runs(self, runs: List[tuple]) -> int:
+        """
+        Log agent runs in a single transaction
+        
+        Args:
+            runs: (status, message) tuples
+            
+        Returns:
+            Number of runs logged
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("""
+            with self._connect() as conn:
+                conn.executemany("""
                     INSERT INTO agent_runs (status, message)
                     VALUES (?, ?)
-                """, (status, message))
+                """, runs)
                 conn.commit()
-                return True
+                return len(runs)
         except Exception as e:
             logger.error(f"Error logging agent run: {e}")
+            return 0
+    
+    def get_pr_job(self, job_key: str) -> Optional[Dict]:
+        """
+        Get a review job by idempotency key
+        
+        Args:
+            job_key: Job idempotency key
+            
+        Returns:
+            Job record with decoded state, or None
+        """
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT * FROM pr_jobs WHERE job_key = ?", (job_key,)).fetchone()
+                if not row:
+                    return None
+                
+                job = dict(row)
+                job['state'] = json.loads(job['state']) if job['state'] else {}
+                return job
+        except Exception as e:
+            logger.error(f"Error fetching PR job: {e}")
+            return None
+    
+    def save_pr_job(self, job_key: str, project_key: str, repo_slug: str, pr_id: int,
+                    stage: str, state: Dict) -> bool:
+        """
+        Insert or update a review job
+        
+        Args:
+            job_key: Job idempotency key
+            project_key: Project key
+            repo_slug: Repository slug
+            pr_id: PR ID
+            stage: Last completed pipeline stage
+            state: Pipeline state (JSON serializable)
+            
+        Returns:
+            True if successful
+        """
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute("""
+                    INSERT INTO pr_jobs (job_key, project_key, repo_slug, pr_id,
+                                         stage, state, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(job_key) DO UPDATE SET
+                        stage = excluded.stage,
+                        state = excluded.state,
+                        updated_at = excluded.updated_at
+                """, (job_key, project_key, repo_slug, pr_id, stage,
+                      json.dumps(state, ensure_ascii=False), now, now))
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Error saving PR job: {e}")
+            return False
+    
+    def purge_pr_jobs(self, older_than_days: int = 30) -> int:
+        """
+        Delete review jobs not touched for N days
+        
+        Args:
+            older_than_days: Age threshold in days
+            
+        Returns:
+            Number of deleted jobs
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute("DELETE FROM pr_jobs WHERE updated_at < ?",
+                                      (time.time() - older_than_days * 86400,))
+                conn.commit()
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Error purging PR jobs: {e}")
+            return 0
+    
+    def claim_pr_lease(self, pr_key: str, owner: str, ttl: float) -> bool:
+        """
+        Atomically claim a PR lease
+        
+        Succeeds if the PR is unleased, the lease has expired, or the
+        caller already owns it.
+        
+        Args:
+            pr_key: PR lease key ('PROJECT/repo#id')
+            owner: Instance identifier
+            ttl: Lease lifetime in seconds
+            
+        Returns:
+            True if the lease is now held by owner
+        """
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute("""
+                    INSERT INTO pr_leases (pr_key, owner, expires_at, heartbeat_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(pr_key) DO UPDATE SET
+                        owner = excluded.owner,
+                        expires_at = excluded.expires_at,
+                        heartbeat_at = excluded.heartbeat_at
+                    WHERE pr_leases.owner = excluded.owner OR pr_leases.expires_at < ?
+                """, (pr_key, owner, now + ttl, now, now))
+                conn.commit()
+                return cursor.rowcount == 1
+        except Exception as e:
+            logger.error(f"Error claiming PR lease: {e}")
             return False
     
+    def renew_pr_leases(self, pr_keys: List[str], owner: str, ttl: float) -> int:
+        """
+        Extend leases held by owner (heartbeat)
+        
+        Args:
+            pr_keys: PR lease keys
+            owner: Instance identifier
+            ttl: Lease lifetime in seconds
+            
+        Returns:
+            Number of leases renewed
+        """
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                cursor = conn.executemany("""
+                    UPDATE pr_leases SET expires_at = ?, heartbeat_at = ?
+                    WHERE pr_key = ? AND owner = ?
+                """, [(now + ttl, now, key, owner) for key in pr_keys])
+                conn.commit()
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Error renewing PR leases: {e}")
+            return 0
+    
+    def release_pr_lease(self, pr_key: str, owner: str) -> bool:
+        """
+        Release a PR lease held by owner
+        
+        Args:
+            pr_key: PR lease key
+            owner: Instance identifier
+            
+        Returns:
+            True if successful
+        """
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM pr_leases WHERE pr_key = ? AND owner = ?", (pr_key, owner))
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Error releasing PR lease: {e}")
+            return False
+    
+    def compress_history(self, before_epoch: int, min_bytes: int = 512) -> int:
+        """
+        zlib-compress large reasoning/concerns values of older rows
+        
+        Args:
+            before_epoch: Only rows older than this epoch second
+            min_bytes: Leave shorter values as plain text
+            
+        Returns:
+            Number of values compressed
+        """
+        compressed = 0
+        try:
+            with self._connect() as conn:
+                for column in COMPRESSIBLE_COLUMNS:
+                    rows = conn.execute(f"""
+                        SELECT id, {column} FROM pr_history
+                        WHERE ts_epoch < ? AND typeof({column}) = 'text' AND length({column}) >= ?
+                    """, (before_epoch, min_bytes)).fetchall()
+                    conn.executemany(
+                        f"UPDATE pr_history SET {column} = ? WHERE id = ?",
+                        [(zlib.compress(row[1].encode('utf-8'), 9), row[0]) for row in rows]
+                    )
+                    compressed += len(rows)
+                conn.commit()
+                return compressed
+        except Exception as e:
+            logger.error(f"Error compressing history: {e}")
+            return 0
+    
+    def get_history_before(self, before_epoch: int, limit: int = 5000) -> List[Dict]:
+        """
+        Get the oldest detailed rows older than a cutoff (for file archival)
+        
+        Args:
+            before_epoch: Epoch second cutoff
+            limit: Maximum number of rows
+            
+        Returns:
+            PR records with decompressed text, oldest first
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute("""
+                    SELECT * FROM pr_history WHERE ts_epoch < ?
+                    ORDER BY ts_epoch LIMIT ?
+                """, (before_epoch, limit))
+                return [_decode_row(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error fetching history for archival: {e}")
+            return []
+    
+    def delete_history(self, ids: List[int]) -> int:
+        """
+        Delete detailed rows by id (rollups are kept)
+        
+        Args:
+            ids: pr_history row ids
+            
+        Returns:
+            Number of rows deleted
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.executemany("DELETE FROM pr_history WHERE id = ?", [(i,) for i in ids])
+                conn.commit()
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Error deleting history: {e}")
+            return 0
+    
+    def archive_history(self, before_epoch: int) -> int:
+        """
+        Move detailed rows older than a cutoff to pr_history_archive
+        
+        Args:
+            before_epoch: Epoch second cutoff
+            
+        Returns:
+            Number of rows moved
+        """
+        try:
+            with self._connect() as conn:
+                conn.execute("""
+                    INSERT INTO pr_history_archive SELECT * FROM pr_history WHERE ts_epoch < ?
+                """, (before_epoch,))
+                cursor = conn.execute("DELETE FROM pr_history WHERE ts_epoch < ?", (before_epoch,))
+                conn.commit()
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Error archiving history: {e}")
+            return 0
+    
+    def incremental_vacuum(self, pages: int = 0) -> int:
+        """
+        Return free pages to the file system and truncate the WAL
+        
+        Converts the database to auto_vacuum=INCREMENTAL with a one-off full
+        VACUUM if needed.
+        
+        Args:
+            pages: Maximum pages to free (0 = all)
+            
+        Returns:
+            Database size in bytes afterwards, or -1 on error
+        """
+        conn = self._connect()
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                logger.info("Converting database to incremental auto-vacuum (one-off VACUUM)...")
+                conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                conn.execute("VACUUM")
+            conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            return page_count * page_size
+        except Exception as e:
+            logger.error(f"Error vacuuming database: {e}")
+            return -1
+    
+    def get_maintenance_run(self, task: str) -> Optional[float]:
+        """
+        Get the last run time of a maintenance task
+        
+        Args:
+            task: Task name
+            
+        Returns:
+            Epoch seconds of the last run, or None
+        """
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT last_run FROM maintenance_runs WHERE task = ?", (task,)).fetchone()
+                return row[0] if row else None
+        except Exception as e:
+            logger.error(f"Error reading maintenance run: {e}")
+            return None
+    
+    def set_maintenance_run(self, task: str, result: Dict) -> bool:
+        """
+        Record a maintenance task run
+        
+        Args:
+            task: Task name
+            result: Run summary (JSON serializable)
+            
+        Returns:
+            True if successful
+        """
+        try:
+            with self._connect() as conn:
+                conn.execute("""
+                    INSERT INTO maintenance_runs (task, last_run, result) VALUES (?, ?, ?)
+                    ON CONFLICT(task) DO UPDATE SET last_run = excluded.last_run, result = excluded.result
+                """, (task, time.time(), json.dumps(result)))
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Error recording maintenance run: {e}")
+            return False
+    
+    def upsert_agent_status(self, status: Dict) -> bool:
+        """
+        Publish an agent instance's live status (heartbeat)
+        
+        Args:
+            status: Status dictionary with instance_id and heartbeat_at
+            
+        Returns:
+            True if successful
+        """
+        try:
+            with self._connect() as conn:
+                conn.execute("""
+                    INSERT INTO agent_status (instance_id, status, heartbeat_at) VALUES (?, ?, ?)
+                    ON CONFLICT(instance_id) DO UPDATE SET
+                        status = excluded.status,
+                        heartbeat_at = excluded.heartbeat_at
+                """, (status['instance_id'], json.dumps(status, ensure_ascii=False), status['heartbeat_at']))
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Error publishing agent status: {e}")
+            return False
+    
+    def get_agent_statuses(self, max_age: float = 86400) -> List[Dict]:
+        """
+        Get the status of agent instances seen recently
+        
+        Args:
+            max_age: Ignore instances without a heartbeat for this many seconds
+            
+        Returns:
+            Status dictionaries, most recent heartbeat first
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute("""
+                    SELECT status FROM agent_status
+                    WHERE heartbeat_at >= ?
+                    ORDER BY heartbeat_at DESC
+                """, (time.time() - max_age,))
+                return [json.loads(row[0]) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error reading agent status: {e}")
+            return []
+    
+    def add_agent_command(self, instance_id: str, command: str) -> bool:
+        """
+        Queue a control command for an agent instance
+        
+        Args:
+            instance_id: Target instance
+            command: Command name (stop, run_now)
+            
+        Returns:
+            True if successful
+        """
+        try:
+            with self._connect() as conn:
+                conn.execute("""
+                    INSERT INTO agent_commands (instance_id, command, created_at) VALUES (?, ?, ?)
+                """, (instance_id, command, time.time()))
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Error queueing agent command: {e}")
+            return False
+    
+    def take_agent_commands(self, instance_id: str) -> List[str]:
+        """
+        Atomically claim the pending commands of an instance
+        
+        Args:
+            instance_id: Instance identifier
+            
+        Returns:
+            Command names, oldest first
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute("""
+                    UPDATE agent_commands SET handled_at = ?
+                    WHERE instance_id = ? AND handled_at IS NULL
+                    RETURNING id, command
+                """, (time.time(), instance_id))
+                commands = sorted(cursor.fetchall())
+                conn.commit()
+                return [row[1] for row in commands]
+        except Exception as e:
+            logger.error(f"Error reading agent commands: {e}")
+            return []
+    
+    def add_pr_trace(self, trace: Dict) -> bool:
+        """
+        Store the span waterfall of one PR review
+        
+        Args:
+            trace: Tracer waterfall (trace_id, start, duration, status,
+                   attributes with project_key/repo_slug/pr_id, spans)
+            
+        Returns:
+            True if successful
+        """
+        try:
+            attributes = trace.get('attributes', {})
+            with self._connect() as conn:
+                conn.execute("""
+                    INSERT OR IGNORE INTO pr_traces
+                    (trace_id, project_key, repo_slug, pr_id, started_at, duration, status, spans)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    trace['trace_id'],
+                    attributes.get('project_key'),
+                    attributes.get('repo_slug'),
+                    attributes.get('pr_id'),
+                    trace['start'],
+                    trace['duration'],
+                    trace.get('status'),
+                    json.dumps(trace, ensure_ascii=False, default=str)
+                ))
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Error storing PR trace: {e}")
+            return False
+    
+    def get_pr_traces(self, project_key: str, repo_slug: str, pr_id: int,
+                      limit: int = 10) -> List[Dict]:
+        """
+        Get the stored traces of a PR
+        
+        Args:
+            project_key: Project key
+            repo_slug: Repository slug
+            pr_id: PR ID
+            limit: Maximum number of traces
+            
+        Returns:
+            Trace waterfalls, newest first
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute("""
+                    SELECT spans FROM pr_traces
+                    WHERE project_key = ? AND repo_slug = ? AND pr_id = ?
+                    ORDER BY started_at DESC
+                    LIMIT ?
+                """, (project_key, repo_slug, pr_id, limit))
+                return [json.loads(row[0]) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error reading PR traces: {e}")
+            return []
+    
+    def purge_pr_traces(self, before_epoch: float) -> int:
+        """
+        Delete traces started before a cutoff
+        
+        Args:
+            before_epoch: Epoch second cutoff
+            
+        Returns:
+            Number of deleted traces
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute("DELETE FROM pr_traces WHERE started_at < ?", (before_epoch,))
+                conn.commit()
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Error purging PR traces: {e}")
+            return 0
+    
     def clear_history(self) -> bool:
         """Clear all PR history"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 conn.execute("DELETE FROM pr_history")
+                conn.execute("DELETE FROM pr_history_archive")
+                conn.execute("DELETE FROM pr_traces")
+                for table in ROLLUP_TABLES:
+                    conn.execute(f"DELETE FROM {table}")
                 conn.commit()
                 return True
         except Exception as e:
@@ -0,0 +1,81 @@
+"""
+Database maintenance commands
+
+Usage:
+    python src/db_admin.py rebuild-rollups [--db data/pr_history.db]
+    python src/db_admin.py retention [--config config/config.yaml]
+    python src/db_admin.py vacuum
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Dict
+
+import yaml
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from database import Database
+from retention import RetentionManager
+
+logger = logging.getLogger(__name__)
+
+
+def rebuild_rollups(db: Database, config: Dict) -> int:
+    """Recompute the daily and per-repo rollups from pr_history"""
+    started = time.monotonic()
+    rows = db.rebuild_rollups()
+    if rows < 0:
+        print("❌ Rollup rebuild failed, see log")
+        return 1
+
+    print(f"✅ Rebuilt rollups: {rows} day(s) in {time.monotonic() - started:.2f}s")
+    return 0
+
+
+def retention(db: Database, config: Dict) -> int:
+    """Run history compaction, archival and vacuum now, ignoring the interval"""
+    summary = RetentionManager(db, config).run()
+    print(f"✅ Retention: {summary['compressed']} compressed, {summary['archived']} archived "
+          f"({summary['archive']}), database {summary['db_bytes'] / 1024 / 1024:.1f} MB")
+    return 0
+
+
+def vacuum(db: Database, config: Dict) -> int:
+    """Free all unused pages and truncate the WAL"""
+    size = db.incremental_vacuum()
+    if size < 0:
+        print("❌ Vacuum failed, see log")
+        return 1
+    print(f"✅ Database is {size / 1024 / 1024:.1f} MB")
+    return 0
+
+
+COMMANDS = {
+    'rebuild-rollups': rebuild_rollups,
+    'retention': retention,
+    'vacuum': vacuum,
+}
+
+
+def main() -> int:
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Gordion PR Agent database maintenance")
+    parser.add_argument('command', choices=sorted(COMMANDS), help="Maintenance command")
+    parser.add_argument('--db', default="data/pr_history.db", help="Database path")
+    parser.add_argument('--config', default=str(Path(__file__).parent.parent / 'config' / 'config.yaml'),
+                        help="Configuration file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    config_path = Path(args.config)
+    config = yaml.safe_load(config_path.read_text(encoding='utf-8')) if config_path.exists() else {}
+    return COMMANDS[args.command](Database(args.db), config or {})
+
+
+if __name__ == '__main__':
+    sys.exit(main())
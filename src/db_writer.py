@@ -0,0 +1,227 @@
+"""
+Batched database writer - Keeps history writes off the PR processing path
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class BatchedDatabaseWriter:
+    """
+    Buffers pr_history and agent_runs records and writes them in batches
+
+    Records go into a bounded queue (producers wait when it is full) and a
+    background thread commits them in one transaction per batch, when
+    batch_size records are buffered or flush_interval seconds have passed
+    since the first one. Pending records are written on close() and at
+    interpreter exit. A record's on_commit callback runs once its batch
+    has been committed, so callers can persist progress that must not get
+    ahead of the history row.
+    """
+
+    def __init__(self, db, batch_size: int = 100, flush_interval: float = 1.0,
+                 queue_size: int = 10000):
+        """
+        Initialize batched writer
+
+        Args:
+            db: Database instance
+            batch_size: Records per transaction (size trigger)
+            flush_interval: Maximum seconds a record waits (time trigger)
+            queue_size: Queue bound
+        """
+        self.db = db
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self.written = 0
+        self.failed = 0
+
+    @classmethod
+    def from_config(cls, db, config: Dict) -> 'BatchedDatabaseWriter':
+        """
+        Create a writer from the 'database' config section
+
+        Args:
+            db: Database instance
+            config: Configuration dictionary
+
+        Returns:
+            BatchedDatabaseWriter
+        """
+        db_config = config.get('database', {})
+        return cls(
+            db,
+            batch_size=int(db_config.get('batch_size', 100)),
+            flush_interval=float(db_config.get('flush_interval', 1.0)),
+            queue_size=int(db_config.get('queue_size', 10000)),
+        )
+
+    def start(self) -> None:
+        """Start the writer thread"""
+        with self._lock:
+            if self._thread:
+                return
+            self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    def add_pr_record(self, pr_data: Dict, on_commit: Optional[Callable[[], None]] = None) -> None:
+        """
+        Queue a pr_history record, stamped with the current time
+
+        Args:
+            pr_data: Record dictionary (see Database.add_pr_record)
+            on_commit: Called on the writer thread after the record is committed
+        """
+        self._put(('pr_history', {'ts_epoch': int(time.time()), **pr_data}, on_commit))
+
+    def add_agent_run(self, status: str, message: str = "") -> None:
+        """
+        Queue an agent_runs record
+
+        Args:
+            status: Run status (started, stopped, error)
+            message: Optional message
+        """
+        self._put(('agent_runs', (status, message), None))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until everything queued so far has been written
+
+        Args:
+            timeout: Maximum seconds to wait
+
+        Returns:
+            True if the queue was drained in time
+        """
+        if not self.running:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 30) -> None:
+        """
+        Write pending records and stop the writer thread
+
+        Args:
+            timeout: Maximum seconds to wait for the final flush
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if not thread:
+            return
+
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.error(f"❌ Database writer did not finish within {timeout:.0f}s, "
+                         f"~{self._queue.qsize()} record(s) not written")
+        else:
+            logger.debug(f"Database writer stopped ({self.written} written, {self.failed} failed)")
+
+    @property
+    def running(self) -> bool:
+        """Whether the writer thread is active"""
+        return self._thread is not None
+
+    def _put(self, item) -> None:
+        if self.running:
+            self._queue.put(item)
+        else:
+            # Not started or already closed: write through
+            self._write([item])
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            batch, waiters = [], []
+            deadline = time.monotonic() + self.flush_interval
+
+            while True:
+                if item is _STOP:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+
+                if stopping or len(batch) >= self.batch_size:
+                    break
+                if waiters and self._queue.empty():
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+
+        # Drain anything queued after the stop marker
+        leftover = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is not _STOP:
+                leftover.append(item)
+        if leftover:
+            self._write(leftover)
+
+    def _write(self, batch: List[tuple]) -> None:
+        """
+        Write one batch, one transaction per table
+
+        Args:
+            batch: (table, payload, on_commit) tuples
+        """
+        pr_records = [payload for table, payload, _ in batch if table == 'pr_history']
+        agent_runs = [payload for table, payload, _ in batch if table == 'agent_runs']
+
+        try:
+            if pr_records:
+                written = self.db.add_pr_records(pr_records)
+                if written < 0:
+                    self.failed += len(pr_records)
+                else:
+                    self.written += written
+                    self.failed += len(pr_records) - written
+                    # Duplicates were skipped because the row already exists
+                    self._committed([on_commit for table, _, on_commit in batch
+                                     if table == 'pr_history' and on_commit])
+            if agent_runs:
+                written = self.db.add_agent_runs(agent_runs)
+                self.written += written
+                self.failed += len(agent_runs) - written
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Error writing batch of {len(batch)} record(s): {e}", exc_info=True)
+
+    @staticmethod
+    def _committed(callbacks: List[Callable[[], None]]) -> None:
+        """Run the on_commit callbacks of a committed batch"""
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Error in database commit callback: {e}", exc_info=True)
@@ -0,0 +1,128 @@
+"""
+Durable PR job queue - Crash-safe resume of the review pipeline
+"""
+
+import logging
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages in order. 'approved' means the verdict was applied
+# (approve, needs work or decline).
+STAGES = ('new', 'fetched', 'analysed', 'commented', 'approved', 'logged')
+
+# Stages that produce no side effects on Stash, safe to persist in dry run
+DRY_RUN_STAGES = ('fetched', 'analysed')
+
+
+def job_key(pr: Dict, identifiers: Tuple[str, str, int]) -> str:
+    """
+    Build the idempotency key of a review job
+
+    A new commit on the source branch yields a new key, so pushes are
+    reviewed again while restarts resume the existing job.
+
+    Args:
+        pr: Pull request dictionary (inbox payload)
+        identifiers: (project_key, repo_slug, pr_id)
+
+    Returns:
+        'PROJECT/repo#id@commit' key
+    """
+    project_key, repo_slug, pr_id = identifiers
+    revision = pr.get('fromRef', {}).get('latestCommit') or f"v{pr.get('version', 0)}"
+    return f"{project_key}/{repo_slug}#{pr_id}@{revision}"
+
+
+class PRJob:
+    """Review job of one PR revision, persisted after every stage"""
+
+    def __init__(self, store: 'JobStore', key: str, identifiers: Tuple[str, str, int],
+                 stage: str = 'new', state: Optional[Dict] = None):
+        """
+        Initialize PR job
+
+        Args:
+            store: Owning job store
+            key: Idempotency key
+            identifiers: (project_key, repo_slug, pr_id)
+            stage: Last completed stage
+            state: Stored pipeline state (analysis, decision, stats)
+        """
+        self.store = store
+        self.key = key
+        self.identifiers = identifiers
+        self.stage = stage
+        self.state = state or {}
+
+    def done(self, stage: str) -> bool:
+        """
+        Check whether a stage has been completed
+
+        Args:
+            stage: Stage name
+
+        Returns:
+            True if the job already reached the stage
+        """
+        return STAGES.index(self.stage) >= STAGES.index(stage)
+
+    def advance(self, stage: str, **state) -> None:
+        """
+        Mark a stage as completed and persist the job
+
+        Args:
+            stage: Completed stage
+            **state: Pipeline state to store with the job
+        """
+        self.state.update(state)
+        if self.store.dry_run and stage not in DRY_RUN_STAGES:
+            return
+        if not self.done(stage):
+            self.stage = stage
+        self.store.save(self)
+
+
+class JobStore:
+    """Loads and saves PR jobs in the pr_jobs table"""
+
+    def __init__(self, db, dry_run: bool = False):
+        """
+        Initialize job store
+
+        Args:
+            db: Database instance
+            dry_run: Do not persist stages that post to Stash
+        """
+        self.db = db
+        self.dry_run = dry_run
+
+    def load(self, pr: Dict, identifiers: Tuple[str, str, int]) -> PRJob:
+        """
+        Load the job of a PR revision, or start a new one
+
+        Args:
+            pr: Pull request dictionary
+            identifiers: (project_key, repo_slug, pr_id)
+
+        Returns:
+            PRJob (resumed if a previous run stored progress)
+        """
+        key = job_key(pr, identifiers)
+        record = self.db.get_pr_job(key)
+        if not record:
+            return PRJob(self, key, identifiers)
+
+        if record['stage'] != 'logged':
+            logger.info(f"♻️  Resuming PR #{identifiers[2]} after stage '{record['stage']}'")
+        return PRJob(self, key, identifiers, record['stage'], record['state'])
+
+    def save(self, job: PRJob) -> None:
+        """
+        Persist a job
+
+        Args:
+            job: PR job
+        """
+        project_key, repo_slug, pr_id = job.identifiers
+        self.db.save_pr_job(job.key, project_key, repo_slug, pr_id, job.stage, job.state)
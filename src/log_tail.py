@@ -0,0 +1,133 @@
+"""
+Log tailing - Read the end of a growing log without reading the whole file
+"""
+
+import os
+import threading
+from collections import deque
+from pathlib import Path
+from typing import List, Optional
+
+BLOCK_SIZE = 8192
+
+
+def tail_lines(path: Path, lines: int, block_size: int = BLOCK_SIZE) -> List[str]:
+    """
+    Read the last N lines by seeking backwards block by block
+
+    Args:
+        path: Log file path
+        lines: Number of lines
+        block_size: Bytes read per step
+
+    Returns:
+        Last lines (without line endings), oldest first
+    """
+    with open(path, 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        chunks = []
+        newlines = 0
+
+        # One extra newline: the last line usually ends with one
+        while position > 0 and newlines <= lines:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            chunk = f.read(step)
+            chunks.append(chunk)
+            newlines += chunk.count(b'\n')
+
+    data = b''.join(reversed(chunks))
+    text = data.decode('utf-8', errors='replace')
+    result = text.splitlines()
+    return result[-lines:] if lines > 0 else []
+
+
+class LogFollower:
+    """
+    Incremental tail -F of a log file
+
+    Remembers the read offset and only reads bytes appended since the last
+    call. A changed inode (rotation) or a shrinking file (truncation)
+    restarts from a backwards tail. Bursts larger than max_read_bytes are
+    skipped the same way, so every call costs at most a few blocks.
+    """
+
+    def __init__(self, path: Path, max_lines: int = 500,
+                 max_read_bytes: int = 1024 * 1024):
+        """
+        Initialize log follower
+
+        Args:
+            path: Log file path
+            max_lines: Lines kept in memory (largest tail that can be shown)
+            max_read_bytes: Larger appends are re-tailed instead of read
+        """
+        self.path = Path(path)
+        self.max_lines = max_lines
+        self.max_read_bytes = max_read_bytes
+
+        self._lines: deque = deque(maxlen=max_lines)
+        self._partial = b''
+        self._offset = 0
+        self._inode: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def read(self, lines: int = 100) -> Optional[List[str]]:
+        """
+        Get the last N lines, reading only what was appended
+
+        Args:
+            lines: Number of lines (at most max_lines)
+
+        Returns:
+            Last lines, oldest first, or None if the file does not exist
+        """
+        with self._lock:
+            try:
+                stat = self.path.stat()
+            except FileNotFoundError:
+                self._inode = None
+                return None
+
+            rotated = stat.st_ino != self._inode
+            truncated = stat.st_size < self._offset
+            burst = stat.st_size - self._offset > self.max_read_bytes
+
+            if rotated or truncated or burst:
+                self._reload(stat)
+            elif stat.st_size > self._offset:
+                self._read_appended(stat.st_size)
+
+            tail = list(self._lines)
+            if self._partial:
+                tail.append(self._partial.decode('utf-8', errors='replace'))
+            return tail[-lines:] if lines > 0 else []
+
+    def _reload(self, stat: os.stat_result) -> None:
+        """Start over from a backwards tail of the current file"""
+        self._lines.clear()
+        self._lines.extend(tail_lines(self.path, self.max_lines))
+        self._partial = b''
+        if self._lines and not self._ends_with_newline(stat.st_size):
+            # Unterminated last line, keep it open for the next append
+            self._partial = self._lines.pop().encode('utf-8')
+        self._offset = stat.st_size
+        self._inode = stat.st_ino
+
+    def _ends_with_newline(self, size: int) -> bool:
+        with open(self.path, 'rb') as f:
+            f.seek(size - 1)
+            return f.read(1) == b'\n'
+
+    def _read_appended(self, size: int) -> None:
+        """Read bytes appended since the last call"""
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            data = self._partial + f.read(size - self._offset)
+            self._offset = f.tell()
+
+        *complete, self._partial = data.split(b'\n')
+        for line in complete:
+            self._lines.append(line.rstrip(b'\r').decode('utf-8', errors='replace'))
@@ -5,7 +5,9 @@ Main application entry point
 import os
 import sys
 import time
+import asyncio
 import logging
+import tempfile
 from pathlib import Path
 from typing import Dict, Optional
 import schedule
@@ -22,6 +24,19 @@ from ai_agent import AIAgent
 from ollama_agent import OllamaAgent
 from pr_analyzer import PRAnalyzer
 from database import Database
+from pr_scheduler import PRScheduler
+from cycle_scheduler import CycleRunner
+from sharding import ShardCoordinator
+from job_queue import JobStore
+from db_writer import BatchedDatabaseWriter
+from retention import RetentionManager
+from agent_status import StatusReporter
+from metrics import REGISTRY, MetricsServer
+from tracing import TRACER
+from traffic_recorder import TRAFFIC
+from profiling import PROFILER
+from rate_limiter import StashThrottle
+from review_pipeline import BlockingIO, ReviewPipeline
 
 logger = logging.getLogger(__name__)
 
@@ -49,13 +64,33 @@ class StashAgentApp:
         logger.info("Gordion AI Code Review Agent Starting...")
         logger.info("=" * 60)
         
-        # Initialize database
-        self.db = Database()
+        # Record or replay Stash/LLM traffic (traffic.mode)
+        TRAFFIC.configure(self.config)
+        
+        # Initialize database; history writes are batched in the background.
+        # A replay runs the real pipeline, so its jobs and history go to a
+        # throwaway database instead of the production one
+        self._replay_dir = None
+        if TRAFFIC.replaying:
+            self._replay_dir = tempfile.TemporaryDirectory(prefix='gordion-replay-')
+            self.db = Database(str(Path(self._replay_dir.name) / 'pr_history.db'))
+            logger.info(f"Replay: using a temporary database in {self._replay_dir.name}")
+        else:
+            self.db = Database()
+        self.db_writer = BatchedDatabaseWriter.from_config(self.db, self.config)
+        self.db_writer.start()
+        self.retention = RetentionManager(self.db, self.config)
         
         # Initialize clients
         self.stash_client = self._init_stash_client()
         self.ai_agent = self._init_ai_agent()
         self.pr_analyzer = PRAnalyzer(self.config)
+        self.scheduler = PRScheduler(
+            self.config,
+            rules_manager=getattr(self.ai_agent, 'rules_manager', None),
+            username=self.stash_client.username
+        )
+        self.scheduler.seed_size_hints(self.db.get_pr_size_hints())
         
         # Configuration
         self.check_interval = int(os.getenv('CHECK_INTERVAL', 
@@ -63,6 +98,54 @@ class StashAgentApp:
         self.dry_run = os.getenv('DRY_RUN', 
                                 str(self.config.get('dry_run', False))).lower() == 'true'
         
+        self.cycle_runner = CycleRunner(self.config, self.check_interval)
+        
+        # Durable per-PR pipeline state (resume after crash/restart)
+        self.jobs = JobStore(self.db, dry_run=self.dry_run)
+        if self.retention.job_days > 0:
+            self.db.purge_pr_jobs(older_than_days=self.retention.job_days)
+        
+        # Coordination with other agent instances (none, hash or lease)
+        self.sharding = ShardCoordinator(self.config, self.db)
+        self.sharding.start_heartbeat()
+        
+        # 'sync' (default) or 'async' (asyncio event loop, many PRs in flight)
+        self.runtime = os.getenv('RUNTIME', self.config.get('runtime', 'sync')).lower()
+        
+        # Heartbeat, live progress and dashboard commands through the shared DB
+        self.status = StatusReporter(
+            self.db, self.config,
+            instance_id=self.sharding.instance_id,
+            model=getattr(self.ai_agent, 'model', ''),
+            runtime=self.runtime
+        )
+        self.status.start()
+        breaker = getattr(self.ai_agent, 'breaker', None)
+        if breaker:
+            self.status.update(llm_circuit=breaker.state)
+            breaker.listeners.append(lambda state: self.status.update(llm_circuit=state))
+        
+        # Prometheus /metrics endpoint (metrics.enabled)
+        REGISTRY.gauge('queue_depth', 'PRs left in the current cycle').set_function(
+            lambda: self.status.snapshot()['queue_depth'])
+        REGISTRY.gauge('prs_in_flight', 'PRs being processed right now').set_function(
+            lambda: len(self.status.snapshot()['in_flight']))
+        self.metrics_server = MetricsServer.from_config(self.config)
+        if self.metrics_server:
+            self.metrics_server.start()
+        
+        # Per-PR span waterfalls (pr_traces table, JSONL and/or OTLP)
+        TRACER.configure(self.config, self.db)
+        
+        # On-demand profiling: SIGUSR1 or dashboard 'profile' / 'profile_pr:PROJECT/repo/ID'
+        PROFILER.configure(self.config)
+        PROFILER.install_signal_handler()
+        self.status.register_command('profile', PROFILER.handle_command)
+        self.status.register_command('profile_pr', PROFILER.handle_command)
+        
+        # Per-PR review steps, shared with the async runtime
+        self.pipeline = ReviewPipeline(self, BlockingIO(self.stash_client), BlockingIO(self.ai_agent))
+        
         if self.dry_run:
             logger.warning("🔸 DRY RUN MODE - Will not actually approve PRs")
     
@@ -89,14 +172,16 @@ class StashAgentApp:
             sys.exit(1)
         
         logger.info(f"Initializing Stash client for: {stash_url}")
+        throttle = StashThrottle.from_config(self.config)
         
         # Prefer token over username/password
         if stash_token:
             logger.info("Using Personal Access Token authentication")
-            return StashClient(stash_url, token=stash_token, username=stash_username)
+            return StashClient(stash_url, token=stash_token, username=stash_username, throttle=throttle)
         elif stash_username and stash_password:
             logger.info(f"Using Basic Authentication for user: {stash_username}")
-            return StashClient(stash_url, username=stash_username, password=stash_password)
+            return StashClient(stash_url, username=stash_username, password=stash_password,
+                               throttle=throttle)
         else:
             logger.error("Missing Stash authentication in .env file")
             logger.error("Provide either:")
@@ -147,11 +232,16 @@ class StashAgentApp:
         agent = OllamaAgent(
             base_url=ollama_url,
             model=ollama_model,
-            temperature=ai_config.get('temperature', 0.3)
+            temperature=ai_config.get('temperature', 0.3),
+            keep_alive=ai_config.get('keep_alive'),
+            num_ctx=ai_config.get('num_ctx')
         )
+        agent.breaker.configure(self.config)
         
         # Check Ollama connection
         if not agent.check_connection():
+            # Start with the circuit open so the first cycle does not wait out timeouts
+            agent.breaker.trip()
             logger.warning("⚠️  Cannot connect to Ollama server")
             logger.warning("💡 Make sure Ollama is running: brew install ollama && ollama serve")
             logger.warning("⚠️  Continuing anyway - will use fallback approval if needed")
@@ -164,6 +254,7 @@ class StashAgentApp:
     
     def process_pull_requests(self) -> None:
         """Main processing loop - check and process PRs"""
+        self.status.update(state='processing')
         try:
             logger.info("-" * 60)
             logger.info("Checking for assigned pull requests...")
@@ -175,428 +266,97 @@ class StashAgentApp:
                 logger.info("No assigned pull requests found")
                 return
             
-            logger.info(f"Processing {len(pull_requests)} pull request(s)...")
-            
-            for pr in pull_requests:
-                self._process_single_pr(pr)
-                
-        except Exception as e:
-            logger.error(f"Error processing pull requests: {e}", exc_info=True)
-    
-    def _handle_rejection(self, pr_details: Dict, project_key: str, repo_slug: str, 
-                         pr_id: int, analysis: Optional[Dict], reason: str) -> None:
-        """
-        Handle PR rejection with comment and/or decline
-        
-        Args:
-            pr_details: PR details dictionary
-            project_key: Project key
-            repo_slug: Repository slug
-            pr_id: PR ID
-            analysis: AI analysis result (can be None)
-            reason: Rejection reason
-        """
-        try:
-            comment_on_reject = self.config.get('approval_criteria', {}).get('comment_on_reject', True)
-            mark_needs_work = self.config.get('approval_criteria', {}).get('mark_needs_work_on_reject', True)
-            decline_on_reject = self.config.get('approval_criteria', {}).get('decline_on_reject', False)
-            add_inline_comments = self.config.get('approval_criteria', {}).get('add_inline_comments_on_reject', True)
-            
-            # Add inline comments on file changes (if enabled)
-            if add_inline_comments and isinstance(self.ai_agent, OllamaAgent):
-                self._add_inline_comments(pr_details, project_key, repo_slug, pr_id)
-            
-            # Build rejection comment
-            if comment_on_reject:
-                comment = self._build_rejection_comment(analysis, reason)
-                
-                if self.dry_run:
-                    logger.info("🔸 DRY RUN - Would have added rejection comment:")
-                    logger.info(f"   {comment[:200]}...")
-                else:
-                    logger.info("💬 Adding rejection comment to PR...")
-                    if self.stash_client.add_comment_to_pull_request(
-                        project_key, repo_slug, pr_id, comment
-                    ):
-                        logger.info("✅ Rejection comment added")
-                    else:
-                        logger.error("❌ Failed to add rejection comment")
-            
-            # Mark as "Needs Work" if configured
-            if mark_needs_work:
-                if self.dry_run:
-                    logger.warning("🔸 DRY RUN - Would have marked PR as NEEDS WORK")
-                else:
-                    logger.warning("⚠️  Marking PR as NEEDS WORK...")
-                    if self.stash_client.mark_needs_work(project_key, repo_slug, pr_id):
-                        logger.warning("⚠️  PR marked as NEEDS WORK")
-                    else:
-                        logger.error("❌ Failed to mark PR as needs work")
-            
-            # Decline PR if configured (more aggressive than needs_work)
-            if decline_on_reject:
-                if self.dry_run:
-                    logger.warning("🔸 DRY RUN - Would have DECLINED this PR")
-                else:
-                    logger.warning("⛔ Declining PR...")
-                    pr_version = pr_details.get('version', 0)
-                    if self.stash_client.decline_pull_request(
-                        project_key, repo_slug, pr_id, pr_version
-                    ):
-                        logger.warning("⛔ PR has been DECLINED")
-                    else:
-                        logger.error("❌ Failed to decline PR")
-            
-            # Log rejection to database
-            status = 'declined' if decline_on_reject else 'needs_work' if mark_needs_work else 'rejected'
-            stats = self.pr_analyzer.calculate_pr_stats(pr_details)
-            self._log_pr_to_database(pr_details, project_key, repo_slug, pr_id, 
-                                    status, analysis, stats)
-                        
-        except Exception as e:
-            logger.error(f"Error handling rejection: {e}", exc_info=True)
-    
-    def _add_inline_comments(self, pr_details: Dict, project_key: str, repo_slug: str, pr_id: int) -> None:
-        """
-        Add inline comments to specific code changes
-        
-        Args:
-            pr_details: Full PR details with changes
-            project_key: Project key
-            repo_slug: Repository slug
-            pr_id: PR ID
-        """
-        try:
-            changes = pr_details.get('changes', [])
-            if not changes:
-                logger.debug("No changes to analyze for inline comments")
-                return
-            
-            logger.info(f"🔍 Analyzing {len(changes)} file(s) for inline comments...")
+            # Keep only PRs owned by this instance
+            pull_requests = self.sharding.filter(pull_requests)
             
-            total_comments_added = 0
+            logger.info(f"Processing {len(pull_requests)} pull request(s)...")
+            self.status.update(queue_depth=len(pull_requests))
             
-            # Analyze each file
-            for file_change in changes[:10]:  # Limit to first 10 files
-                file_path = file_change.get('path', 'unknown')
-                hunks = file_change.get('hunks', [])
-                
-                if not hunks:
-                    continue
-                
-                # Skip certain file types
-                if file_path.endswith(('.json', '.xml', '.md', '.txt', '.yml', '.yaml')):
-                    logger.debug(f"Skipping non-code file: {file_path}")
-                    continue
-                
-                logger.debug(f"Analyzing file: {file_path}")
-                
-                # Get AI suggestions for this file
-                file_analysis = self.ai_agent.analyze_file_changes(file_path, hunks)
-                
-                if not file_analysis or not file_analysis.get('comments'):
-                    continue
-                
-                # Add inline comments
-                for comment_item in file_analysis['comments']:
-                    line_num = comment_item.get('line', 0)
-                    comment_text = comment_item.get('comment', '')
-                    severity = comment_item.get('severity', 'info')
-                    
-                    if not line_num or not comment_text:
-                        continue
-                    
-                    # Add severity emoji
-                    severity_emoji = {
-                        'critical': '🔴',
-                        'warning': '⚠️',
-                        'info': 'ℹ️'
-                    }.get(severity, 'ℹ️')
-                    
-                    formatted_comment = f"{severity_emoji} **Gordion AI Review**\n\n{comment_text}"
-                    
-                    if self.dry_run:
-                        logger.info(f"🔸 DRY RUN - Would add inline comment to {file_path}:{line_num}")
-                        logger.info(f"   {formatted_comment[:100]}...")
-                    else:
-                        if self.stash_client.add_inline_comment(
-                            project_key, repo_slug, pr_id,
-                            file_path, line_num, formatted_comment
-                        ):
-                            total_comments_added += 1
-                            logger.info(f"📝 Added inline comment to {file_path}:{line_num}")
+            # Shortest-job-first with aging
+            pull_requests = self.scheduler.order(pull_requests)
             
-            if total_comments_added > 0:
-                logger.info(f"✅ Added {total_comments_added} inline comment(s) to PR")
-            else:
-                logger.info("ℹ️  No inline comments needed")
+            # Time-boxed cycle, unfinished PRs carry over to the next one
+            summary = self.cycle_runner.run_cycle(pull_requests, self._process_claimed_pr)
+            self.status.update(last_cycle=summary)
                 
         except Exception as e:
-            logger.error(f"Error adding inline comments: {e}", exc_info=True)
-    
-    def _log_pr_to_database(self, pr_details: Dict, project_key: str, repo_slug: str, 
-                           pr_id: int, status: str, analysis: Optional[Dict], stats: Dict) -> None:
-        """
-        Log PR to database for history tracking
-        
-        Args:
-            pr_details: PR details
-            project_key: Project key
-            repo_slug: Repository slug
-            pr_id: PR ID
-            status: Status (approved, rejected, needs_work, declined)
-            analysis: AI analysis result
-            stats: PR statistics
-        """
-        try:
-            author_user = pr_details.get('author', {}).get('user', {})
-            author_name = author_user.get('displayName', author_user.get('name', 'Unknown'))
-            
-            pr_data = {
-                'pr_id': pr_id,
-                'project_key': project_key,
-                'repo_slug': repo_slug,
-                'title': pr_details.get('title', 'No title'),
-                'author': author_name,
-                'status': status,
-                'confidence_score': analysis.get('confidence_score', 0) if analysis else 0,
-                'reasoning': analysis.get('reasoning', '') if analysis else '',
-                'concerns': analysis.get('concerns', []) if analysis else [],
-                'files_changed': stats.get('files_changed', 0),
-                'additions': stats.get('additions', 0),
-                'deletions': stats.get('deletions', 0),
-                'ai_model': getattr(self.ai_agent, 'model', 'unknown')
-            }
-            
-            self.db.add_pr_record(pr_data)
-            logger.debug(f"PR #{pr_id} logged to database")
-        except Exception as e:
-            logger.error(f"Error logging PR to database: {e}", exc_info=True)
-    
-    def _build_rejection_comment(self, analysis: Optional[Dict], reason: str) -> str:
-        """
-        Build rejection comment based on AI analysis
-        
-        Args:
-            analysis: AI analysis result (can be None)
-            reason: Rejection reason
-            
-        Returns:
-            Comment text
-        """
-        if not analysis:
-            return f"""🤖 **AI Code Review - NOT APPROVED**
-
-**Reason:** {reason}
-
-⚠️ This PR was not automatically approved. Please review the changes carefully.
-
-*Automated by Stash PR Agent*"""
-        
-        confidence = analysis.get('confidence_score', 0)
-        reasoning = analysis.get('reasoning', 'No specific reasoning provided')
-        concerns = analysis.get('concerns', [])
-        
-        comment = f"""🤖 **AI Code Review - NOT APPROVED**
-
-**Confidence:** {confidence}%
-
-**Analysis:**
-{reasoning}
-"""
-        
-        if concerns:
-            comment += f"\n**⚠️ Concerns:**\n"
-            for concern in concerns:
-                comment += f"- {concern}\n"
-        
-        comment += "\n---\n*Please address these issues before merging.*\n"
-        comment += f"*Automated by Gordion PR Agent using {getattr(self.ai_agent, 'model', 'AI')}*"
-        
-        return comment
+            logger.error(f"Error processing pull requests: {e}", exc_info=True)
+        finally:
+            # Daily compaction/archival, between cycles
+            self.retention.run_if_due()
+            self.status.update(state='idle', cycle=self.cycle_runner.cycles, queue_depth=0)
     
-    def _process_single_pr(self, pr: Dict) -> None:
+    def _process_claimed_pr(self, pr: Dict) -> None:
         """
-        Process a single pull request
+        Review a PR on the calling thread (see ReviewPipeline.run)
         
         Args:
             pr: Pull request dictionary
         """
-        try:
-            # Extract identifiers
-            identifiers = self.pr_analyzer.extract_pr_identifiers(pr)
-            if not identifiers:
-                logger.error("Could not extract PR identifiers")
-                return
-            
-            project_key, repo_slug, pr_id = identifiers
-            
-            logger.info(f"\n{'='*50}")
-            logger.info(f"📋 Processing PR #{pr_id}: {pr.get('title', 'No title')}")
-            logger.info(f"   Repository: {project_key}/{repo_slug}")
-            logger.info(f"   Author: {pr.get('author', {}).get('user', {}).get('displayName', 'Unknown')}")
-            
-            # Check if already approved by us
-            approval_status = self.stash_client.check_my_approval_status(
-                project_key, repo_slug, pr_id
-            )
-            
-            if approval_status == 'APPROVED':
-                logger.info(f"✅ Already approved this PR, skipping...")
-                return
-            
-            # Get detailed information
-            logger.info("Fetching PR details...")
-            pr_details = self.stash_client.get_pull_request_details(
-                project_key, repo_slug, pr_id
-            )
-            
-            if not pr_details:
-                logger.error("Could not fetch PR details")
-                return
-            
-            # Get changes
-            changes = self.stash_client.get_pull_request_changes(
-                project_key, repo_slug, pr_id
-            )
-            pr_details['changes'] = changes
-            
-            # Get diff
-            diff = self.stash_client.get_pull_request_diff(
-                project_key, repo_slug, pr_id
-            )
-            pr_details['diff'] = diff
-            
-            # Debug: Print diff info
-            if diff:
-                diff_lines = len(diff.split('\n'))
-                logger.info(f"   📄 Diff retrieved: {diff_lines} lines")
-                logger.debug(f"   First 500 chars of diff:\n{diff[:500]}")
-            else:
-                logger.warning(f"   ⚠️  Diff is empty or None!")
-            
-            # Get activities
-            activities = self.stash_client.get_pull_request_activities(
-                project_key, repo_slug, pr_id
-            )
-            pr_details['activities'] = activities
-            
-            # Calculate stats
-            stats = self.pr_analyzer.calculate_pr_stats(pr_details)
-            logger.info(f"   Stats: {stats['files_changed']} files, "
-                       f"+{stats['additions']} -{stats['deletions']} lines")
-            
-            # Debug: Print changes info
-            logger.info(f"   📦 Changes retrieved: {len(changes)} file(s)")
-            if changes:
-                for i, change in enumerate(changes[:3]):  # First 3 files
-                    file_path = change.get('path', 'unknown')
-                    change_type = change.get('type', 'MODIFY')
-                    hunks_count = len(change.get('hunks', []))
-                    logger.info(f"      {i+1}. {change_type}: {file_path} ({hunks_count} hunk(s))")
-            
-            # Check basic criteria
-            should_analyze, reason = self.pr_analyzer.should_analyze_pr(pr_details)
-            if not should_analyze:
-                logger.warning(f"⚠️  Skipping PR: {reason}")
-                return
-            
-            # Check if this is an oversized PR
-            from pr_analyzer import is_oversized_pr
-            is_oversized = is_oversized_pr(pr_details, self.config)
-            auto_approve_oversized = self.config.get('approval_criteria', {}).get('auto_approve_oversized', False)
-            
-            analysis = None
-            fallback_reason = ""
-            
-            if is_oversized and auto_approve_oversized:
-                logger.warning(f"⚠️  PR boyutu limit aşımı - AI analizi atlanıyor")
-                logger.info(f"✅ Oversized PR otomatik approve (ayarlardan etkin)")
-                fallback_reason = "oversized PR, AI analysis skipped"
-                should_approve = True
-                approve_reason = f"Oversized PR auto-approved: {stats['files_changed']} files, {stats['total_changes']} lines"
-            else:
-                # AI Analysis
-                logger.info("🤖 Running AI analysis...")
-                analysis = self.ai_agent.analyze_pull_request(pr_details)
-                
-                if analysis:
-                    logger.info(f"   AI Decision: {'✅ APPROVE' if analysis.get('approve') else '❌ DO NOT APPROVE'}")
-                    logger.info(f"   Confidence: {analysis.get('confidence_score')}%")
-                    logger.info(f"   Reasoning: {analysis.get('reasoning')}")
-                    
-                    if analysis.get('concerns'):
-                        logger.warning(f"   Concerns: {', '.join(analysis.get('concerns'))}")
-                else:
-                    logger.error("❌ AI analysis failed")
-                    auto_approve_on_failure = self.config.get('approval_criteria', {}).get('auto_approve_on_ai_failure', False)
-                    if auto_approve_on_failure:
-                        logger.warning("⚠️  AI hatası - ancak otomatik onay aktif")
-                        fallback_reason = "AI service unavailable"
-                    else:
-                        logger.info("❌ AI hatası ve otomatik onay kapalı - PR atlanıyor")
-                        return
-                
-                # Check if should approve
-                should_approve, approve_reason = self.pr_analyzer.should_approve_based_on_ai(analysis, pr_details)
-                
-                if not should_approve:
-                    logger.info(f"❌ Not approving: {approve_reason}")
-                    
-                    # Handle rejection based on config
-                    self._handle_rejection(pr_details, project_key, repo_slug, pr_id, analysis, approve_reason)
-                    return
-            
-            logger.info(f"✅ Decision: APPROVE - {approve_reason}")
-            
-            # Approve PR
-            if self.dry_run:
-                logger.info("🔸 DRY RUN - Would have approved this PR")
-                # Log to database even in dry run
-                self._log_pr_to_database(pr_details, project_key, repo_slug, pr_id, 
-                                        'approved', analysis, stats)
-            else:
-                # Add comment
-                comment = self.ai_agent.get_approval_comment(analysis, fallback_reason)
-                comment_success = self.stash_client.add_comment_to_pull_request(
-                    project_key, repo_slug, pr_id, comment
-                )
-                
-                # Approve
-                if self.stash_client.approve_pull_request(project_key, repo_slug, pr_id):
-                    logger.info("🎉 Successfully approved PR!")
-                    # Log to database
-                    self._log_pr_to_database(pr_details, project_key, repo_slug, pr_id, 
-                                            'approved', analysis, stats)
-                else:
-                    logger.error("Failed to approve PR")
-                    
-        except Exception as e:
-            logger.error(f"Error processing PR: {e}", exc_info=True)
+        asyncio.run(self.pipeline.run(pr))
+    
+    def _async_runtime(self):
+        """Create the asyncio runtime (imported lazily, needs httpx)"""
+        from async_runtime import AsyncAgentRuntime
+        return AsyncAgentRuntime(self)
     
     def run_once(self) -> None:
         """Run once and exit"""
         logger.info("Running in single-run mode...")
-        self.process_pull_requests()
+        try:
+            if self.runtime == 'async':
+                asyncio.run(self._async_runtime().run_once())
+            else:
+                self.process_pull_requests()
+        finally:
+            self._shutdown()
         logger.info("Single run completed")
     
+    def _shutdown(self) -> None:
+        """Release leases, flush buffered database writes, traces and recorded traffic, publish 'stopped', stop /metrics and drop a replay database"""
+        self.sharding.stop_heartbeat()
+        self.db_writer.close()
+        self.status.stop()
+        TRACER.flush()
+        TRAFFIC.close()
+        if self.metrics_server:
+            self.metrics_server.stop()
+        if self._replay_dir:
+            self.db.close()
+            self._replay_dir.cleanup()
+    
     def run_continuous(self) -> None:
         """Run continuously with scheduled checks"""
         logger.info(f"Running in continuous mode (check every {self.check_interval}s)")
         
+        if self.runtime == 'async':
+            logger.info("Using asyncio runtime")
+            try:
+                asyncio.run(self._async_runtime().run_forever())
+            except KeyboardInterrupt:
+                logger.info("Shutting down gracefully...")
+            finally:
+                self._shutdown()
+            return
+        
         # Schedule the job
         schedule.every(self.check_interval).seconds.do(self.process_pull_requests)
         
         # Run immediately on start
         self.process_pull_requests()
         
-        # Keep running
+        # Keep running until Ctrl+C or a 'stop' command from the dashboard
         try:
-            while True:
+            while not self.status.stop_requested.is_set():
+                if self.status.take_run_now():
+                    self.process_pull_requests()
                 schedule.run_pending()
-                time.sleep(1)
+                self.status.wait(1)
+            logger.info("Stop requested from dashboard, shutting down...")
         except KeyboardInterrupt:
             logger.info("Shutting down gracefully...")
+        finally:
+            self._shutdown()
 
 
 def main():
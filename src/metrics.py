@@ -0,0 +1,464 @@
+"""
+Lightweight in-process metrics with a Prometheus /metrics endpoint
+"""
+
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bucket upper bounds in seconds, suited for PR and cycle durations
+DEFAULT_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+# Bucket upper bounds in seconds, suited for HTTP calls
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class _Metric:
+    """
+    Base class for metrics with optional labels
+
+    A metric declared with labelnames holds one child per combination of
+    label values; labels() returns (and creates) the child, which records
+    values like an unlabelled metric.
+    """
+
+    TYPE = ''
+
+    def __init__(self, name: str, description: str = "", labelnames: Sequence[str] = ()):
+        """
+        Initialize metric
+
+        Args:
+            name: Metric name
+            description: Human readable description
+            labelnames: Label names (values are passed to labels())
+        """
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], '_Metric'] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values, **kwargs) -> '_Metric':
+        """
+        Get the child metric for a combination of label values
+
+        Args:
+            *values: Label values in labelnames order
+            **kwargs: Label values by name
+
+        Returns:
+            Child metric
+        """
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        values = tuple(str(value) for value in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+
+        with self._lock:
+            child = self._children.get(values)
+            if child is None:
+                child = self._new_child()
+                self._children[values] = child
+            return child
+
+    def _new_child(self) -> '_Metric':
+        return type(self)(self.name, self.description)
+
+    def _check_unlabelled(self) -> None:
+        if self.labelnames:
+            raise ValueError(f"{self.name} has labels {self.labelnames}, use labels() first")
+
+    def _samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """(name suffix, extra labels, value) of an unlabelled metric"""
+        raise NotImplementedError
+
+    def collect(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """
+        Get all samples of this metric
+
+        Returns:
+            List of (sample name, labels, value)
+        """
+        if not self.labelnames:
+            return [(self.name + suffix, labels, value) for suffix, labels, value in self._samples()]
+
+        with self._lock:
+            children = sorted(self._children.items())
+        samples = []
+        for values, child in children:
+            base = dict(zip(self.labelnames, values))
+            for suffix, labels, value in child._samples():
+                samples.append((self.name + suffix, {**base, **labels}, value))
+        return samples
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter (thread-safe)"""
+
+    TYPE = 'counter'
+
+    def __init__(self, name: str, description: str = "", labelnames: Sequence[str] = ()):
+        super().__init__(name, description, labelnames)
+        self._value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        """
+        Increase the counter
+
+        Args:
+            amount: Non-negative increment
+        """
+        self._check_unlabelled()
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        """Current value"""
+        return self._value
+
+    def _samples(self):
+        return [('', {}, self._value)]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or be read from a callback (thread-safe)"""
+
+    TYPE = 'gauge'
+
+    def __init__(self, name: str, description: str = "", labelnames: Sequence[str] = ()):
+        super().__init__(name, description, labelnames)
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float) -> None:
+        """Set the gauge"""
+        self._check_unlabelled()
+        with self._lock:
+            self._value = float(value)
+
+    def inc(self, amount: float = 1) -> None:
+        """Increase the gauge"""
+        self._check_unlabelled()
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        """Decrease the gauge"""
+        self.inc(-amount)
+
+    def set_function(self, fn: Callable[[], float]) -> None:
+        """
+        Read the value from fn at collection time
+
+        Args:
+            fn: Function returning the current value
+        """
+        self._check_unlabelled()
+        self._function = fn
+
+    @property
+    def value(self) -> float:
+        """Current value"""
+        if self._function:
+            try:
+                return float(self._function())
+            except Exception as e:
+                logger.debug(f"Gauge {self.name} callback failed: {e}")
+                return float('nan')
+        return self._value
+
+    def _samples(self):
+        return [('', {}, self.value)]
+
+
+class Histogram(_Metric):
+    """Cumulative bucket histogram (thread-safe)"""
+
+    TYPE = 'histogram'
+
+    def __init__(self, name: str, description: str = "",
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, labelnames: Sequence[str] = ()):
+        """
+        Initialize histogram
+
+        Args:
+            name: Metric name
+            description: Human readable description
+            buckets: Sorted bucket upper bounds
+            labelnames: Label names (values are passed to labels())
+        """
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+
+    def _new_child(self) -> 'Histogram':
+        return Histogram(self.name, self.description, self.buckets)
+
+    def observe(self, value: float) -> None:
+        """
+        Record an observation
+
+        Args:
+            value: Observed value
+        """
+        self._check_unlabelled()
+        with self._lock:
+            index = len(self.buckets)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    index = i
+                    break
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    @property
+    def count(self) -> int:
+        """Number of observations"""
+        return self._count
+
+    @property
+    def sum(self) -> float:
+        """Sum of all observations"""
+        return self._sum
+
+    def snapshot(self) -> Dict:
+        """
+        Get a consistent copy of the histogram state
+
+        Returns:
+            Dictionary with cumulative buckets, count and sum
+        """
+        with self._lock:
+            cumulative = []
+            running = 0
+            for bound, count in zip(list(self.buckets) + [float('inf')], self._counts):
+                running += count
+                cumulative.append((bound, running))
+            return {'buckets': cumulative, 'count': self._count, 'sum': self._sum}
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Estimate a percentile from bucket boundaries
+
+        Args:
+            q: Quantile between 0 and 1
+
+        Returns:
+            Upper bound of the bucket holding the quantile, or None if empty
+        """
+        snapshot = self.snapshot()
+        if not snapshot['count']:
+            return None
+
+        target = q * snapshot['count']
+        for bound, cumulative in snapshot['buckets']:
+            if cumulative >= target:
+                return bound
+        return float('inf')
+
+    def summary(self) -> str:
+        """
+        Format a one-line summary for logs
+
+        Returns:
+            Summary string
+        """
+        if not self._count:
+            return f"{self.name}: no samples"
+
+        parts: List[str] = [f"{self.name}: n={self._count}", f"avg={self._sum / self._count:.1f}s"]
+        for q in (0.5, 0.95):
+            value = self.percentile(q)
+            label = f"p{int(q * 100)}"
+            parts.append(f"{label}<={value:g}s" if value != float('inf') else f"{label}>{self.buckets[-1]:g}s")
+        return ", ".join(parts)
+
+    def _samples(self):
+        snapshot = self.snapshot()
+        samples = [('_bucket', {'le': _format_value(bound)}, count) for bound, count in snapshot['buckets']]
+        samples.append(('_sum', {}, snapshot['sum']))
+        samples.append(('_count', {}, snapshot['count']))
+        return samples
+
+
+class Registry:
+    """Named metrics of this process, rendered in Prometheus text format"""
+
+    def __init__(self, namespace: str = ""):
+        """
+        Initialize registry
+
+        Args:
+            namespace: Prefix added to every metric name on export
+        """
+        self.namespace = namespace
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs) -> _Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, *args, **kwargs)
+                self._metrics[name] = metric
+            elif type(metric) is not cls:
+                raise ValueError(f"Metric {name} is already registered as a {metric.TYPE}")
+            return metric
+
+    def counter(self, name: str, description: str = "", labelnames: Sequence[str] = ()) -> Counter:
+        """Get or create a counter"""
+        return self._get_or_create(Counter, name, description, labelnames)
+
+    def gauge(self, name: str, description: str = "", labelnames: Sequence[str] = ()) -> Gauge:
+        """Get or create a gauge"""
+        return self._get_or_create(Gauge, name, description, labelnames)
+
+    def histogram(self, name: str, description: str = "", labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Get or create a histogram"""
+        return self._get_or_create(Histogram, name, description, buckets, labelnames)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        """Get a registered metric by name"""
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format
+
+        Returns:
+            Exposition text
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+
+        prefix = f"{self.namespace}_" if self.namespace else ""
+        lines = []
+        for metric in metrics:
+            name = prefix + metric.name
+            lines.append(f"# HELP {name} {metric.description}")
+            lines.append(f"# TYPE {name} {metric.TYPE}")
+            for sample, labels, value in metric.collect():
+                lines.append(f"{prefix}{sample}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry served on /metrics
+REGISTRY = Registry(namespace='gordion')
+
+# Shared by every cache the agent consults (hit rate = hit / (hit + miss))
+CACHE_LOOKUPS = REGISTRY.counter('cache_lookups_total', 'Cache lookups by cache and result', ['cache', 'result'])
+
+
+class MetricsServer:
+    """Serves a registry on http://host:port/metrics from a daemon thread"""
+
+    def __init__(self, registry: Registry = REGISTRY, host: str = "0.0.0.0", port: int = 9108):
+        """
+        Initialize metrics server
+
+        Args:
+            registry: Metrics to serve
+            host: Bind address
+            port: Port (0 picks a free one)
+        """
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_config(cls, config: Dict) -> Optional['MetricsServer']:
+        """
+        Create a server from the 'metrics' config section
+
+        Args:
+            config: Configuration dictionary
+
+        Returns:
+            MetricsServer, or None if metrics are disabled
+        """
+        metrics = config.get('metrics', {})
+        enabled = os.getenv('METRICS_ENABLED', str(metrics.get('enabled', False))).lower() == 'true'
+        if not enabled:
+            return None
+        return cls(
+            host=metrics.get('host', '0.0.0.0'),
+            port=int(os.getenv('METRICS_PORT', metrics.get('port', 9108)))
+        )
+
+    def start(self) -> bool:
+        """
+        Start serving
+
+        Returns:
+            True if the server is listening
+        """
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            logger.error(f"Could not start metrics server on {self.host}:{self.port}: {e}")
+            return False
+
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+        logger.info(f"📈 Metrics available on http://{self.host}:{self.port}/metrics")
+        return True
+
+    def stop(self) -> None:
+        """Stop serving"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self._thread = None
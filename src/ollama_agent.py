@@ -4,20 +4,58 @@ Gordion AI Code Review Agent for analyzing pull requests locally
 
 import json
 import logging
+import time
 import requests
 from typing import Dict, List, Optional
 from pathlib import Path
 import yaml
 
+from metrics import REGISTRY
+from tracing import TRACER, traced
+from traffic_recorder import TRAFFIC, replayed_response, response_body
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from repository_rules import RepositoryRulesManager
+
 logger = logging.getLogger(__name__)
 
+LLM_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 30, 45, 60, 120, 300)
+
+LLM_REQUEST_SECONDS = REGISTRY.histogram(
+    'llm_request_duration_seconds', 'Ollama chat call wall time by model and call',
+    ['model', 'call'], buckets=LLM_BUCKETS
+)
+LLM_REQUESTS = REGISTRY.counter(
+    'llm_requests_total', 'Ollama chat calls by model, call and outcome', ['model', 'call', 'outcome']
+)
+LLM_PHASE_SECONDS = REGISTRY.histogram(
+    'llm_phase_duration_seconds', 'Ollama server-side time by model and phase (load, prompt_eval, generation)',
+    ['model', 'phase'], buckets=LLM_BUCKETS
+)
+LLM_TOKENS = REGISTRY.counter(
+    'llm_tokens_total', 'Ollama tokens by model and phase (prompt_eval, generation)', ['model', 'phase']
+)
+
+# /api/chat response fields (nanoseconds, token counts) per phase
+_PHASE_FIELDS = {
+    'load': ('load_duration', None),
+    'prompt_eval': ('prompt_eval_duration', 'prompt_eval_count'),
+    'generation': ('eval_duration', 'eval_count'),
+}
+
+
+def repository_slug(pr_info: Dict) -> str:
+    """Target repository slug of a PR ('' if unknown)"""
+    return pr_info.get('toRef', {}).get('repository', {}).get('slug', '')
+
 
 class OllamaAgent:
     """Local AI agent using Ollama for PR analysis"""
     
     def __init__(self, base_url: str = "http://localhost:11434", 
                  model: str = "llama3.1:8b",
-                 temperature: float = 0.3):
+                 temperature: float = 0.3,
+                 keep_alive: Optional[str] = None,
+                 num_ctx: Optional[int] = None):
         """
         Initialize Ollama agent
         
@@ -25,10 +63,17 @@ class OllamaAgent:
             base_url: Ollama API URL (default: http://localhost:11434)
             model: Model to use (e.g., llama3.1:8b, codellama:13b, mistral:7b)
             temperature: Temperature parameter
+            keep_alive: How long Ollama keeps the model (and its KV cache) loaded, e.g. "30m"
+            num_ctx: Fixed context window; changing it between requests reloads the model
         """
         self.base_url = base_url.rstrip('/')
         self.model = model
         self.temperature = temperature
+        self.keep_alive = keep_alive
+        self.num_ctx = num_ctx
+        self.rules_manager = RepositoryRulesManager(
+            str(Path(__file__).parent.parent / 'config' / 'repository_rules.yaml')
+        )
         
         # Load prompts from config with language support
         self.prompts = self._load_prompts()
@@ -44,6 +89,9 @@ class OllamaAgent:
         self.fallback_template = lang_prompts.get('fallback_approval_comment', '')
         self.inline_prefix = lang_prompts.get('inline_comment_prefix', {})
         
+        # Fail fast while Ollama is down instead of waiting out every timeout
+        self.breaker = CircuitBreaker('Ollama', probe=self._probe)
+        
         logger.info(f"Ollama agent initialized with language: {self.language}")
     
     def _load_prompts(self) -> Dict:
@@ -89,6 +137,64 @@ Respond in JSON format:
   ]
 }"""
     
+    def _request(self, method: str, path: str, timeout: float, json: Optional[Dict] = None,
+                 context: str = '') -> requests.Response:
+        """
+        Call the Ollama API, recording or replaying the exchange (see traffic_recorder)
+        
+        Args:
+            method: HTTP method
+            path: API path, e.g. /api/chat
+            timeout: Request timeout in seconds
+            json: JSON request body
+            context: Distinguishes requests with identical URLs in recordings (file path)
+            
+        Returns:
+            HTTP response
+        """
+        url = f"{self.base_url}{path}"
+        if TRAFFIC.replaying:
+            entry = TRAFFIC.lookup('ollama', method, path, context=context)
+            time.sleep(TRAFFIC.replay_delay(entry))
+            return replayed_response(entry, method, url)
+        
+        started = time.monotonic()
+        response = requests.request(method, url, json=json, timeout=timeout)
+        TRAFFIC.record('ollama', method, path, None, json, response.status_code, response_body(response),
+                       time.monotonic() - started, context=context)
+        return response
+    
+    def _probe(self) -> bool:
+        """Cheap health check used by the circuit breaker"""
+        return self._request('GET', '/api/tags', timeout=3).status_code == 200
+    
+    def _chat(self, body: Dict, timeout: float, context: str = '') -> requests.Response:
+        """
+        POST /api/chat through the circuit breaker
+        
+        Args:
+            body: Chat request body
+            timeout: Request timeout in seconds
+            context: See _request
+            
+        Returns:
+            HTTP response
+            
+        Raises:
+            CircuitOpenError: Ollama is known to be down
+        """
+        self.breaker.check()
+        try:
+            response = self._request('POST', '/api/chat', json=body, timeout=timeout, context=context)
+        except requests.exceptions.RequestException:
+            self.breaker.record_failure()
+            raise
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+    
     def check_connection(self) -> bool:
         """
         Check if Ollama server is running and accessible
@@ -97,7 +203,7 @@ Respond in JSON format:
             True if Ollama is accessible
         """
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            response = self._request('GET', '/api/tags', timeout=5)
             if response.status_code == 200:
                 logger.info("✅ Ollama server is running")
                 return True
@@ -116,7 +222,7 @@ Respond in JSON format:
             True if model is available
         """
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            response = self._request('GET', '/api/tags', timeout=5)
             if response.status_code == 200:
                 models = response.json().get('models', [])
                 available_models = [m.get('name') for m in models]
@@ -133,6 +239,7 @@ Respond in JSON format:
             logger.error(f"Failed to check model availability: {e}")
             return False
     
+    @traced('ollama.analyze_pull_request')
     def analyze_pull_request(self, pr_info: Dict) -> Optional[Dict]:
         """
         Analyze a pull request using local Ollama AI
@@ -148,70 +255,164 @@ Respond in JSON format:
         # Prepare PR summary for AI
         pr_summary = self._prepare_pr_summary(pr_info)
         
+        started = time.monotonic()
         try:
             # Call Ollama chat API
-            response = requests.post(
-                f"{self.base_url}/api/chat",
-                json={
-                    "model": self.model,
-                    "messages": [
-                        {"role": "system", "content": self.system_prompt},
-                        {"role": "user", "content": pr_summary}
-                    ],
-                    "stream": False,
-                    "options": {
-                        "temperature": self.temperature,
-                        "num_predict": 2000  # max tokens
-                    }
-                },
+            response = self._chat(
+                self._build_chat_request(self.system_prompt_for(repository_slug(pr_info), 'pr_analysis'),
+                                         pr_summary, num_predict=2000),
                 timeout=60  # Ollama can be slower, give 60 seconds
             )
             
             if response.status_code != 200:
+                self.observe_chat('analysis', started, 'error')
                 logger.error(f"Ollama API returned status {response.status_code}: {response.text}")
                 logger.warning("⚠️  Ollama API hatası - AI analizi başarısız")
                 return None
             
             response_data = response.json()
-            content = response_data.get('message', {}).get('content', '')
-            
-            if not content:
-                logger.error("Ollama returned empty response")
-                return None
-            
-            logger.debug(f"Ollama Response: {content}")
-            
-            # Try to extract JSON from response (Ollama sometimes adds extra text)
-            result = self._extract_json(content)
-            
-            if not result:
-                logger.error("Failed to extract valid JSON from Ollama response")
-                return None
-            
-            # Validate result
-            required_fields = ['approve', 'confidence_score', 'reasoning']
-            if not all(field in result for field in required_fields):
-                logger.error("Ollama response missing required fields")
-                return None
-            
-            logger.info(f"Ollama Analysis: approve={result['approve']}, "
-                       f"confidence={result['confidence_score']}")
-            
-            return result
+            self.observe_chat('analysis', started, 'ok', response_data)
+            return self._parse_analysis_response(response_data)
             
         except requests.exceptions.Timeout:
+            self.observe_chat('analysis', started, 'timeout')
             logger.error("Ollama request timed out after 60 seconds")
             logger.warning("⚠️  Ollama timeout - AI analizi başarısız")
             return None
+        except CircuitOpenError:
+            logger.warning("🔌 Ollama devre dışı (circuit open) - AI analizi atlanıyor")
+            return None
         except json.JSONDecodeError as e:
+            self.observe_chat('analysis', started, 'error')
             logger.error(f"Failed to parse Ollama response as JSON: {e}")
             logger.warning("⚠️  Ollama JSON parse hatası - AI analizi başarısız")
             return None
         except Exception as e:
+            self.observe_chat('analysis', started, 'error')
             logger.error(f"Ollama analysis failed: {e}")
             logger.warning("⚠️  Ollama hatası - AI analizi başarısız")
             return None
     
+    def observe_chat(self, call: str, started: float, outcome: str,
+                     response_data: Optional[Dict] = None) -> None:
+        """
+        Record latency, outcome and token usage of a chat call (metrics and trace spans)
+        
+        Args:
+            call: 'analysis' or 'file_review'
+            started: time.monotonic() before the call
+            outcome: 'ok', 'error' or 'timeout'
+            response_data: Parsed /api/chat response (carries Ollama's timings)
+        """
+        duration = time.monotonic() - started
+        LLM_REQUEST_SECONDS.labels(self.model, call).observe(duration)
+        LLM_REQUESTS.labels(self.model, call, outcome).inc()
+        span = TRACER.add_span(f"chat {call}", duration, model=self.model, outcome=outcome,
+                               status='ok' if outcome == 'ok' else 'error')
+        if not response_data:
+            return
+        
+        # Server-side phases run back to back from the start of the call
+        phase_end = span.start if span else 0
+        for phase, (duration_field, count_field) in _PHASE_FIELDS.items():
+            seconds = response_data.get(duration_field, 0) / 1e9
+            tokens = response_data.get(count_field, 0) if count_field else 0
+            if seconds:
+                LLM_PHASE_SECONDS.labels(self.model, phase).observe(seconds)
+            if tokens:
+                LLM_TOKENS.labels(self.model, phase).inc(tokens)
+            if span and seconds:
+                phase_end += seconds
+                TRACER.add_span(phase, seconds, end=phase_end, parent=span, tokens=tokens)
+    
+    def system_prompt_for(self, repository: str, prompt_type: str) -> str:
+        """
+        System prompt followed by the repository's tech stack, rules and guidelines
+        
+        Only depends on the prompt files, so consecutive PRs of a repository
+        share it byte for byte and Ollama evaluates it once per slot.
+        
+        Args:
+            repository: Repository slug ('' for none)
+            prompt_type: 'pr_analysis' or 'code_review'
+            
+        Returns:
+            System message content
+        """
+        base_prompt = self.system_prompt if prompt_type == 'pr_analysis' else self.inline_review_prompt
+        context = self.rules_manager.get_prompt_context(repository, prompt_type) if repository else ""
+        return f"{base_prompt}\n\n{context}" if context else base_prompt
+    
+    def _build_chat_request(self, system_prompt: str, user_content: str, num_predict: int) -> Dict:
+        """
+        Build an Ollama /api/chat request body
+        
+        keep_alive and a fixed num_ctx keep the model, and with it the KV
+        cache of the shared system prompt, loaded between reviews.
+        
+        Args:
+            system_prompt: System message content
+            user_content: User message content
+            num_predict: Max tokens to generate
+            
+        Returns:
+            Request body dictionary
+        """
+        options = {
+            "temperature": self.temperature,
+            "num_predict": num_predict  # max tokens
+        }
+        if self.num_ctx:
+            options["num_ctx"] = self.num_ctx
+        body = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_content}
+            ],
+            "stream": False,
+            "options": options
+        }
+        if self.keep_alive is not None:
+            body["keep_alive"] = self.keep_alive
+        return body
+    
+    def _parse_analysis_response(self, response_data: Dict) -> Optional[Dict]:
+        """
+        Parse and validate a PR analysis chat response
+        
+        Args:
+            response_data: Parsed JSON of the /api/chat response
+            
+        Returns:
+            Analysis result dictionary, or None if invalid
+        """
+        content = response_data.get('message', {}).get('content', '')
+        
+        if not content:
+            logger.error("Ollama returned empty response")
+            return None
+        
+        logger.debug(f"Ollama Response: {content}")
+        
+        # Try to extract JSON from response (Ollama sometimes adds extra text)
+        result = self._extract_json(content)
+        
+        if not result:
+            logger.error("Failed to extract valid JSON from Ollama response")
+            return None
+        
+        # Validate result
+        required_fields = ['approve', 'confidence_score', 'reasoning']
+        if not all(field in result for field in required_fields):
+            logger.error("Ollama response missing required fields")
+            return None
+        
+        logger.info(f"Ollama Analysis: approve={result['approve']}, "
+                   f"confidence={result['confidence_score']}")
+        
+        return result
+    
     def _extract_json(self, text: str) -> Optional[Dict]:
         """
         Extract JSON from text (handles cases where model adds extra text)
@@ -369,13 +570,16 @@ Bu diff'i incele ve approve edilip edilmemesi gerektiğini değerlendir."""
         
         return comment
     
-    def analyze_file_changes(self, file_path: str, file_changes: List[Dict]) -> Optional[Dict]:
+    @traced('ollama.analyze_file_changes')
+    def analyze_file_changes(self, file_path: str, file_changes: List[Dict],
+                             repository: str = '') -> Optional[Dict]:
         """
         Analyze specific file changes and generate inline comment suggestions
         
         Args:
             file_path: Path to the file being changed
             file_changes: List of hunks/segments with line changes
+            repository: Repository slug (adds its rules to the system prompt)
             
         Returns:
             Dictionary with inline comment suggestions, or None if analysis fails
@@ -390,49 +594,62 @@ Bu diff'i incele ve approve edilip edilmemesi gerektiğini değerlendir."""
             logger.debug(f"Skipping {file_path} - no meaningful changes")
             return {'comments': []}
         
+        started = time.monotonic()
         try:
-            response = requests.post(
-                f"{self.base_url}/api/chat",
-                json={
-                    "model": self.model,
-                    "messages": [
-                        {"role": "system", "content": self.inline_review_prompt},
-                        {"role": "user", "content": change_summary}
-                    ],
-                    "stream": False,
-                    "options": {
-                        "temperature": self.temperature,
-                        "num_predict": 1500
-                    }
-                },
-                timeout=45
+            response = self._chat(
+                self._build_chat_request(self.system_prompt_for(repository, 'code_review'),
+                                         change_summary, num_predict=1500),
+                timeout=45, context=file_path
             )
             
             if response.status_code != 200:
+                self.observe_chat('file_review', started, 'error')
                 logger.error(f"Ollama API returned status {response.status_code}")
                 return None
             
             response_data = response.json()
-            content = response_data.get('message', {}).get('content', '')
-            
-            if not content:
-                logger.error("Ollama returned empty response")
-                return None
-            
-            # Extract JSON
-            result = self._extract_json(content)
-            
-            if not result or 'comments' not in result:
-                logger.debug(f"No inline comments suggested for {file_path}")
-                return {'comments': []}
-            
-            logger.info(f"Generated {len(result['comments'])} inline comment(s) for {file_path}")
-            return result
+            self.observe_chat('file_review', started, 'ok', response_data)
+            return self._parse_file_review_response(file_path, response_data)
             
+        except requests.exceptions.Timeout:
+            self.observe_chat('file_review', started, 'timeout')
+            logger.error("Ollama file review timed out after 45 seconds")
+            return None
+        except CircuitOpenError:
+            logger.debug(f"Skipping {file_path} - Ollama circuit open")
+            return None
         except Exception as e:
+            self.observe_chat('file_review', started, 'error')
             logger.error(f"Failed to analyze file changes: {e}")
             return None
     
+    def _parse_file_review_response(self, file_path: str, response_data: Dict) -> Optional[Dict]:
+        """
+        Parse an inline review chat response
+        
+        Args:
+            file_path: Path to the reviewed file
+            response_data: Parsed JSON of the /api/chat response
+            
+        Returns:
+            Dictionary with inline comment suggestions, or None if empty
+        """
+        content = response_data.get('message', {}).get('content', '')
+        
+        if not content:
+            logger.error("Ollama returned empty response")
+            return None
+        
+        # Extract JSON
+        result = self._extract_json(content)
+        
+        if not result or 'comments' not in result:
+            logger.debug(f"No inline comments suggested for {file_path}")
+            return {'comments': []}
+        
+        logger.info(f"Generated {len(result['comments'])} inline comment(s) for {file_path}")
+        return result
+    
     def _prepare_file_change_summary(self, file_path: str, hunks: List[Dict]) -> str:
         """
         Prepare file change summary for inline review
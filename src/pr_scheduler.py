@@ -0,0 +1,258 @@
+"""
+PR Scheduler - Orders the review queue by priority
+"""
+
+import time
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+from repository_rules import RepositoryRulesManager
+from metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+
+def pr_key(pr: Dict) -> Optional[Tuple[str, str, int]]:
+    """
+    Build a stable (project_key, repo_slug, pr_id) key from a PR payload
+
+    Args:
+        pr: Pull request dictionary (inbox or details payload)
+
+    Returns:
+        Tuple key or None if identifiers are missing
+    """
+    repository = pr.get('toRef', {}).get('repository', {})
+    project_key = repository.get('project', {}).get('key')
+    repo_slug = repository.get('slug')
+    pr_id = pr.get('id')
+
+    if not all([project_key, repo_slug, pr_id]):
+        return None
+    return project_key, repo_slug, pr_id
+
+
+class PRScheduler:
+    """
+    Orders pull requests using shortest-job-first with aging
+
+    Each PR gets an effective cost:
+
+        cost = size * rereview_factor / repo_priority - aging_rate * age_minutes
+
+    and the queue is processed in ascending cost order. Small PRs go first,
+    re-reviews and high-priority repositories are discounted, and every
+    minute a PR waits lowers its cost so large PRs cannot starve.
+
+    Age is counted from when the scheduler first queued the PR, not from
+    its createdDate, so a backlog of old PRs is still ordered by size. With
+    the defaults (aging_rate 5, default_size 300) an unknown-size PR
+    overtakes a tiny one after about an hour in the queue, and a 3000-line
+    PR after about ten hours.
+    """
+
+    def __init__(self, config: Dict, rules_manager: Optional[RepositoryRulesManager] = None,
+                 username: Optional[str] = None):
+        """
+        Initialize PR scheduler
+
+        Args:
+            config: Configuration dictionary
+            rules_manager: Repository rules manager (for repo priorities)
+            username: Reviewer username, used to detect re-reviews
+        """
+        scheduling = config.get('scheduling', {})
+        self.enabled = scheduling.get('enabled', True)
+        self.aging_rate = float(scheduling.get('aging_rate', 5.0))
+        self.default_size = int(scheduling.get('default_size', 300))
+        self.rereview_factor = float(scheduling.get('rereview_factor', 0.5))
+
+        self.rules_manager = rules_manager or RepositoryRulesManager()
+        self.username = username
+
+        # Known PR sizes (files + changed lines) from previous reviews
+        self._size_hints: Dict[Tuple[str, str, int], int] = {}
+        # PRs whose review completed (logged to history)
+        self._reviewed: Set[Tuple[str, str, int]] = set()
+        # First time each PR was seen in the inbox (epoch seconds)
+        self._first_seen: Dict[Tuple[str, str, int], float] = {}
+
+    def seed_size_hints(self, hints: Dict[Tuple[str, str, int], int]) -> None:
+        """
+        Seed size hints, e.g. from PR history in the database
+
+        PRs in the history have been reviewed, so they also count as
+        re-reviews from now on.
+
+        Args:
+            hints: Mapping of PR key to size (files + changed lines)
+        """
+        self._size_hints.update(hints)
+        self._reviewed.update(hints)
+
+    def record_size(self, pr: Dict, size: int) -> None:
+        """
+        Remember the real size of a PR after it has been fetched
+
+        Args:
+            pr: Pull request dictionary
+            size: Files changed + changed lines
+        """
+        key = pr_key(pr)
+        if key:
+            self._size_hints[key] = size
+
+    def record_review(self, pr: Dict) -> None:
+        """
+        Remember that a review of the PR completed, so the next one is a re-review
+
+        Args:
+            pr: Pull request dictionary
+        """
+        key = pr_key(pr)
+        if key:
+            self._reviewed.add(key)
+
+    def order(self, pull_requests: List[Dict], now: Optional[float] = None) -> List[Dict]:
+        """
+        Order pull requests by effective cost (lowest first)
+
+        Args:
+            pull_requests: PRs as returned by the inbox API
+            now: Current epoch seconds (defaults to time.time())
+
+        Returns:
+            New list with PRs in processing order
+        """
+        if not self.enabled:
+            return list(pull_requests)
+
+        now = now if now is not None else time.time()
+
+        # Start the aging clock even with nothing to sort, so a PR that
+        # waits alone still ages; forget PRs that left the inbox
+        current = {pr_key(pr) for pr in pull_requests}
+        for key in current:
+            self._first_seen.setdefault(key, now)
+        for key in list(self._first_seen):
+            if key not in current:
+                del self._first_seen[key]
+
+        if len(pull_requests) < 2:
+            return list(pull_requests)
+
+        scored = []
+        for index, pr in enumerate(pull_requests):
+            cost = self.score(pr, now)
+            # Keep API order as a stable tie-breaker
+            scored.append((cost, index, pr))
+
+        scored.sort(key=lambda item: (item[0], item[1]))
+
+        ordered = [pr for _, _, pr in scored]
+        logger.debug("Scheduled order: " + ", ".join(f"#{pr.get('id')}" for pr in ordered))
+        return ordered
+
+    def score(self, pr: Dict, now: Optional[float] = None) -> float:
+        """
+        Calculate the effective cost of a PR
+
+        Args:
+            pr: Pull request dictionary
+            now: Current epoch seconds (defaults to time.time())
+
+        Returns:
+            Effective cost, lower is scheduled earlier
+        """
+        now = now if now is not None else time.time()
+
+        size = self.estimate_size(pr)
+        if self.is_rereview(pr):
+            size *= self.rereview_factor
+
+        cost = size / self.get_repo_priority(pr)
+        cost -= self.aging_rate * self.get_age_minutes(pr, now)
+        return cost
+
+    def estimate_size(self, pr: Dict) -> float:
+        """
+        Estimate review size of a PR
+
+        The inbox payload carries no diff statistics, so the estimate comes
+        from (in order): fetched changes/diff on the payload itself, the size
+        recorded on a previous review, then the configured default.
+
+        Args:
+            pr: Pull request dictionary
+
+        Returns:
+            Estimated files + changed lines
+        """
+        if pr.get('changes') or pr.get('diff'):
+            from pr_analyzer import calculate_pr_stats
+            stats = calculate_pr_stats(pr)
+            return stats['files_changed'] + stats['total_changes']
+
+        key = pr_key(pr)
+        if key in self._size_hints:
+            CACHE_LOOKUPS.labels('size_hint', 'hit').inc()
+            return self._size_hints[key]
+
+        CACHE_LOOKUPS.labels('size_hint', 'miss').inc()
+        return self.default_size
+
+    def is_rereview(self, pr: Dict) -> bool:
+        """
+        Check whether the PR has been reviewed by us before
+
+        Only completed reviews count (see record_review); a PR that was
+        merely scored or sized is not a re-review.
+
+        Args:
+            pr: Pull request dictionary
+
+        Returns:
+            True if this is a re-review
+        """
+        if self.username:
+            for reviewer in pr.get('reviewers', []):
+                if reviewer.get('user', {}).get('name') == self.username:
+                    if reviewer.get('status') == 'NEEDS_WORK':
+                        return True
+
+        return pr_key(pr) in self._reviewed
+
+    def get_repo_priority(self, pr: Dict) -> float:
+        """
+        Get repository priority from repository_rules.yaml (default 1)
+
+        Args:
+            pr: Pull request dictionary
+
+        Returns:
+            Positive priority multiplier, higher is more important
+        """
+        repo_slug = pr.get('toRef', {}).get('repository', {}).get('slug')
+        repo_config = self.rules_manager.get_repository_config(repo_slug) if repo_slug else None
+        priority = (repo_config or {}).get('priority', 1)
+
+        try:
+            priority = float(priority)
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid priority for repository {repo_slug}: {priority}")
+            return 1.0
+        return priority if priority > 0 else 1.0
+
+    def get_age_minutes(self, pr: Dict, now: float) -> float:
+        """
+        Get how long a PR has been waiting in this scheduler's queue, in minutes
+
+        Args:
+            pr: Pull request dictionary
+            now: Current epoch seconds
+
+        Returns:
+            Minutes since the PR was first queued
+        """
+        first_seen = self._first_seen.setdefault(pr_key(pr), now)
+        return max(0.0, (now - first_seen) / 60.0)
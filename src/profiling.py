@@ -0,0 +1,303 @@
+"""
+Profiling - Sampling profiler windows and per-PR cProfile/tracemalloc sessions, toggled at runtime
+"""
+
+import cProfile
+import json
+import logging
+import os
+import re
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Set
+
+from pr_scheduler import pr_key
+from tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+
+def fold_stack(frame) -> str:
+    """Frame chain as 'outer;...;inner' with one 'function (file:line)' per frame"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of running threads from a background thread
+
+    Writes Brendan Gregg's folded format (one 'thread;frame;frame count'
+    line per stack), which flamegraph.pl, speedscope and inferno render as
+    flamegraphs. Overhead is one sys._current_frames() call per interval.
+    """
+
+    def __init__(self, interval: float = 0.01, thread_ids: Optional[Set[int]] = None):
+        """
+        Initialize sampler
+
+        Args:
+            interval: Seconds between samples
+            thread_ids: Only sample these threads (default all but the sampler)
+        """
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        return self.samples
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or (self.thread_ids and thread_id not in self.thread_ids):
+                    continue
+                thread = re.sub(r'[\s;]', '_', names.get(thread_id, str(thread_id)))
+                self.samples[f"{thread};{fold_stack(frame)}"] += 1
+
+    def write_folded(self, path: Path) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class Profiler:
+    """
+    Runtime-toggled profiling of the running agent
+
+    - Sampling window: all threads for window_seconds, triggered by SIGUSR1
+      or the dashboard's 'profile' command -> profile-<time>-window.folded
+    - PR session: the next review of an armed PR ('profile_pr:PROJECT/repo/ID')
+      runs under cProfile (.prof), a sampler on the reviewing thread (.folded)
+      and tracemalloc, with CPU/wall/memory per traced stage (.json)
+
+    Only one window and one PR session run at a time. In the async runtime
+    a PR session also sees the other PRs on the event loop.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.output_dir = Path('logs')
+        self.window_seconds = 30.0
+        self.sample_interval = 0.01
+        self.top_allocations = 25
+        self._armed: Set[str] = set()
+        self._window: Optional[SamplingProfiler] = None
+        self._session_active = False
+        self._lock = threading.Lock()
+
+    def configure(self, config: Dict) -> None:
+        """
+        Read the 'profiling' config section
+
+        Args:
+            config: Configuration dictionary
+        """
+        profiling = config.get('profiling', {})
+        self.enabled = os.getenv('PROFILING_ENABLED', str(profiling.get('enabled', True))).lower() == 'true'
+        self.output_dir = Path(profiling.get('output_dir', 'logs'))
+        self.window_seconds = float(profiling.get('window_seconds', 30))
+        self.sample_interval = float(profiling.get('sample_interval', 0.01))
+        self.top_allocations = int(profiling.get('top_allocations', 25))
+
+    def install_signal_handler(self) -> bool:
+        """
+        Start a sampling window on SIGUSR1 (kill -USR1 <pid>)
+
+        Returns:
+            True if the handler was installed (main thread, POSIX only)
+        """
+        if not self.enabled or not hasattr(signal, 'SIGUSR1'):
+            return False
+        try:
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.start_window())
+            return True
+        except ValueError:
+            # Not the main thread
+            return False
+
+    def handle_command(self, command: str, argument: str = '') -> None:
+        """
+        Execute a dashboard command
+
+        Args:
+            command: 'profile' (sampling window) or 'profile_pr'
+            argument: Window seconds, or the PR as PROJECT/repo/ID
+        """
+        if command == 'profile':
+            self.start_window(float(argument) if argument else None)
+        elif command == 'profile_pr':
+            self.arm_pr(argument)
+
+    # -- sampling window --------------------------------------------------
+
+    def _path(self, label: str, suffix: str) -> Path:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        return self.output_dir / f"profile-{time.strftime('%Y%m%d-%H%M%S')}-{label}{suffix}"
+
+    def start_window(self, seconds: Optional[float] = None) -> bool:
+        """
+        Sample all threads for a while and write a folded-stack file
+
+        Args:
+            seconds: Window length (default window_seconds)
+
+        Returns:
+            True if a window was started
+        """
+        if not self.enabled:
+            return False
+        seconds = seconds or self.window_seconds
+        with self._lock:
+            if self._window is not None:
+                logger.info("🔥 A profiling window is already running")
+                return False
+            self._window = SamplingProfiler(self.sample_interval)
+            self._window.start()
+        logger.info(f"🔥 Sampling all threads for {seconds:.0f}s...")
+        timer = threading.Timer(seconds, self._finish_window)
+        timer.daemon = True
+        timer.start()
+        return True
+
+    def _finish_window(self) -> None:
+        with self._lock:
+            sampler, self._window = self._window, None
+        if sampler is None:
+            return
+        sampler.stop()
+        path = self._path('window', '.folded')
+        sampler.write_folded(path)
+        logger.info(f"🔥 Profile written: {path} ({sum(sampler.samples.values())} samples)")
+
+    # -- per-PR sessions --------------------------------------------------
+
+    @staticmethod
+    def _key_text(project_key: str, repo_slug: str, pr_id) -> str:
+        return f"{project_key}/{repo_slug}/{pr_id}"
+
+    def arm_pr(self, pr: str) -> None:
+        """
+        Profile the next review of a PR
+
+        Args:
+            pr: PROJECT/repo/ID
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._armed.add(pr.strip())
+        logger.info(f"🔥 Next review of {pr} will be profiled")
+
+    @contextmanager
+    def pr_session(self, pr: Dict) -> Iterator[bool]:
+        """
+        Profile a PR review if the PR is armed (no-op otherwise)
+
+        Args:
+            pr: Pull request dictionary
+
+        Yields:
+            True if this review is being profiled
+        """
+        key = pr_key(pr)
+        text = self._key_text(*key) if key else None
+        with self._lock:
+            profiled = text in self._armed and not self._session_active
+            if profiled:
+                self._armed.discard(text)
+                self._session_active = True
+        if not profiled:
+            yield False
+            return
+
+        try:
+            with self._profile(text.replace('/', '-')):
+                yield True
+        finally:
+            with self._lock:
+                self._session_active = False
+
+    @contextmanager
+    def _profile(self, label: str) -> Iterator[None]:
+        root = TRACER.current()
+        stages = []
+        open_stages = {}
+
+        def on_span(event, span):
+            if root is None or span.trace is not root.trace:
+                return
+            if event == 'start':
+                open_stages[span.span_id] = (time.thread_time(), tracemalloc.get_traced_memory()[0])
+            elif span.span_id in open_stages:
+                cpu_start, memory_start = open_stages.pop(span.span_id)
+                stages.append({
+                    'stage': span.name,
+                    'wall_s': round(span.duration, 6),
+                    'cpu_s': round(time.thread_time() - cpu_start, 6),
+                    'memory_delta_kb': round((tracemalloc.get_traced_memory()[0] - memory_start) / 1024, 1),
+                })
+
+        started_tracemalloc = not tracemalloc.is_tracing()
+        if started_tracemalloc:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        sampler = SamplingProfiler(self.sample_interval, thread_ids={threading.get_ident()})
+        profile = cProfile.Profile()
+        TRACER.hooks.append(on_span)
+        logger.info(f"🔥 Profiling review of {label}...")
+        wall_start, cpu_start = time.monotonic(), time.thread_time()
+        sampler.start()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            sampler.stop()
+            TRACER.hooks.remove(on_span)
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            if started_tracemalloc:
+                tracemalloc.stop()
+
+            prof_path = self._path(label, '.prof')
+            profile.dump_stats(str(prof_path))
+            sampler.write_folded(prof_path.with_suffix('.folded'))
+            summary = {
+                'pr': label,
+                'wall_s': round(time.monotonic() - wall_start, 6),
+                'cpu_s': round(time.thread_time() - cpu_start, 6),
+                'peak_traced_kb': round(peak / 1024, 1),
+                'stages': stages,
+                'top_allocations': [
+                    {'where': str(stat.traceback[0]), 'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+                    for stat in snapshot.statistics('lineno')[:self.top_allocations]
+                ],
+            }
+            prof_path.with_suffix('.json').write_text(json.dumps(summary, indent=2), encoding='utf-8')
+            logger.info(f"🔥 PR profile written: {prof_path} (+ .folded, .json)")
+
+
+# Process-wide profiler, configured by StashAgentApp
+PROFILER = Profiler()
@@ -0,0 +1,384 @@
+"""
+Rate limiter - Token bucket, AIMD concurrency and jittered retries for Stash requests
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, List, Optional, Tuple, Type
+
+from metrics import REGISTRY
+from cycle_scheduler import check_wait
+
+logger = logging.getLogger(__name__)
+
+STASH_RETRIES = REGISTRY.counter('stash_retries_total', 'Stash requests retried, by reason', ['reason'])
+STASH_CONCURRENCY_LIMIT = REGISTRY.gauge('stash_concurrency_limit', 'Adaptive limit of concurrent Stash requests')
+STASH_THROTTLE_SECONDS = REGISTRY.counter('stash_throttle_wait_seconds_total',
+                                          'Time spent waiting for a Stash rate/concurrency slot')
+
+# Responses meaning "slow down"; retried after a backoff
+OVERLOAD_STATUSES = {429, 503}
+RETRY_STATUSES = {429, 502, 503, 504}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+
+def retry_after_seconds(headers) -> float:
+    """Seconds from a Retry-After header (delta-seconds or HTTP-date form), 0 if absent or invalid"""
+    value = (headers or {}).get('Retry-After')
+    if value is None:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        when = parsedate_to_datetime(str(value))
+    except (TypeError, ValueError):
+        return 0.0
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class TokenBucket:
+    """Thread-safe token bucket; waits are computed under the lock and slept outside it"""
+
+    def __init__(self, rate: float, burst: int):
+        """
+        Initialize bucket
+
+        Args:
+            rate: Tokens per second (0 = unlimited)
+            burst: Bucket size
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Take a token, possibly in advance
+
+        Returns:
+            Seconds to wait before using it
+        """
+        with self._lock:
+            now = time.monotonic()
+            pause = max(0.0, self._paused_until - now)
+            if self.rate <= 0:
+                return pause
+            self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, pause)
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for a while (server asked to retry later)"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on requests in flight
+
+    Each response under the latency target raises the limit by 1/limit
+    (about +1 per round trip of the whole window); a 429/503 or a slow
+    response cuts it by decrease_factor, at most once per cooldown so a
+    burst of errors from one window counts once.
+    """
+
+    def __init__(self, initial: int = 8, minimum: int = 1, maximum: int = 32,
+                 latency_target: float = 2.0, decrease_factor: float = 0.5, cooldown: float = 1.0):
+        """
+        Initialize limiter
+
+        Args:
+            initial: Starting limit
+            minimum: Lowest limit
+            maximum: Highest limit
+            latency_target: Slower responses count as congestion (0 = ignore latency)
+            decrease_factor: Multiplier applied on congestion
+            cooldown: Minimum seconds between decreases
+        """
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(self.maximum, max(self.minimum, initial)))
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = float('-inf')
+        self._condition = threading.Condition()
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        STASH_CONCURRENCY_LIMIT.set(self.limit)
+
+    def try_acquire(self) -> bool:
+        with self._condition:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait(0.1)
+            self.in_flight += 1
+
+    async def acquire_async(self) -> None:
+        """Wait for a slot without blocking the event loop (woken by release())"""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            finally:
+                with self._condition:
+                    if (loop, waiter) in self._async_waiters:
+                        self._async_waiters.remove((loop, waiter))
+
+    def release(self, latency: float, overloaded: bool) -> None:
+        """
+        Free a slot and adapt the limit
+
+        Args:
+            latency: Seconds the request took
+            overloaded: The server answered 429/503
+        """
+        with self._condition:
+            self.in_flight = max(0, self.in_flight - 1)
+            slow = self.latency_target > 0 and latency > self.latency_target
+            now = time.monotonic()
+            if overloaded or slow:
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(float(self.minimum), self.limit * self.decrease_factor)
+                    self._last_decrease = now
+                    logger.debug(f"Stash concurrency limit lowered to {int(self.limit)} "
+                                 f"({'overloaded' if overloaded else f'{latency:.1f}s latency'})")
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            STASH_CONCURRENCY_LIMIT.set(self.limit)
+            self._condition.notify_all()
+            # Waiters re-check the limit, so waking all of them is safe
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                # Loop already closed
+                pass
+
+
+class StashThrottle:
+    """
+    Client-side protection of Bitbucket Server
+
+    Every request takes a token-bucket token and an adaptive concurrency
+    slot. 429/502/503/504 responses and connection errors are retried with
+    full-jitter exponential backoff: idempotent methods always, POSTs only
+    on 429 (the server refused them unprocessed). Retry-After, capped at
+    retry_cap, pauses the bucket for all requests and is the minimum
+    backoff. 429/503, timeouts and connection errors lower the concurrency
+    limit. A wait that would outlast the current PR deadline raises
+    DeadlineExceeded instead of sleeping.
+    """
+
+    def __init__(self, rate: float = 0.0, burst: int = 20, initial_concurrency: int = 8,
+                 min_concurrency: int = 1, max_concurrency: int = 32, latency_target: float = 2.0,
+                 decrease_factor: float = 0.5, max_retries: int = 3, retry_base: float = 0.5,
+                 retry_cap: float = 30.0, enabled: bool = True):
+        """
+        Initialize throttle
+
+        Args:
+            rate: Requests per second (0 = unlimited)
+            burst: Requests allowed at once above the rate
+            initial_concurrency: Starting in-flight limit
+            min_concurrency: Lowest in-flight limit
+            max_concurrency: Highest in-flight limit
+            latency_target: Responses slower than this lower the limit (0 = ignore)
+            decrease_factor: Limit multiplier on congestion
+            max_retries: Retries per request
+            retry_base: First backoff ceiling in seconds
+            retry_cap: Largest backoff ceiling in seconds
+            enabled: False passes requests straight through
+        """
+        self.enabled = enabled
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, min_concurrency, max_concurrency,
+                                               latency_target, decrease_factor)
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_cap = retry_cap
+        self._rng = random.Random()
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'StashThrottle':
+        """
+        Build from the 'stash_rate_limit' config section
+
+        Args:
+            config: Configuration dictionary
+        """
+        limits = config.get('stash_rate_limit', {})
+        return cls(
+            rate=float(limits.get('rate', 0)),
+            burst=int(limits.get('burst', 20)),
+            initial_concurrency=int(limits.get('initial_concurrency', 8)),
+            min_concurrency=int(limits.get('min_concurrency', 1)),
+            max_concurrency=int(limits.get('max_concurrency', 32)),
+            latency_target=float(limits.get('latency_target', 2.0)),
+            decrease_factor=float(limits.get('decrease_factor', 0.5)),
+            max_retries=int(limits.get('max_retries', 3)),
+            retry_base=float(limits.get('retry_base', 0.5)),
+            retry_cap=float(limits.get('retry_cap', 30)),
+            enabled=limits.get('enabled', True),
+        )
+
+    def backoff(self, attempt: int, retry_after: float = 0.0) -> float:
+        """Full-jitter exponential backoff, at least Retry-After (both capped at retry_cap)"""
+        ceiling = min(self.retry_cap, self.retry_base * (2 ** attempt))
+        return max(min(retry_after, self.retry_cap), self._rng.uniform(0, ceiling))
+
+    def _retry_reason(self, method: str, status: Optional[int], attempt: int) -> Optional[str]:
+        """Why a request should be retried, None if it should not"""
+        if attempt >= self.max_retries:
+            return None
+        if status is None:
+            return 'connection' if method.upper() in IDEMPOTENT_METHODS else None
+        if status not in RETRY_STATUSES:
+            return None
+        if status == 429 or method.upper() in IDEMPOTENT_METHODS:
+            return str(status)
+        return None
+
+    def _finish(self, started: float, status: Optional[int], headers, failed: bool = False) -> float:
+        """
+        Release the slot and apply Retry-After
+
+        Args:
+            started: time.monotonic() before the attempt
+            status: HTTP status, None if no response arrived
+            headers: Response headers
+            failed: The attempt timed out or could not connect (counts as congestion)
+
+        Returns:
+            Retry-After seconds, capped at retry_cap
+        """
+        overloaded = failed or status in OVERLOAD_STATUSES
+        self.concurrency.release(time.monotonic() - started, overloaded)
+        retry_after = min(retry_after_seconds(headers), self.retry_cap) if overloaded else 0.0
+        if retry_after:
+            self.bucket.pause(retry_after)
+        return retry_after
+
+    def send(self, method: str, request: Callable, errors: Tuple[Type[BaseException], ...] = ()):
+        """
+        Run a request under the rate/concurrency limits, retrying when allowed
+
+        Args:
+            method: HTTP method
+            request: Function performing one attempt and returning the response
+            errors: Connection-level exceptions worth retrying
+
+        Returns:
+            The last response
+        """
+        if not self.enabled:
+            return request()
+
+        attempt = 0
+        while True:
+            waited = time.monotonic()
+            delay = self.bucket.reserve()
+            if delay:
+                check_wait(delay, f"Stash {method} rate limit wait")
+                time.sleep(delay)
+            self.concurrency.acquire()
+            STASH_THROTTLE_SECONDS.inc(time.monotonic() - waited)
+
+            started = time.monotonic()
+            try:
+                response = request()
+            except errors:
+                self._finish(started, None, None, failed=True)
+                reason = self._retry_reason(method, None, attempt)
+                if not reason:
+                    raise
+                backoff = self.backoff(attempt)
+            except BaseException:
+                self._finish(started, None, None)
+                raise
+            else:
+                retry_after = self._finish(started, response.status_code, response.headers)
+                reason = self._retry_reason(method, response.status_code, attempt)
+                if not reason:
+                    return response
+                backoff = self.backoff(attempt, retry_after)
+
+            STASH_RETRIES.labels(reason).inc()
+            logger.warning(f"⏳ Stash {method} {reason}, retry {attempt + 1}/{self.max_retries} in {backoff:.1f}s")
+            check_wait(backoff, f"Stash {method} retry backoff")
+            time.sleep(backoff)
+            attempt += 1
+
+    async def send_async(self, method: str, request: Callable,
+                         errors: Tuple[Type[BaseException], ...] = ()):
+        """Async variant of send(); request is a coroutine function"""
+        if not self.enabled:
+            return await request()
+
+        attempt = 0
+        while True:
+            waited = time.monotonic()
+            delay = self.bucket.reserve()
+            if delay:
+                check_wait(delay, f"Stash {method} rate limit wait")
+                await asyncio.sleep(delay)
+            await self.concurrency.acquire_async()
+            STASH_THROTTLE_SECONDS.inc(time.monotonic() - waited)
+
+            started = time.monotonic()
+            try:
+                response = await request()
+            except errors:
+                self._finish(started, None, None, failed=True)
+                reason = self._retry_reason(method, None, attempt)
+                if not reason:
+                    raise
+                backoff = self.backoff(attempt)
+            except BaseException:
+                self._finish(started, None, None)
+                raise
+            else:
+                retry_after = self._finish(started, response.status_code, response.headers)
+                reason = self._retry_reason(method, response.status_code, attempt)
+                if not reason:
+                    return response
+                backoff = self.backoff(attempt, retry_after)
+
+            STASH_RETRIES.labels(reason).inc()
+            logger.warning(f"⏳ Stash {method} {reason}, retry {attempt + 1}/{self.max_retries} in {backoff:.1f}s")
+            check_wait(backoff, f"Stash {method} retry backoff")
+            await asyncio.sleep(backoff)
+            attempt += 1
@@ -2,50 +2,226 @@
 Repository rules manager for customizing prompts and rules per repository
 """
 
+import fnmatch
+import logging
 import os
+import re
+import threading
+import time
 import yaml
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Repository keys starting with this are regular expressions; keys with glob
+# characters are shell patterns; everything else is an exact name
+REGEX_PREFIX = 're:'
+GLOB_CHARS = set('*?[')
+
+_NOT_FOUND = object()
+
+
+class RulesVersion:
+    """
+    One immutable load of repository_rules.yaml
+
+    Exact names resolve through a dict. Glob and regex keys are compiled
+    one by one and tried in file order (first match wins). Every resolved
+    name and prompt fragment is memoized, so lookups are O(1) after the
+    first one however many repositories are configured.
+    """
+
+    def __init__(self, rules: Dict, stamp: Tuple = (), number: int = 0):
+        """
+        Index a parsed rules file
+
+        Args:
+            rules: Parsed YAML
+            stamp: (mtime_ns, size) of the file it was read from
+            number: Reload counter
+
+        Raises:
+            ValueError: If the file or one of its repository entries is not a mapping
+        """
+        if not isinstance(rules, dict):
+            raise ValueError("top level must be a mapping")
+        repositories = rules.get('repositories') or {}
+        if not isinstance(repositories, dict):
+            raise ValueError("'repositories' must be a mapping")
+
+        self.rules = rules
+        self.stamp = stamp
+        self.number = number
+        self.exact: Dict[str, Dict] = {}
+        self.patterns: List[Tuple[str, 're.Pattern', Dict]] = []
+
+        for key, config in repositories.items():
+            key, config = str(key), config or {}
+            if not isinstance(config, dict):
+                raise ValueError(f"repository '{key}' must be a mapping, not {type(config).__name__}")
+            if key.startswith(REGEX_PREFIX):
+                pattern = key[len(REGEX_PREFIX):]
+            elif GLOB_CHARS & set(key):
+                pattern = fnmatch.translate(key)
+            else:
+                self.exact[key] = config
+                continue
+            try:
+                compiled = re.compile(pattern)
+            except re.error as e:
+                logger.error(f"Invalid repository pattern '{key}' in rules: {e}")
+                continue
+            self.patterns.append((key, compiled, config))
+
+        self._resolved: Dict[str, Optional[Dict]] = {}
+        self._fragments: Dict[Tuple[str, str], str] = {}
+
+    def resolve(self, repository_name: str) -> Optional[Dict]:
+        """Configuration of a repository by exact name, then by pattern"""
+        config = self._resolved.get(repository_name, _NOT_FOUND)
+        if config is not _NOT_FOUND:
+            return config
+        config = self.exact.get(repository_name)
+        if config is None:
+            config = next((config for _, pattern, config in self.patterns
+                           if pattern.fullmatch(repository_name)), None)
+        self._resolved[repository_name] = config
+        return config
+
+    def fragment(self, repository_name: str, prompt_type: str) -> str:
+        """Memoized prompt context of a repository (see get_prompt_context)"""
+        key = (repository_name, prompt_type)
+        text = self._fragments.get(key)
+        if text is None:
+            text = self._compile_fragment(repository_name, prompt_type)
+            self._fragments[key] = text
+        return text
+
+    def _compile_fragment(self, repository_name: str, prompt_type: str) -> str:
+        config = self.resolve(repository_name)
+        if not config:
+            return ""
+
+        sections = [f"Repository: {repository_name}"]
+        if config.get('description'):
+            sections[0] += f" - {config['description']}"
+
+        tech_stack = config.get('tech_stack', {})
+        if tech_stack:
+            sections.append("Repository Technology Stack:\n" +
+                            "\n".join(f"- {key}: {value}" for key, value in tech_stack.items()))
+
+        rules = config.get('rules', [])
+        if rules:
+            sections.append("Repository Specific Rules:\n" + "\n".join(f"- {rule}" for rule in rules))
+
+        guidelines = (config.get('prompts') or {}).get(prompt_type, "")
+        if guidelines:
+            sections.append(f"Repository Specific Guidelines:\n{guidelines.strip()}")
+
+        return "\n\n".join(sections)
+
 
 class RepositoryRulesManager:
-    """Manages repository-specific rules and prompts"""
-    
-    def __init__(self, config_path: str = "config/repository_rules.yaml"):
+    """
+    Manages repository-specific rules and prompts
+
+    The rules file is re-read when its mtime or size changes (checked at
+    most every reload_interval seconds), so rule edits apply without a
+    restart. A reload swaps in a new RulesVersion in one assignment; a file
+    that fails to parse, or has an entry that is not a mapping, keeps the
+    previous version.
+    """
+
+    def __init__(self, config_path: str = "config/repository_rules.yaml", reload_interval: float = 2.0):
         """
         Initialize repository rules manager
-        
+
         Args:
             config_path: Path to repository rules config file
+            reload_interval: Seconds between file change checks (0 = check on every lookup)
         """
         self.config_path = config_path
-        self.rules = self._load_rules()
-    
-    def _load_rules(self) -> Dict:
-        """Load repository rules from yaml file"""
-        if not os.path.exists(self.config_path):
-            return {}
-            
-        with open(self.config_path, 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f)
-    
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._checked_at = time.monotonic()
+        self._failed_stamp: Tuple = ()
+        self._version = RulesVersion({})
+        self._reload()
+
+    @property
+    def rules(self) -> Dict:
+        """Parsed content of the current rules file"""
+        return self._current().rules
+
+    @property
+    def version(self) -> int:
+        """Number of times the rules were (re)loaded"""
+        return self._current().number
+
+    def _stamp(self) -> Tuple:
+        try:
+            stat = os.stat(self.config_path)
+        except OSError:
+            return ()
+        return stat.st_mtime_ns, stat.st_size
+
+    def _reload(self) -> None:
+        """Load the file if it changed since the current version"""
+        with self._lock:
+            current = self._version
+            stamp = self._stamp()
+            if (stamp == current.stamp and current.number) or (stamp and stamp == self._failed_stamp):
+                return
+
+            rules = {}
+            if stamp:
+                try:
+                    with open(self.config_path, 'r', encoding='utf-8') as f:
+                        rules = yaml.safe_load(f) or {}
+                except (OSError, yaml.YAMLError) as e:
+                    self._failed_stamp = stamp
+                    logger.error(f"Failed to load {self.config_path}, keeping previous rules: {e}")
+                    return
+
+            try:
+                version = RulesVersion(rules, stamp, current.number + 1)
+            except (ValueError, re.error, AttributeError, TypeError) as e:
+                self._failed_stamp = stamp
+                logger.error(f"Invalid rules in {self.config_path}, keeping previous rules: {e}")
+                return
+            self._version = version
+            if current.number:
+                logger.info(f"📜 Reloaded repository rules from {self.config_path} "
+                            f"({len(rules.get('repositories') or {})} entries)")
+
+    def _current(self) -> RulesVersion:
+        """Current rules, reloaded first if the file changed"""
+        now = time.monotonic()
+        if now - self._checked_at >= self.reload_interval:
+            self._checked_at = now
+            self._reload()
+        return self._version
+
     def get_repository_config(self, repository_name: str) -> Optional[Dict]:
         """
         Get repository specific configuration
-        
+
         Args:
-            repository_name: Name of the repository
-            
+            repository_name: Name of the repository (matched exactly, then against glob/'re:' keys)
+
         Returns:
             Repository configuration if exists, None otherwise
         """
-        return self.rules.get('repositories', {}).get(repository_name)
-    
+        return self._current().resolve(repository_name)
+
     def get_repository_prompts(self, repository_name: str) -> Dict[str, str]:
         """
         Get repository specific prompts
-        
+
         Args:
             repository_name: Name of the repository
-            
+
         Returns:
             Dictionary of prompt types and their values
         """
@@ -53,18 +229,35 @@ class RepositoryRulesManager:
         if not config:
             return {}
         return config.get('prompts', {})
-    
+
     def get_repository_rules(self, repository_name: str) -> list:
         """
         Get repository specific rules
-        
+
         Args:
             repository_name: Name of the repository
-            
+
         Returns:
             List of rules for the repository
         """
         config = self.get_repository_config(repository_name)
         if not config:
             return []
-        return config.get('rules', [])
\ No newline at end of file
+        return config.get('rules', [])
+
+    def get_prompt_context(self, repository_name: str, prompt_type: str) -> str:
+        """
+        Get the repository section appended to a system prompt
+
+        The text only depends on the rules file, so it is byte-identical for
+        every PR of a repository and the LLM backend can reuse its KV cache
+        for the whole system prompt. It is built once per rules version.
+
+        Args:
+            repository_name: Name of the repository
+            prompt_type: Type of prompt (e.g. code_review, pr_analysis)
+
+        Returns:
+            Repository context text, or empty string if the repository has no config
+        """
+        return self._current().fragment(repository_name, prompt_type)
@@ -0,0 +1,160 @@
+"""
+History retention - Compaction, archival and vacuum of pr_history
+"""
+
+import gzip
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class RetentionManager:
+    """
+    Keeps pr_history small enough for the dashboard after long operation
+
+    Per run:
+        1. zlib-compress large reasoning/concerns values older than
+           compress_after_days
+        2. move rows older than detail_days out of pr_history - to the
+           pr_history_archive table, to a gzip JSONL file, or drop them.
+           Daily/per-repo rollups were updated on insert and are kept, so
+           dashboard statistics still cover the full history
+        3. delete per-PR trace waterfalls older than trace_days
+        4. incremental VACUUM and WAL truncation
+
+    Runs at most once per interval_hours; the last run is recorded in the
+    database so restarts and other instances do not repeat it.
+    """
+
+    TASK = 'retention'
+
+    def __init__(self, db, config: Dict):
+        """
+        Initialize retention manager
+
+        Args:
+            db: Database instance
+            config: Configuration dictionary
+        """
+        retention = config.get('retention', {})
+        self.db = db
+        self.enabled = retention.get('enabled', True)
+        self.detail_days = int(retention.get('detail_days', 180))
+        self.compress_after_days = int(retention.get('compress_after_days', 30))
+        self.compress_min_bytes = int(retention.get('compress_min_bytes', 512))
+        self.archive = retention.get('archive', 'table')
+        self.archive_dir = Path(retention.get('archive_dir', 'data/archive'))
+        self.trace_days = int(retention.get('trace_days', 30))
+        self.job_days = int(retention.get('job_days', 30))
+        self.vacuum_pages = int(retention.get('vacuum_pages', 0))
+        self.interval = float(retention.get('interval_hours', 24)) * 3600
+
+        if self.archive not in ('table', 'file', 'none'):
+            raise ValueError(f"Unknown retention archive mode: {self.archive}. Use 'table', 'file' or 'none'")
+
+    def run_if_due(self) -> None:
+        """Run retention if enabled and interval_hours have passed"""
+        if not self.enabled:
+            return
+
+        last_run = self.db.get_maintenance_run(self.TASK)
+        if last_run and time.time() - last_run < self.interval:
+            return
+
+        try:
+            self.run()
+        except Exception as e:
+            logger.error(f"Error running history retention: {e}", exc_info=True)
+
+    def run(self) -> Dict:
+        """
+        Run compaction, archival and vacuum now
+
+        Returns:
+            Run summary dictionary
+        """
+        started = time.monotonic()
+        now = int(time.time())
+
+        compressed = 0
+        if self.compress_after_days > 0:
+            compressed = self.db.compress_history(
+                self._cutoff(now, self.compress_after_days), self.compress_min_bytes
+            )
+
+        archived = 0
+        if self.detail_days > 0:
+            cutoff = self._cutoff(now, self.detail_days)
+            if self.archive == 'table':
+                archived = self.db.archive_history(cutoff)
+            else:
+                archived = self._archive_to_file(cutoff)
+
+        traces = 0
+        if self.trace_days > 0:
+            traces = self.db.purge_pr_traces(self._cutoff(now, self.trace_days))
+
+        jobs = 0
+        if self.job_days > 0:
+            jobs = self.db.purge_pr_jobs(older_than_days=self.job_days)
+
+        db_bytes = self.db.incremental_vacuum(self.vacuum_pages)
+
+        summary = {
+            'compressed': compressed,
+            'archived': archived,
+            'archive': self.archive,
+            'traces': traces,
+            'jobs': jobs,
+            'db_bytes': db_bytes,
+            'duration': round(time.monotonic() - started, 2),
+        }
+        self.db.set_maintenance_run(self.TASK, summary)
+        logger.info(f"🧹 History retention: {compressed} value(s) compressed, "
+                    f"{archived} row(s) archived ({self.archive}), {traces} trace(s) and {jobs} job(s) purged, "
+                    f"database {db_bytes / 1024 / 1024:.1f} MB, {summary['duration']}s")
+        return summary
+
+    @staticmethod
+    def _cutoff(now: int, days: int) -> int:
+        """Start of the day N days ago, so whole days leave pr_history"""
+        return (now - days * 86400) // 86400 * 86400
+
+    def _archive_to_file(self, cutoff: int) -> int:
+        """
+        Export rows older than cutoff to gzip JSONL (archive: file) and delete them
+
+        Args:
+            cutoff: Epoch second cutoff
+
+        Returns:
+            Number of rows removed from pr_history
+        """
+        archive_file = None
+        if self.archive == 'file':
+            self.archive_dir.mkdir(parents=True, exist_ok=True)
+            archive_file = self.archive_dir / f"pr_history-{time.strftime('%Y%m%d-%H%M%S')}.jsonl.gz"
+
+        removed = 0
+        while True:
+            rows = self.db.get_history_before(cutoff)
+            if not rows:
+                break
+
+            if archive_file:
+                with gzip.open(archive_file, 'at', encoding='utf-8') as f:
+                    for row in rows:
+                        f.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+            deleted = self.db.delete_history([row['id'] for row in rows])
+            removed += deleted
+            if deleted < len(rows):
+                break
+
+        if archive_file and removed:
+            logger.info(f"Archived {removed} PR record(s) to {archive_file}")
+        return removed
@@ -0,0 +1,590 @@
+"""
+Review pipeline - The per-PR review steps shared by the sync and async runtimes
+"""
+
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from cycle_scheduler import DeadlineExceeded, check_deadline
+from pr_analyzer import is_oversized_pr
+from pr_scheduler import pr_key
+from metrics import REGISTRY, CACHE_LOOKUPS
+from tracing import TRACER, traced
+from profiling import PROFILER
+from traffic_recorder import TRAFFIC
+
+logger = logging.getLogger(__name__)
+
+PR_DECISIONS = REGISTRY.counter('pr_decisions_total', 'Review decisions by outcome (approve, reject, skip)', ['outcome'])
+FALLBACK_APPROVALS = REGISTRY.counter('fallback_approvals_total', 'Approvals made without AI analysis', ['reason'])
+
+# Files never reviewed line by line
+NON_CODE_SUFFIXES = ('.json', '.xml', '.md', '.txt', '.yml', '.yaml')
+MAX_INLINE_FILES = 10
+SEVERITY_EMOJI = {'critical': '🔴', 'warning': '⚠️', 'info': 'ℹ️'}
+
+
+class BlockingIO:
+    """
+    Awaitable facade over a blocking client (StashClient, OllamaAgent, AIAgent)
+
+    Every method becomes a coroutine function that calls the client inline,
+    or in a worker thread with offload=True so an event loop is not blocked.
+    Other attributes are passed through.
+    """
+
+    def __init__(self, client, offload: bool = False):
+        """
+        Initialize facade
+
+        Args:
+            client: Blocking client
+            offload: Run calls with asyncio.to_thread
+        """
+        self._client = client
+        self._offload = offload
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._client, name)
+        if not callable(attribute):
+            return attribute
+
+        async def call(*args, **kwargs):
+            if self._offload:
+                return await asyncio.to_thread(attribute, *args, **kwargs)
+            return attribute(*args, **kwargs)
+
+        call.__name__ = name
+        return call
+
+
+class ReviewPipeline:
+    """
+    Reviews one pull request: fetch, decide, comment/approve, log
+
+    The steps are written once as coroutines over pluggable I/O. The async
+    runtime passes AsyncStashClient/AsyncOllamaAgent and offloads blocking
+    database calls to threads; the sync runtime passes its blocking clients
+    wrapped in BlockingIO and runs each review with asyncio.run on the
+    thread that processes the PR. Both therefore make the same decisions and
+    persist the same job stages and history rows.
+
+    Between job stages and before every Stash write the pipeline calls
+    check_deadline, so a PR preempted by the CycleRunner stops before
+    commenting on or approving a PR it may no longer own.
+    """
+
+    def __init__(self, app, stash, llm, offload: bool = False):
+        """
+        Initialize pipeline
+
+        Args:
+            app: Configured StashAgentApp (config, analyzer, scheduler, jobs, db writer, status, sharding)
+            stash: Stash client with awaitable methods
+            llm: AI agent with awaitable analyze_pull_request (and analyze_file_changes for inline reviews)
+            offload: Run blocking database and coordination calls in worker threads
+        """
+        self.app = app
+        self.stash = stash
+        self.llm = llm
+        self.offload = offload
+        # Only the Ollama agent reviews single files
+        self.inline_reviews = hasattr(app.ai_agent, 'analyze_file_changes')
+
+    async def _blocking(self, fn, *args, **kwargs):
+        """Call a blocking function inline, or in a worker thread when offloading"""
+        if self.offload:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        return fn(*args, **kwargs)
+
+    async def _advance(self, job, stage: str, **state) -> None:
+        """Persist a job stage"""
+        await self._blocking(job.advance, stage, **state)
+
+    async def run(self, pr: Dict) -> None:
+        """
+        Review a PR if this instance holds (or needs no) lease on it
+
+        In lease mode the lease is released only after the PR's history row
+        is committed and its job is 'logged'; otherwise another instance
+        could claim the PR in between and log it a second time.
+
+        Args:
+            pr: Pull request dictionary
+        """
+        app = self.app
+        if not await self._blocking(app.sharding.claim, pr):
+            return
+        app.status.pr_started(pr)
+        try:
+            with TRAFFIC.pr_scope(pr), TRACER.trace('review_pr', **self.trace_attributes(pr)), \
+                    PROFILER.pr_session(pr):
+                await self.process(pr)
+        finally:
+            app.status.pr_finished(pr)
+            if app.sharding.mode == 'lease' and not await self._blocking(
+                    app.db_writer.flush, app.sharding.lease_ttl):
+                logger.warning(f"⚠️  History of PR #{pr.get('id')} not committed within "
+                               f"{app.sharding.lease_ttl:.0f}s, releasing its lease anyway")
+            await self._blocking(app.sharding.release, pr)
+
+    @staticmethod
+    def trace_attributes(pr: Dict) -> Dict:
+        """
+        Root span attributes identifying a PR
+
+        Args:
+            pr: Pull request dictionary
+
+        Returns:
+            Dictionary with project_key, repo_slug, pr_id and title
+        """
+        key = pr_key(pr)
+        if not key:
+            return {'title': pr.get('title', '')}
+        project_key, repo_slug, pr_id = key
+        return {'project_key': project_key, 'repo_slug': repo_slug, 'pr_id': pr_id,
+                'title': pr.get('title', '')}
+
+    async def process(self, pr: Dict) -> None:
+        """
+        Process a single pull request
+
+        Args:
+            pr: Pull request dictionary
+        """
+        try:
+            await self._process(pr)
+            # Stash client methods swallow errors, DeadlineExceeded included,
+            # and the pipeline returns early on them: carry such PRs over
+            # instead of counting them as finished
+            check_deadline(f"finishing PR #{pr.get('id')}")
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Error processing PR: {e}", exc_info=True)
+
+    async def _process(self, pr: Dict) -> None:
+        app = self.app
+        identifiers = app.pr_analyzer.extract_pr_identifiers(pr)
+        if not identifiers:
+            logger.error("Could not extract PR identifiers")
+            return
+
+        project_key, repo_slug, pr_id = identifiers
+        logger.info(f"\n{'=' * 50}")
+        logger.info(f"📋 Processing PR #{pr_id}: {pr.get('title', 'No title')}")
+        logger.info(f"   Repository: {project_key}/{repo_slug}")
+        logger.info(f"   Author: {pr.get('author', {}).get('user', {}).get('displayName', 'Unknown')}")
+
+        # Resume from the last completed stage of this revision
+        job = await self._blocking(app.jobs.load, pr, identifiers)
+        if job.done('logged'):
+            logger.info(f"✅ Already reviewed this revision of PR #{pr_id} "
+                        f"({job.state.get('status', 'done')}), skipping...")
+            return
+
+        approval_status = await self.stash.check_my_approval_status(project_key, repo_slug, pr_id)
+        if approval_status == 'APPROVED':
+            logger.info(f"✅ Already approved PR #{pr_id}, skipping...")
+            return
+
+        pr_details = await self.stash.get_pull_request_details(project_key, repo_slug, pr_id)
+        if not pr_details:
+            logger.error(f"Could not fetch details of PR #{pr_id}")
+            return
+
+        # Independent fetches (concurrent on the async runtime)
+        changes, diff, activities = await asyncio.gather(
+            self.stash.get_pull_request_changes(project_key, repo_slug, pr_id),
+            self.stash.get_pull_request_diff(project_key, repo_slug, pr_id),
+            self.stash.get_pull_request_activities(project_key, repo_slug, pr_id),
+        )
+        pr_details['changes'] = changes
+        pr_details['diff'] = diff
+        pr_details['activities'] = activities
+
+        if diff:
+            logger.info(f"   📄 Diff retrieved: {len(diff.splitlines())} lines")
+            logger.debug(f"   First 500 chars of diff:\n{diff[:500]}")
+        else:
+            logger.warning(f"   ⚠️  Diff of PR #{pr_id} is empty or None!")
+
+        with TRACER.span('calculate_stats'):
+            stats = app.pr_analyzer.calculate_pr_stats(pr_details)
+        app.scheduler.record_size(pr, stats['files_changed'] + stats['total_changes'])
+        logger.info(f"   Stats: {stats['files_changed']} files, "
+                    f"+{stats['additions']} -{stats['deletions']} lines")
+        logger.info(f"   📦 Changes retrieved: {len(changes)} file(s)")
+        for i, change in enumerate(changes[:3]):
+            logger.info(f"      {i + 1}. {change.get('type', 'MODIFY')}: {change.get('path', 'unknown')} "
+                        f"({len(change.get('hunks', []))} hunk(s))")
+
+        should_analyze, reason = app.pr_analyzer.should_analyze_pr(pr_details)
+        if not should_analyze:
+            logger.warning(f"⚠️  Skipping PR #{pr_id}: {reason}")
+            return
+
+        await self._advance(job, 'fetched', stats=stats)
+        check_deadline(f"analysing PR #{pr_id}")
+
+        if job.done('analysed'):
+            # Reuse the stored decision instead of calling the AI again
+            analysis = job.state.get('analysis')
+            fallback_reason = job.state.get('fallback_reason', '')
+            should_approve = job.state.get('should_approve', False)
+            approve_reason = job.state.get('approve_reason', '')
+            CACHE_LOOKUPS.labels('analysis', 'hit').inc()
+            logger.info(f"♻️  Reusing stored analysis for PR #{pr_id}: {approve_reason}")
+        else:
+            CACHE_LOOKUPS.labels('analysis', 'miss').inc()
+            analysis, fallback_reason, should_approve, approve_reason = self.count_decision(
+                await self.decide(pr_details, stats)
+            )
+            if approve_reason is None:
+                return
+            await self._advance(job, 'analysed', analysis=analysis, fallback_reason=fallback_reason,
+                                should_approve=should_approve, approve_reason=approve_reason)
+
+        if not should_approve:
+            logger.info(f"❌ Not approving PR #{pr_id}: {approve_reason}")
+            await self.handle_rejection(pr_details, project_key, repo_slug, pr_id,
+                                        analysis, approve_reason, stats, job)
+            return
+
+        logger.info(f"✅ Decision for PR #{pr_id}: APPROVE - {approve_reason}")
+
+        if app.dry_run:
+            logger.info(f"🔸 DRY RUN - Would have approved PR #{pr_id}")
+            # Log to database even in dry run
+            await self.log_pr(pr_details, project_key, repo_slug, pr_id, 'approved', analysis, stats, job)
+            return
+
+        if not job.done('commented'):
+            check_deadline(f"commenting on PR #{pr_id}")
+            comment = app.ai_agent.get_approval_comment(analysis, fallback_reason)
+            if await self.stash.add_comment_to_pull_request(project_key, repo_slug, pr_id, comment):
+                await self._advance(job, 'commented')
+
+        if not job.done('approved'):
+            check_deadline(f"approving PR #{pr_id}")
+            if not await self.stash.approve_pull_request(project_key, repo_slug, pr_id):
+                logger.error(f"Failed to approve PR #{pr_id}")
+                return
+            await self._advance(job, 'approved')
+
+        logger.info(f"🎉 Successfully approved PR #{pr_id}!")
+        await self.log_pr(pr_details, project_key, repo_slug, pr_id, 'approved', analysis, stats, job)
+
+    @traced('decide')
+    async def decide(self, pr_details: Dict, stats: Dict) -> tuple:
+        """
+        Run AI analysis (unless oversized) and decide on approval
+
+        Args:
+            pr_details: Full PR details with changes and diff
+            stats: PR statistics
+
+        Returns:
+            Tuple of (analysis, fallback_reason, should_approve, approve_reason);
+            approve_reason is None when the PR should be skipped
+        """
+        app = self.app
+        pr_id = pr_details.get('id')
+        criteria = app.config.get('approval_criteria', {})
+
+        if is_oversized_pr(pr_details, app.config) and criteria.get('auto_approve_oversized', False):
+            logger.warning(f"⚠️  PR #{pr_id} boyutu limit aşımı - AI analizi atlanıyor")
+            logger.info("✅ Oversized PR otomatik approve (ayarlardan etkin)")
+            approve_reason = (f"Oversized PR auto-approved: {stats['files_changed']} files, "
+                              f"{stats['total_changes']} lines")
+            return None, "oversized PR, AI analysis skipped", True, approve_reason
+
+        logger.info(f"🤖 Running AI analysis for PR #{pr_id}...")
+        analysis = await self.llm.analyze_pull_request(pr_details)
+        fallback_reason = ""
+
+        if analysis:
+            logger.info(f"   AI Decision: {'✅ APPROVE' if analysis.get('approve') else '❌ DO NOT APPROVE'}")
+            logger.info(f"   Confidence: {analysis.get('confidence_score')}%")
+            logger.info(f"   Reasoning: {analysis.get('reasoning')}")
+            if analysis.get('concerns'):
+                logger.warning(f"   Concerns: {', '.join(analysis.get('concerns'))}")
+        else:
+            logger.error(f"❌ AI analysis failed for PR #{pr_id}")
+            if criteria.get('auto_approve_on_ai_failure', False):
+                logger.warning("⚠️  AI hatası - ancak otomatik onay aktif")
+                fallback_reason = "AI service unavailable"
+            else:
+                logger.info("❌ AI hatası ve otomatik onay kapalı - PR atlanıyor")
+                return None, "", False, None
+
+        should_approve, approve_reason = app.pr_analyzer.should_approve_based_on_ai(analysis, pr_details)
+        return analysis, fallback_reason, should_approve, approve_reason
+
+    @staticmethod
+    def count_decision(decision: tuple) -> tuple:
+        """
+        Count a decide() result in the decision metrics
+
+        Args:
+            decision: Tuple returned by decide
+
+        Returns:
+            The same tuple
+        """
+        analysis, fallback_reason, should_approve, approve_reason = decision
+        outcome = 'skip' if approve_reason is None else 'approve' if should_approve else 'reject'
+        PR_DECISIONS.labels(outcome).inc()
+        if should_approve and fallback_reason:
+            reason = 'oversized' if fallback_reason.startswith('oversized') else 'ai_unavailable'
+            FALLBACK_APPROVALS.labels(reason).inc()
+        return decision
+
+    @traced('handle_rejection')
+    async def handle_rejection(self, pr_details: Dict, project_key: str, repo_slug: str,
+                               pr_id: int, analysis: Optional[Dict], reason: str, stats: Dict,
+                               job) -> None:
+        """
+        Handle PR rejection with comment and/or decline
+
+        Args:
+            pr_details: PR details dictionary
+            project_key: Project key
+            repo_slug: Repository slug
+            pr_id: PR ID
+            analysis: AI analysis result (can be None)
+            reason: Rejection reason
+            stats: PR statistics
+            job: Durable review job (completed stages are skipped)
+        """
+        app = self.app
+        criteria = app.config.get('approval_criteria', {})
+        comment_on_reject = criteria.get('comment_on_reject', True)
+        mark_needs_work = criteria.get('mark_needs_work_on_reject', True)
+        decline_on_reject = criteria.get('decline_on_reject', False)
+        add_inline_comments = criteria.get('add_inline_comments_on_reject', True)
+
+        if job.done('commented'):
+            logger.info(f"♻️  Rejection comments already posted on PR #{pr_id}, skipping")
+        else:
+            check_deadline(f"commenting on PR #{pr_id}")
+            if add_inline_comments and self.inline_reviews:
+                try:
+                    await self.add_inline_comments(pr_details, project_key, repo_slug, pr_id)
+                except DeadlineExceeded:
+                    raise
+                except Exception as e:
+                    # Inline comments are best effort, the rejection comment is still posted
+                    logger.error(f"Error adding inline comments: {e}", exc_info=True)
+
+            if comment_on_reject:
+                comment = self.build_rejection_comment(analysis, reason)
+                if app.dry_run:
+                    logger.info(f"🔸 DRY RUN - Would have added rejection comment to PR #{pr_id}:")
+                    logger.info(f"   {comment[:200]}...")
+                elif await self.stash.add_comment_to_pull_request(project_key, repo_slug, pr_id, comment):
+                    logger.info("✅ Rejection comment added")
+                else:
+                    logger.error(f"❌ Failed to add rejection comment to PR #{pr_id}")
+
+            await self._advance(job, 'commented')
+
+        if not job.done('approved'):
+            check_deadline(f"marking PR #{pr_id}")
+            # Mark as "Needs Work" if configured
+            if mark_needs_work:
+                if app.dry_run:
+                    logger.warning(f"🔸 DRY RUN - Would have marked PR #{pr_id} as NEEDS WORK")
+                elif await self.stash.mark_needs_work(project_key, repo_slug, pr_id):
+                    logger.warning(f"⚠️  PR #{pr_id} marked as NEEDS WORK")
+                else:
+                    logger.error(f"❌ Failed to mark PR #{pr_id} as needs work")
+
+            # Decline PR if configured (more aggressive than needs_work)
+            if decline_on_reject:
+                if app.dry_run:
+                    logger.warning(f"🔸 DRY RUN - Would have DECLINED PR #{pr_id}")
+                elif await self.stash.decline_pull_request(project_key, repo_slug, pr_id,
+                                                           pr_details.get('version', 0)):
+                    logger.warning(f"⛔ PR #{pr_id} has been DECLINED")
+                else:
+                    logger.error(f"❌ Failed to decline PR #{pr_id}")
+
+            await self._advance(job, 'approved')
+
+        status = 'declined' if decline_on_reject else 'needs_work' if mark_needs_work else 'rejected'
+        await self.log_pr(pr_details, project_key, repo_slug, pr_id, status, analysis, stats, job)
+
+    @traced('inline_review')
+    async def add_inline_comments(self, pr_details: Dict, project_key: str,
+                                  repo_slug: str, pr_id: int) -> None:
+        """
+        Analyze changed files and add inline comments to specific code changes
+
+        Args:
+            pr_details: Full PR details with changes
+            project_key: Project key
+            repo_slug: Repository slug
+            pr_id: PR ID
+        """
+        files = [
+            change for change in pr_details.get('changes', [])[:MAX_INLINE_FILES]
+            if change.get('hunks') and not change.get('path', '').endswith(NON_CODE_SUFFIXES)
+        ]
+        if not files:
+            logger.debug("No changes to analyze for inline comments")
+            return
+
+        logger.info(f"🔍 Analyzing {len(files)} file(s) for inline comments...")
+
+        async def review_file(change: Dict) -> Optional[Dict]:
+            check_deadline(f"reviewing {change['path']} of PR #{pr_id}")
+            try:
+                with TRACER.span('review_file', path=change['path']):
+                    return await self.llm.analyze_file_changes(change['path'], change['hunks'], repo_slug)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                # One failed file does not cost the other files their comments
+                logger.error(f"Error reviewing {change['path']}: {e}", exc_info=True)
+                return None
+
+        analyses = await asyncio.gather(*(review_file(change) for change in files))
+        # Not re-checked before the summary comment: inline and summary
+        # comments share the 'commented' stage, a retry would repeat them
+        check_deadline(f"posting inline comments on PR #{pr_id}")
+
+        posts = []
+        for change, file_analysis in zip(files, analyses):
+            for item in (file_analysis or {}).get('comments', []):
+                line_num = item.get('line', 0)
+                comment_text = item.get('comment', '')
+                if not line_num or not comment_text:
+                    continue
+                emoji = SEVERITY_EMOJI.get(item.get('severity', 'info'), 'ℹ️')
+                formatted = f"{emoji} **Gordion AI Review**\n\n{comment_text}"
+                if self.app.dry_run:
+                    logger.info(f"🔸 DRY RUN - Would add inline comment to {change['path']}:{line_num}")
+                    logger.info(f"   {formatted[:100]}...")
+                else:
+                    posts.append(self.stash.add_inline_comment(
+                        project_key, repo_slug, pr_id, change['path'], line_num, formatted
+                    ))
+
+        added = sum(1 for ok in await asyncio.gather(*posts) if ok)
+        if added:
+            logger.info(f"✅ Added {added} inline comment(s) to PR #{pr_id}")
+        else:
+            logger.info("ℹ️  No inline comments needed")
+
+    @traced('log_pr')
+    async def log_pr(self, pr_details: Dict, project_key: str, repo_slug: str, pr_id: int,
+                     status: str, analysis: Optional[Dict], stats: Dict, job) -> None:
+        """
+        Queue the PR history record on the batched database writer
+
+        The job only reaches 'logged' once the writer has committed the
+        row. If the process dies before the flush, the job stays at
+        'approved' and the next run logs the PR again without touching
+        Stash.
+
+        Args:
+            pr_details: PR details
+            project_key: Project key
+            repo_slug: Repository slug
+            pr_id: PR ID
+            status: Status (approved, rejected, needs_work, declined)
+            analysis: AI analysis result
+            stats: PR statistics
+            job: Review job, advanced to 'logged' when the row is committed
+        """
+        try:
+            pr_data = self.build_pr_record(pr_details, project_key, repo_slug, pr_id,
+                                           status, analysis, stats)
+            # Only blocks when the writer queue is full
+            await self._blocking(self.app.db_writer.add_pr_record, pr_data,
+                                 lambda: job.advance('logged', status=status))
+            self.app.scheduler.record_review(pr_details)
+            logger.debug(f"PR #{pr_id} queued for database")
+        except Exception as e:
+            logger.error(f"Error logging PR to database: {e}", exc_info=True)
+
+    def build_pr_record(self, pr_details: Dict, project_key: str, repo_slug: str,
+                        pr_id: int, status: str, analysis: Optional[Dict], stats: Dict) -> Dict:
+        """
+        Build a pr_history record
+
+        Args:
+            pr_details: PR details
+            project_key: Project key
+            repo_slug: Repository slug
+            pr_id: PR ID
+            status: Status (approved, rejected, needs_work, declined)
+            analysis: AI analysis result
+            stats: PR statistics
+
+        Returns:
+            Record dictionary for Database.add_pr_record
+        """
+        author_user = pr_details.get('author', {}).get('user', {})
+        author_name = author_user.get('displayName', author_user.get('name', 'Unknown'))
+
+        return {
+            'pr_id': pr_id,
+            'project_key': project_key,
+            'repo_slug': repo_slug,
+            'title': pr_details.get('title', 'No title'),
+            'author': author_name,
+            'status': status,
+            'confidence_score': analysis.get('confidence_score', 0) if analysis else 0,
+            'reasoning': analysis.get('reasoning', '') if analysis else '',
+            'concerns': analysis.get('concerns', []) if analysis else [],
+            'files_changed': stats.get('files_changed', 0),
+            'additions': stats.get('additions', 0),
+            'deletions': stats.get('deletions', 0),
+            'ai_model': getattr(self.app.ai_agent, 'model', 'unknown')
+        }
+
+    def build_rejection_comment(self, analysis: Optional[Dict], reason: str) -> str:
+        """
+        Build rejection comment based on AI analysis
+
+        Args:
+            analysis: AI analysis result (can be None)
+            reason: Rejection reason
+
+        Returns:
+            Comment text
+        """
+        if not analysis:
+            return f"""🤖 **AI Code Review - NOT APPROVED**
+
+**Reason:** {reason}
+
+⚠️ This PR was not automatically approved. Please review the changes carefully.
+
+*Automated by Stash PR Agent*"""
+
+        confidence = analysis.get('confidence_score', 0)
+        reasoning = analysis.get('reasoning', 'No specific reasoning provided')
+        concerns = analysis.get('concerns', [])
+
+        comment = f"""🤖 **AI Code Review - NOT APPROVED**
+
+**Confidence:** {confidence}%
+
+**Analysis:**
+{reasoning}
+"""
+
+        if concerns:
+            comment += "\n**⚠️ Concerns:**\n"
+            for concern in concerns:
+                comment += f"- {concern}\n"
+
+        comment += "\n---\n*Please address these issues before merging.*\n"
+        comment += f"*Automated by Gordion PR Agent using {getattr(self.app.ai_agent, 'model', 'AI')}*"
+
+        return comment
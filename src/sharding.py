@@ -0,0 +1,212 @@
+"""
+Sharding - Split the PR space between multiple agent instances
+"""
+
+import bisect
+import hashlib
+import logging
+import os
+import socket
+import threading
+from typing import Dict, List, Optional
+
+from pr_scheduler import pr_key
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(value: str) -> int:
+    """Stable 64-bit hash (Python's hash() is salted per process)"""
+    return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'big')
+
+
+def lease_key(pr: Dict) -> Optional[str]:
+    """
+    Build the lease key of a PR
+
+    Args:
+        pr: Pull request dictionary
+
+    Returns:
+        'PROJECT/repo#id' or None if identifiers are missing
+    """
+    key = pr_key(pr)
+    if not key:
+        return None
+    return f"{key[0]}/{key[1]}#{key[2]}"
+
+
+class ConsistentHashRing:
+    """Consistent hash ring with virtual nodes"""
+
+    def __init__(self, nodes: List[int], vnodes: int = 100):
+        """
+        Initialize hash ring
+
+        Args:
+            nodes: Node identifiers (shard indexes)
+            vnodes: Virtual nodes per node, smooths the distribution
+        """
+        ring = []
+        for node in nodes:
+            for replica in range(vnodes):
+                ring.append((_hash(f"shard-{node}-{replica}"), node))
+        ring.sort()
+        self._hashes = [h for h, _ in ring]
+        self._nodes = [n for _, n in ring]
+
+    def get_node(self, key: str) -> int:
+        """
+        Find the node owning a key
+
+        Args:
+            key: Key to place on the ring
+
+        Returns:
+            Node identifier
+        """
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._nodes[index]
+
+
+class ShardCoordinator:
+    """
+    Decides which PRs this agent instance may process
+
+    Modes:
+        none  - single instance, process everything
+        hash  - consistent hashing of project_key/repo_slug over shard_count
+                instances; each instance only sees its own repositories
+        lease - instances claim PRs through an atomic lease table in the
+                shared database; leases are renewed by a heartbeat thread
+                and expire if the owner dies
+    """
+
+    def __init__(self, config: Dict, db, instance_id: Optional[str] = None):
+        """
+        Initialize shard coordinator
+
+        Args:
+            config: Configuration dictionary
+            db: Database instance (used in lease mode)
+            instance_id: Unique name of this instance (default host-pid)
+        """
+        sharding = config.get('sharding', {})
+        self.mode = os.getenv('SHARD_MODE', sharding.get('mode', 'none')).lower()
+        self.shard_count = int(os.getenv('SHARD_COUNT', sharding.get('shard_count', 1)))
+        self.shard_index = int(os.getenv('SHARD_INDEX', sharding.get('shard_index', 0)))
+        self.lease_ttl = float(sharding.get('lease_ttl', 120))
+        self.instance_id = instance_id or os.getenv(
+            'INSTANCE_ID', f"{socket.gethostname()}-{os.getpid()}"
+        )
+        self.db = db
+
+        self._held = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat_thread: Optional[threading.Thread] = None
+
+        if self.mode not in ('none', 'hash', 'lease'):
+            raise ValueError(f"Unknown sharding mode: {self.mode}. Use 'none', 'hash' or 'lease'")
+
+        if self.mode == 'hash':
+            if not 0 <= self.shard_index < self.shard_count:
+                raise ValueError(f"SHARD_INDEX must be in [0, {self.shard_count}), got {self.shard_index}")
+            self.ring = ConsistentHashRing(list(range(self.shard_count)))
+            logger.info(f"Sharding: hash mode, shard {self.shard_index + 1}/{self.shard_count}")
+        elif self.mode == 'lease':
+            logger.info(f"Sharding: lease mode, instance '{self.instance_id}' (ttl {self.lease_ttl:.0f}s)")
+
+    def filter(self, pull_requests: List[Dict]) -> List[Dict]:
+        """
+        Keep only PRs owned by this shard (hash mode)
+
+        Args:
+            pull_requests: PRs from the inbox
+
+        Returns:
+            PRs this instance should consider
+        """
+        if self.mode != 'hash':
+            return pull_requests
+
+        owned = []
+        for pr in pull_requests:
+            key = pr_key(pr)
+            if key and self.ring.get_node(f"{key[0]}/{key[1]}") == self.shard_index:
+                owned.append(pr)
+
+        logger.info(f"Shard {self.shard_index}: {len(owned)}/{len(pull_requests)} PR(s) owned")
+        return owned
+
+    def claim(self, pr: Dict) -> bool:
+        """
+        Claim a PR before processing it (lease mode)
+
+        Args:
+            pr: Pull request dictionary
+
+        Returns:
+            True if this instance may process the PR
+        """
+        if self.mode != 'lease':
+            return True
+
+        key = lease_key(pr)
+        if not key:
+            return False
+
+        if self.db.claim_pr_lease(key, self.instance_id, self.lease_ttl):
+            with self._lock:
+                self._held.add(key)
+            return True
+
+        logger.info(f"PR #{pr.get('id')} is leased by another instance, skipping")
+        return False
+
+    def release(self, pr: Dict) -> None:
+        """
+        Release a PR lease after processing (lease mode)
+
+        Args:
+            pr: Pull request dictionary
+        """
+        if self.mode != 'lease':
+            return
+
+        key = lease_key(pr)
+        with self._lock:
+            self._held.discard(key)
+        self.db.release_pr_lease(key, self.instance_id)
+
+    def start_heartbeat(self) -> None:
+        """Start renewing held leases in the background (lease mode)"""
+        if self.mode != 'lease' or self._heartbeat_thread:
+            return
+
+        self._heartbeat_thread = threading.Thread(
+            target=self._heartbeat_loop, name="lease-heartbeat", daemon=True
+        )
+        self._heartbeat_thread.start()
+
+    def stop_heartbeat(self) -> None:
+        """Stop the heartbeat thread and drop all held leases"""
+        self._stop.set()
+        if self._heartbeat_thread:
+            self._heartbeat_thread.join(timeout=5)
+            self._heartbeat_thread = None
+        with self._lock:
+            held = list(self._held)
+            self._held.clear()
+        for key in held:
+            self.db.release_pr_lease(key, self.instance_id)
+
+    def _heartbeat_loop(self) -> None:
+        interval = max(1.0, self.lease_ttl / 3)
+        while not self._stop.wait(interval):
+            with self._lock:
+                held = list(self._held)
+            if held:
+                renewed = self.db.renew_pr_leases(held, self.instance_id, self.lease_ttl)
+                if renewed < len(held):
+                    logger.warning(f"⚠️  Lost {len(held) - renewed} PR lease(s) - another instance may take over")
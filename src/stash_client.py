@@ -2,17 +2,75 @@
 Stash/Bitbucket Server API Client
 """
 
+import re
+import time
 import requests
 from typing import List, Dict, Optional
 import logging
 
+from metrics import REGISTRY, LATENCY_BUCKETS
+from tracing import TRACER, traced
+from traffic_recorder import TRAFFIC, recorded_headers, replayed_response, response_body
+from rate_limiter import StashThrottle
+from cycle_scheduler import deadline_timeout
+
 logger = logging.getLogger(__name__)
 
+# (connect, read) seconds for every request, capped by the current PR deadline
+REQUEST_TIMEOUT = (5.0, 30.0)
+
+STASH_REQUEST_SECONDS = REGISTRY.histogram(
+    'stash_request_duration_seconds', 'Stash REST call latency by endpoint',
+    ['method', 'endpoint'], buckets=LATENCY_BUCKETS
+)
+STASH_REQUESTS = REGISTRY.counter(
+    'stash_requests_total', 'Stash REST calls by endpoint and HTTP status',
+    ['method', 'endpoint', 'status']
+)
+
+# Path segments replaced by placeholders so endpoint labels stay few
+_ENDPOINT_PLACEHOLDERS = {'projects': '{project}', 'repos': '{repo}', 'users': '{user}'}
+
+
+def endpoint_label(endpoint: str) -> str:
+    """
+    Normalize an API endpoint for use as a metric label
+
+    Args:
+        endpoint: Endpoint path, e.g. /projects/ABC/repos/app/pull-requests/12/changes
+
+    Returns:
+        Templated path, e.g. /projects/{project}/repos/{repo}/pull-requests/{id}/changes
+    """
+    path = endpoint.split('?')[0]
+    path = re.sub(r'/(projects|repos|users)/[^/]+',
+                  lambda m: f"/{m.group(1)}/{_ENDPOINT_PLACEHOLDERS[m.group(1)]}", path)
+    return re.sub(r'/\d+(?=/|$)', '/{id}', path)
+
+
+def observe_stash_request(method: str, endpoint: str, started: float, status: str) -> None:
+    """
+    Record latency and outcome of a Stash API call
+
+    Args:
+        method: HTTP method
+        endpoint: Endpoint path
+        started: time.monotonic() before the call
+        status: HTTP status code, or 'error' if no response arrived
+    """
+    label = endpoint_label(endpoint)
+    duration = time.monotonic() - started
+    STASH_REQUEST_SECONDS.labels(method, label).observe(duration)
+    STASH_REQUESTS.labels(method, label, status).inc()
+    TRACER.add_span(f"{method} {label}", duration, http_status=status,
+                    status='ok' if status.startswith(('2', '3')) else 'error')
+
 
 class StashClient:
     """Stash/Bitbucket Server API client"""
     
-    def __init__(self, base_url: str, username: str = None, password: str = None, token: str = None):
+    def __init__(self, base_url: str, username: str = None, password: str = None, token: str = None,
+                 throttle: Optional[StashThrottle] = None):
         """
         Initialize Stash client
         
@@ -21,6 +79,7 @@ class StashClient:
             username: Stash username (required for Basic Auth)
             password: Stash password (required for Basic Auth)
             token: Personal Access Token (alternative to username/password)
+            throttle: Rate limiting and retry policy (default: retries only, no rate limit)
             
         Note:
             Either (username + password) OR token must be provided.
@@ -36,6 +95,7 @@ class StashClient:
         self.password = password
         self.token = token
         self.session = requests.Session()
+        self.throttle = throttle or StashThrottle()
         
         # Choose authentication method
         if token:
@@ -83,17 +143,43 @@ class StashClient:
             return 'unknown'
         
     def _make_request(self, method: str, endpoint: str, **kwargs) -> requests.Response:
-        """Make HTTP request to Stash API"""
+        """Make HTTP request to Stash API (rate limited, retried on 429/5xx)"""
         url = f"{self.base_url}/rest/api/1.0{endpoint}"
         
+        def attempt() -> requests.Response:
+            started = time.monotonic()
+            status = 'error'
+            try:
+                if TRAFFIC.replaying:
+                    response = self._replayed_response(method, url, endpoint, kwargs.get('params'))
+                else:
+                    timeout = tuple(deadline_timeout(seconds, f"{method} {endpoint}")
+                                    for seconds in REQUEST_TIMEOUT)
+                    response = self.session.request(method, url, timeout=timeout, **kwargs)
+                    TRAFFIC.record('stash', method, endpoint, kwargs.get('params'), kwargs.get('json'),
+                                   response.status_code, response_body(response), time.monotonic() - started,
+                                   headers=recorded_headers(response.headers))
+                status = str(response.status_code)
+                return response
+            finally:
+                observe_stash_request(method, endpoint, started, status)
+        
         try:
-            response = self.session.request(method, url, **kwargs)
+            response = self.throttle.send(method, attempt, errors=(requests.exceptions.ConnectionError,
+                                                                   requests.exceptions.Timeout))
             response.raise_for_status()
             return response
         except requests.exceptions.RequestException as e:
             logger.error(f"Request failed: {e}")
             raise
     
+    @staticmethod
+    def _replayed_response(method: str, url: str, endpoint: str, params: Optional[Dict]) -> requests.Response:
+        """Answer a request from the traffic cassette, after its recorded latency"""
+        entry = TRAFFIC.lookup('stash', method, endpoint, params)
+        time.sleep(TRAFFIC.replay_delay(entry))
+        return replayed_response(entry, method, url)
+    
     def get_assigned_pull_requests(self) -> List[Dict]:
         """
         Get pull requests assigned to the current user as reviewer
@@ -183,6 +269,7 @@ class StashClient:
             logger.error(f"Failed to fetch pull requests: {e}")
             return []
     
+    @traced('stash.get_pull_request_details')
     def get_pull_request_details(self, project_key: str, repo_slug: str, pr_id: int) -> Optional[Dict]:
         """
         Get detailed information about a pull request
@@ -203,6 +290,7 @@ class StashClient:
             logger.error(f"Failed to fetch PR details: {e}")
             return None
     
+    @traced('stash.get_pull_request_changes')
     def get_pull_request_changes(self, project_key: str, repo_slug: str, pr_id: int) -> List[Dict]:
         """
         Get file changes in a pull request
@@ -225,6 +313,7 @@ class StashClient:
             logger.error(f"Failed to fetch PR changes: {e}")
             return []
     
+    @traced('stash.get_pull_request_diff')
     def get_pull_request_diff(self, project_key: str, repo_slug: str, pr_id: int) -> str:
         """
         Get diff of a pull request
@@ -242,40 +331,52 @@ class StashClient:
             params = {'contextLines': 3}
             response = self._make_request('GET', endpoint, params=params)
             
-            # Parse diff response
-            data = response.json()
-            diffs = data.get('diffs', [])
-            
-            diff_text = ""
-            for diff in diffs:
-                # Handle None values for source/destination
-                source_obj = diff.get('source')
-                destination_obj = diff.get('destination')
-                
-                if source_obj and isinstance(source_obj, dict):
-                    source = source_obj.get('toString', 'unknown')
-                else:
-                    source = 'unknown'
-                
-                if destination_obj and isinstance(destination_obj, dict):
-                    destination = destination_obj.get('toString', 'unknown')
-                else:
-                    destination = 'unknown'
-                
-                diff_text += f"\n--- {source}\n+++ {destination}\n"
-                
-                for hunk in diff.get('hunks', []):
-                    for segment in hunk.get('segments', []):
-                        lines = segment.get('lines', [])
-                        for line in lines:
-                            line_content = line.get('line', '') if isinstance(line, dict) else str(line)
-                            diff_text += line_content + '\n'
-            
-            return diff_text
+            return self._parse_diff(response.json())
         except Exception as e:
             logger.error(f"Failed to fetch PR diff: {e}")
             return ""
     
+    @staticmethod
+    def _parse_diff(data: Dict) -> str:
+        """
+        Build unified diff text from a diff API response
+        
+        Args:
+            data: Parsed JSON of the /diff endpoint
+            
+        Returns:
+            Diff as string
+        """
+        diffs = data.get('diffs', [])
+        
+        diff_text = ""
+        for diff in diffs:
+            # Handle None values for source/destination
+            source_obj = diff.get('source')
+            destination_obj = diff.get('destination')
+            
+            if source_obj and isinstance(source_obj, dict):
+                source = source_obj.get('toString', 'unknown')
+            else:
+                source = 'unknown'
+            
+            if destination_obj and isinstance(destination_obj, dict):
+                destination = destination_obj.get('toString', 'unknown')
+            else:
+                destination = 'unknown'
+            
+            diff_text += f"\n--- {source}\n+++ {destination}\n"
+            
+            for hunk in diff.get('hunks', []):
+                for segment in hunk.get('segments', []):
+                    lines = segment.get('lines', [])
+                    for line in lines:
+                        line_content = line.get('line', '') if isinstance(line, dict) else str(line)
+                        diff_text += line_content + '\n'
+        
+        return diff_text
+    
+    @traced('stash.get_pull_request_activities')
     def get_pull_request_activities(self, project_key: str, repo_slug: str, pr_id: int) -> List[Dict]:
         """
         Get activities (comments, approvals, etc.) for a pull request
@@ -298,6 +399,7 @@ class StashClient:
             logger.error(f"Failed to fetch PR activities: {e}")
             return []
     
+    @traced('stash.approve_pull_request')
     def approve_pull_request(self, project_key: str, repo_slug: str, pr_id: int) -> bool:
         """
         Approve a pull request
@@ -319,6 +421,7 @@ class StashClient:
             logger.error(f"Failed to approve PR: {e}")
             return False
     
+    @traced('stash.add_comment_to_pull_request')
     def add_comment_to_pull_request(self, project_key: str, repo_slug: str, 
                                    pr_id: int, comment_text: str) -> bool:
         """
@@ -343,6 +446,7 @@ class StashClient:
             logger.error(f"Failed to add comment: {e}")
             return False
     
+    @traced('stash.add_inline_comment')
     def add_inline_comment(self, project_key: str, repo_slug: str, pr_id: int,
                           file_path: str, line_number: int, comment_text: str,
                           line_type: str = "ADDED") -> bool:
@@ -382,6 +486,7 @@ class StashClient:
             logger.error(f"Failed to add inline comment: {e}")
             return False
     
+    @traced('stash.get_pull_request_changes')
     def get_pull_request_changes(self, project_key: str, repo_slug: str, pr_id: int) -> List[Dict]:
         """
         Get detailed file changes for a pull request
@@ -399,57 +504,72 @@ class StashClient:
             params = {'limit': 1000}  # Get all changes
             response = self._make_request('GET', endpoint, params=params)
             
-            data = response.json()
-            changes = data.get('values', [])
-            
-            # Process changes to make them easier to work with
-            processed_changes = []
-            for change in changes:
-                file_info = {
-                    'path': change.get('path', {}).get('toString', 'unknown'),
-                    'type': change.get('type', 'MODIFY'),  # MODIFY, ADD, DELETE, etc.
-                    'hunks': []
+            processed_changes = self._parse_changes(response.json())
+            
+            logger.info(f"Retrieved {len(processed_changes)} file changes for PR #{pr_id}")
+            return processed_changes
+            
+        except Exception as e:
+            logger.error(f"Failed to get PR changes: {e}")
+            return []
+    
+    @staticmethod
+    def _parse_changes(data: Dict) -> List[Dict]:
+        """
+        Convert a changes API response into file changes with hunks
+        
+        Args:
+            data: Parsed JSON of the /changes endpoint
+            
+        Returns:
+            List of file changes with hunks and line information
+        """
+        changes = data.get('values', [])
+        
+        # Process changes to make them easier to work with
+        processed_changes = []
+        for change in changes:
+            file_info = {
+                'path': change.get('path', {}).get('toString', 'unknown'),
+                'type': change.get('type', 'MODIFY'),  # MODIFY, ADD, DELETE, etc.
+                'hunks': []
+            }
+            
+            # Extract hunks (changed sections)
+            for hunk in change.get('hunks', []):
+                hunk_info = {
+                    'source_line': hunk.get('sourceLine', 0),
+                    'source_span': hunk.get('sourceSpan', 0),
+                    'dest_line': hunk.get('destinationLine', 0),
+                    'dest_span': hunk.get('destinationSpan', 0),
+                    'segments': []
                 }
                 
-                # Extract hunks (changed sections)
-                for hunk in change.get('hunks', []):
-                    hunk_info = {
-                        'source_line': hunk.get('sourceLine', 0),
-                        'source_span': hunk.get('sourceSpan', 0),
-                        'dest_line': hunk.get('destinationLine', 0),
-                        'dest_span': hunk.get('destinationSpan', 0),
-                        'segments': []
+                # Extract segments (individual line changes)
+                for segment in hunk.get('segments', []):
+                    segment_info = {
+                        'type': segment.get('type', 'CONTEXT'),  # ADDED, REMOVED, CONTEXT
+                        'lines': []
                     }
                     
-                    # Extract segments (individual line changes)
-                    for segment in hunk.get('segments', []):
-                        segment_info = {
-                            'type': segment.get('type', 'CONTEXT'),  # ADDED, REMOVED, CONTEXT
-                            'lines': []
+                    for line in segment.get('lines', []):
+                        line_info = {
+                            'source': line.get('source', 0),
+                            'destination': line.get('destination', 0),
+                            'line': line.get('line', ''),
+                            'truncated': line.get('truncated', False)
                         }
-                        
-                        for line in segment.get('lines', []):
-                            line_info = {
-                                'source': line.get('source', 0),
-                                'destination': line.get('destination', 0),
-                                'line': line.get('line', ''),
-                                'truncated': line.get('truncated', False)
-                            }
-                            segment_info['lines'].append(line_info)
-                        
-                        hunk_info['segments'].append(segment_info)
+                        segment_info['lines'].append(line_info)
                     
-                    file_info['hunks'].append(hunk_info)
+                    hunk_info['segments'].append(segment_info)
                 
-                processed_changes.append(file_info)
-            
-            logger.info(f"Retrieved {len(processed_changes)} file changes for PR #{pr_id}")
-            return processed_changes
+                file_info['hunks'].append(hunk_info)
             
-        except Exception as e:
-            logger.error(f"Failed to get PR changes: {e}")
-            return []
+            processed_changes.append(file_info)
+        
+        return processed_changes
     
+    @traced('stash.decline_pull_request')
     def decline_pull_request(self, project_key: str, repo_slug: str, 
                             pr_id: int, version: int) -> bool:
         """
@@ -474,6 +594,7 @@ class StashClient:
             logger.error(f"Failed to decline PR: {e}")
             return False
     
+    @traced('stash.mark_needs_work')
     def mark_needs_work(self, project_key: str, repo_slug: str, pr_id: int) -> bool:
         """
         Mark pull request as "Needs Work"
@@ -499,6 +620,7 @@ class StashClient:
             logger.error(f"Failed to mark PR as needs work: {e}")
             return False
     
+    @traced('stash.check_my_approval_status')
     def check_my_approval_status(self, project_key: str, repo_slug: str, pr_id: int) -> Optional[str]:
         """
         Check if current user has already approved the PR (current status, not history)
@@ -517,27 +639,7 @@ class StashClient:
             response = self._make_request('GET', endpoint)
             pr_data = response.json()
             
-            # Check reviewers/participants
-            reviewers = pr_data.get('reviewers', [])
-            for reviewer in reviewers:
-                user = reviewer.get('user', {})
-                if user.get('name') == self.username:
-                    status = reviewer.get('status', 'UNAPPROVED')
-                    logger.debug(f"Current approval status for {self.username}: {status}")
-                    return status
-            
-            # If not in reviewers list, check if in participants
-            participants = pr_data.get('participants', [])
-            for participant in participants:
-                user = participant.get('user', {})
-                if user.get('name') == self.username:
-                    status = participant.get('status', 'UNAPPROVED')
-                    logger.debug(f"Current participant status for {self.username}: {status}")
-                    return status
-            
-            # User not found in reviewers or participants - not approved
-            logger.debug(f"User {self.username} not found in reviewers/participants - UNAPPROVED")
-            return 'UNAPPROVED'
+            return self._find_my_status(pr_data)
             
         except Exception as e:
             logger.error(f"Failed to check approval status: {e}")
@@ -564,3 +666,35 @@ class StashClient:
             except Exception as fallback_error:
                 logger.error(f"Fallback approval check also failed: {fallback_error}")
                 return None
+    
+    def _find_my_status(self, pr_data: Dict) -> str:
+        """
+        Find current user's reviewer/participant status in PR data
+        
+        Args:
+            pr_data: Pull request dictionary
+            
+        Returns:
+            Reviewer status ('APPROVED', 'NEEDS_WORK', 'UNAPPROVED')
+        """
+        # Check reviewers/participants
+        reviewers = pr_data.get('reviewers', [])
+        for reviewer in reviewers:
+            user = reviewer.get('user', {})
+            if user.get('name') == self.username:
+                status = reviewer.get('status', 'UNAPPROVED')
+                logger.debug(f"Current approval status for {self.username}: {status}")
+                return status
+        
+        # If not in reviewers list, check if in participants
+        participants = pr_data.get('participants', [])
+        for participant in participants:
+            user = participant.get('user', {})
+            if user.get('name') == self.username:
+                status = participant.get('status', 'UNAPPROVED')
+                logger.debug(f"Current participant status for {self.username}: {status}")
+                return status
+        
+        # User not found in reviewers or participants - not approved
+        logger.debug(f"User {self.username} not found in reviewers/participants - UNAPPROVED")
+        return 'UNAPPROVED'
@@ -0,0 +1,425 @@
+"""
+Tracing - Lightweight spans per PR review with JSONL, OTLP and database export
+"""
+
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('gordion_span', default=None)
+
+
+class Span:
+    """One timed operation inside a trace"""
+
+    def __init__(self, trace: 'Trace', name: str, parent_id: Optional[str] = None,
+                 start: Optional[float] = None, attributes: Optional[Dict] = None):
+        """
+        Initialize span
+
+        Args:
+            trace: Trace the span belongs to
+            name: Operation name
+            parent_id: Parent span id (None for the root span)
+            start: Epoch start time (default now)
+            attributes: Span attributes
+        """
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start = time.time() if start is None else start
+        self.end: Optional[float] = None
+        self.attributes = dict(attributes or {})
+        self.status = 'ok'
+
+    def set(self, **attributes) -> None:
+        """Add attributes"""
+        self.attributes.update(attributes)
+
+    def finish(self, end: Optional[float] = None) -> None:
+        """End the span (default now)"""
+        self.end = time.time() if end is None else end
+
+    @property
+    def duration(self) -> float:
+        """Seconds between start and end (or now, while open)"""
+        return (self.end or time.time()) - self.start
+
+    def to_dict(self) -> Dict:
+        return {
+            'trace_id': self.trace.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'end': self.end,
+            'duration': round(self.duration, 6),
+            'status': self.status,
+            'attributes': self.attributes,
+        }
+
+
+class Trace:
+    """Spans of one PR review, exported when the root span ends"""
+
+    def __init__(self):
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    @property
+    def root(self) -> Span:
+        return self.spans[0]
+
+    def waterfall(self) -> Dict:
+        """
+        Summarize the trace for storage and display
+
+        Returns:
+            Dictionary with the root span's fields and all spans as offsets
+            (seconds from the trace start), root first, then in start order
+        """
+        root = self.root
+        with self._lock:
+            spans = [root] + sorted(self.spans[1:], key=lambda s: s.start)
+        return {
+            'trace_id': self.trace_id,
+            'name': root.name,
+            'start': root.start,
+            'duration': round(root.duration, 6),
+            'status': root.status,
+            'attributes': root.attributes,
+            'spans': [
+                {
+                    'span_id': span.span_id,
+                    'parent_id': span.parent_id,
+                    'name': span.name,
+                    'offset': round(span.start - root.start, 6),
+                    'duration': round(span.duration, 6),
+                    'status': span.status,
+                    'attributes': span.attributes,
+                }
+                for span in spans
+            ],
+        }
+
+
+class JsonlExporter:
+    """Appends one JSON line per span to a file"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def export(self, trace: Trace) -> None:
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for span in trace.spans:
+                f.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + '\n')
+
+
+class OtlpExporter:
+    """Posts traces to an OpenTelemetry collector (OTLP/HTTP JSON, no SDK needed)"""
+
+    def __init__(self, endpoint: str, service_name: str = 'gordion', timeout: float = 5.0):
+        """
+        Initialize OTLP exporter
+
+        Args:
+            endpoint: Collector traces URL, e.g. http://localhost:4318/v1/traces
+            service_name: service.name resource attribute
+            timeout: HTTP timeout in seconds
+        """
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    @staticmethod
+    def _attribute(key: str, value) -> Dict:
+        if isinstance(value, bool):
+            return {'key': key, 'value': {'boolValue': value}}
+        if isinstance(value, int):
+            return {'key': key, 'value': {'intValue': str(value)}}
+        if isinstance(value, float):
+            return {'key': key, 'value': {'doubleValue': value}}
+        return {'key': key, 'value': {'stringValue': str(value)}}
+
+    def _span(self, span: Span) -> Dict:
+        otlp = {
+            'traceId': span.trace.trace_id,
+            'spanId': span.span_id,
+            'name': span.name,
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(int(span.start * 1e9)),
+            'endTimeUnixNano': str(int((span.end or span.start) * 1e9)),
+            'attributes': [self._attribute(k, v) for k, v in span.attributes.items()],
+            'status': {'code': 2 if span.status == 'error' else 1},
+        }
+        if span.parent_id:
+            otlp['parentSpanId'] = span.parent_id
+        return otlp
+
+    def export(self, trace: Trace) -> None:
+        body = {
+            'resourceSpans': [{
+                'resource': {'attributes': [self._attribute('service.name', self.service_name)]},
+                'scopeSpans': [{
+                    'scope': {'name': 'gordion'},
+                    'spans': [self._span(span) for span in trace.spans],
+                }],
+            }]
+        }
+        request = urllib.request.Request(
+            self.endpoint, data=json.dumps(body, default=str).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}, method='POST'
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class DatabaseExporter:
+    """Stores per-PR waterfalls in the pr_traces table for the dashboard"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def export(self, trace: Trace) -> None:
+        if 'pr_id' in trace.root.attributes:
+            self.db.add_pr_trace(trace.waterfall())
+
+
+class Tracer:
+    """
+    Creates spans and hands finished traces to exporters
+
+    trace() starts a new trace (one per PR review); span() and add_span()
+    attach to the current trace through a context variable, which follows
+    asyncio tasks and asyncio.to_thread, and are no-ops outside a trace so
+    polling calls are not traced. Exports run on a background thread.
+    """
+
+    def __init__(self, exporters: Optional[List] = None, queue_size: int = 1000):
+        """
+        Initialize tracer
+
+        Args:
+            exporters: Objects with export(trace)
+            queue_size: Finished traces buffered for export (more are dropped)
+        """
+        self.exporters = list(exporters or [])
+        self.hooks: List = []  # callables(event, span) for 'start'/'end' of span() blocks
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def configure(self, config: Dict, db=None) -> None:
+        """
+        Set exporters from the 'tracing' config section
+
+        Args:
+            config: Configuration dictionary
+            db: Database instance for store_in_db
+        """
+        tracing = config.get('tracing', {})
+        exporters = []
+        if tracing.get('enabled', True):
+            if tracing.get('store_in_db', True) and db is not None:
+                exporters.append(DatabaseExporter(db))
+            if tracing.get('jsonl'):
+                exporters.append(JsonlExporter(tracing['jsonl']))
+
+            endpoint = tracing.get('otlp_endpoint')
+            if not endpoint and os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT'):
+                endpoint = os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT').rstrip('/') + '/v1/traces'
+            if endpoint:
+                exporters.append(OtlpExporter(endpoint, tracing.get('service_name', 'gordion')))
+        self.exporters = exporters
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.exporters)
+
+    @staticmethod
+    def current() -> Optional[Span]:
+        """Span currently open in this context"""
+        return _current_span.get()
+
+    @contextmanager
+    def trace(self, name: str, **attributes) -> Iterator[Optional[Span]]:
+        """
+        Start a new trace with a root span
+
+        Args:
+            name: Root span name
+            **attributes: Root span attributes (pr_id, project_key, ...)
+
+        Yields:
+            Root span, or None if tracing is disabled
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        trace = Trace()
+        root = Span(trace, name, attributes=attributes)
+        trace.add(root)
+        token = _current_span.set(root)
+        try:
+            yield root
+        except BaseException as e:
+            root.status = 'error'
+            root.set(error=str(e)[:200])
+            raise
+        finally:
+            _current_span.reset(token)
+            root.finish()
+            self._submit(trace)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Optional[Span]]:
+        """
+        Time a block as a child of the current span
+
+        Args:
+            name: Operation name
+            **attributes: Span attributes
+
+        Yields:
+            Span, or None outside a trace
+        """
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+
+        span = Span(parent.trace, name, parent_id=parent.span_id, attributes=attributes)
+        parent.trace.add(span)
+        token = _current_span.set(span)
+        self._notify('start', span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = 'error'
+            span.set(error=str(e)[:200])
+            raise
+        finally:
+            _current_span.reset(token)
+            span.finish()
+            self._notify('end', span)
+
+    def _notify(self, event: str, span: Span) -> None:
+        for hook in list(self.hooks):
+            try:
+                hook(event, span)
+            except Exception as e:
+                logger.debug(f"Span hook failed: {e}")
+
+    def add_span(self, name: str, duration: float, end: Optional[float] = None,
+                 parent: Optional[Span] = None, status: str = 'ok', **attributes) -> Optional[Span]:
+        """
+        Record an already finished operation (e.g. from measured timings)
+
+        Args:
+            name: Operation name
+            duration: Seconds the operation took
+            end: Epoch end time (default now)
+            parent: Parent span (default the current span)
+            status: 'ok' or 'error'
+            **attributes: Span attributes
+
+        Returns:
+            The span, or None outside a trace
+        """
+        parent = parent or _current_span.get()
+        if parent is None:
+            return None
+
+        end = time.time() if end is None else end
+        span = Span(parent.trace, name, parent_id=parent.span_id, start=end - duration,
+                    attributes=attributes)
+        span.status = status
+        span.finish(end)
+        parent.trace.add(span)
+        return span
+
+    def _submit(self, trace: Trace) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            trace = self._queue.get()
+            try:
+                for exporter in self.exporters:
+                    try:
+                        exporter.export(trace)
+                    except Exception as e:
+                        logger.debug(f"Trace export via {type(exporter).__name__} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """
+        Wait until all finished traces are exported
+
+        Args:
+            timeout: Maximum seconds to wait
+
+        Returns:
+            True if nothing is left to export
+        """
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return not self._queue.unfinished_tasks
+
+
+# Process-wide tracer, configured by StashAgentApp
+TRACER = Tracer()
+
+
+def traced(name: str):
+    """
+    Decorator running a function (sync or async) inside a TRACER span
+
+    Args:
+        name: Span name
+    """
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with TRACER.span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with TRACER.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,363 @@
+"""
+Traffic recorder - Record Stash/LLM request/response pairs and replay them offline
+"""
+
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from pr_scheduler import pr_key
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_VERSION = 1
+
+# Answer for requests the cassette has no recording of
+MISSING = {'status': 404, 'headers': {}, 'body': {'errors': [{'message': 'Not recorded in cassette'}]}}
+
+# PR under review in the current context ('PROJECT/repo#id'), set through TrafficRecorder.pr_scope
+_PR_SCOPE: ContextVar[str] = ContextVar('traffic_pr_scope', default='')
+
+DEFAULT_REDACT_PATTERNS = [
+    r'(?i)(token|password|passwd|secret|api[_-]?key)(["\']?\s*[:=]\s*["\']?)[^\s"\',]+',
+    r'(?i)bearer\s+[a-z0-9._\-]+',
+]
+
+
+def mask(text: str) -> str:
+    """Hide letters and digits but keep length, whitespace and punctuation"""
+    return re.sub(r'[^\W_]', 'x', text)
+
+
+def response_body(response):
+    """Parsed JSON of a requests/httpx response, or its text"""
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+
+def recorded_headers(headers) -> Dict:
+    """Response headers kept in recordings"""
+    return {name: headers[name] for name in ('Retry-After', 'Content-Type') if name in headers}
+
+
+def _content(entry: Dict) -> bytes:
+    body = entry.get('body')
+    return (body if isinstance(body, str) else json.dumps(body, ensure_ascii=False)).encode('utf-8')
+
+
+def replayed_response(entry: Dict, method: str, url: str):
+    """
+    Build a requests.Response from a recording
+
+    Args:
+        entry: Recording from TRAFFIC.lookup()
+        method: HTTP method of the request
+        url: Request URL
+
+    Returns:
+        Response with the recorded status, headers and body
+    """
+    import requests
+
+    response = requests.Response()
+    response.status_code = entry.get('status', 200)
+    response.headers.update(entry.get('headers', {}))
+    response._content = _content(entry)
+    response.encoding = 'utf-8'
+    response.url = url
+    response.request = requests.Request(method, url).prepare()
+    return response
+
+
+def replayed_httpx_response(entry: Dict, method: str, url: str):
+    """Same as replayed_response, for httpx clients"""
+    import httpx
+
+    return httpx.Response(entry.get('status', 200), headers=entry.get('headers', {}),
+                          content=_content(entry), request=httpx.Request(method, url))
+
+
+class Redactor:
+    """Removes secrets and (optionally) source code from recorded payloads"""
+
+    def __init__(self, redact_code: bool = True, keys: Optional[List[str]] = None,
+                 patterns: Optional[List[str]] = None):
+        """
+        Initialize redactor
+
+        Args:
+            redact_code: Mask diff lines and LLM prompt content
+            keys: Additional JSON keys whose string values are masked anywhere
+            patterns: Regexes replaced by [REDACTED] in every string
+        """
+        self.redact_code = redact_code
+        self.keys = set(keys or [])
+        if redact_code:
+            self.keys.add('line')
+        self.patterns = [re.compile(p) for p in (DEFAULT_REDACT_PATTERNS if patterns is None else patterns)]
+
+    def _scrub(self, text: str) -> str:
+        for pattern in self.patterns:
+            text = pattern.sub('[REDACTED]', text)
+        return text
+
+    def apply(self, value, key: str = ''):
+        """Redacted copy of a JSON value"""
+        if isinstance(value, dict):
+            if self.redact_code and value.get('role') in ('system', 'user') and 'content' in value:
+                return {k: (mask(v) if k == 'content' and isinstance(v, str) else self.apply(v, k))
+                        for k, v in value.items()}
+            return {k: self.apply(v, k) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.apply(v, key) for v in value]
+        if isinstance(value, str):
+            return mask(value) if key in self.keys else self._scrub(value)
+        return value
+
+
+class TrafficRecorder:
+    """
+    Records or replays the agent's HTTP traffic to Stash and Ollama
+
+    In 'record' mode every response is appended to a gzip-compressed JSONL
+    cassette (redacted, without auth headers). In 'replay' mode requests
+    are answered from the cassette instead of the network: recordings are
+    matched by service, method, endpoint, query parameters and the PR being
+    reviewed (see pr_scope), served in recorded order, and the
+    last one is repeated when they run out. Clients sleep replay_delay()
+    to reproduce the original timings, scaled by replay_speed.
+    """
+
+    def __init__(self):
+        self.mode = 'none'
+        self.path: Optional[Path] = None
+        self.replay_speed = 1.0
+        self.redactor = Redactor()
+        self.recorded = 0
+        self.replayed = 0
+        self.misses: Counter = Counter()
+        self._file = None
+        self._started = time.monotonic()
+        self._recordings: Dict[Tuple, deque] = defaultdict(deque)
+        self._last: Dict[Tuple, Dict] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, config: Dict) -> None:
+        """
+        Set the mode from the 'traffic' config section (env TRAFFIC_MODE, TRAFFIC_CASSETTE)
+
+        Args:
+            config: Configuration dictionary
+        """
+        traffic = config.get('traffic', {})
+        mode = str(os.getenv('TRAFFIC_MODE', traffic.get('mode') or 'none')).lower()
+        path = os.getenv('TRAFFIC_CASSETTE', traffic.get('cassette', 'data/traffic.jsonl.gz'))
+        self.replay_speed = float(os.getenv('TRAFFIC_REPLAY_SPEED', traffic.get('replay_speed', 1.0)))
+        self.redactor = Redactor(
+            redact_code=traffic.get('redact_code', True),
+            keys=traffic.get('redact_keys', []),
+            patterns=traffic.get('redact_patterns'),
+        )
+        if mode == 'record':
+            self.start_recording(path)
+        elif mode == 'replay':
+            self.load(path)
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == 'record'
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == 'replay'
+
+    @staticmethod
+    @contextmanager
+    def pr_scope(pr: Dict):
+        """
+        Key the traffic of the enclosed block by a PR
+
+        A context variable, so it works with tracing off and follows the
+        review into tasks and worker threads.
+
+        Args:
+            pr: Pull request dictionary
+        """
+        key = pr_key(pr)
+        token = _PR_SCOPE.set(f"{key[0]}/{key[1]}#{key[2]}" if key else '')
+        try:
+            yield
+        finally:
+            _PR_SCOPE.reset(token)
+
+    @staticmethod
+    def _context() -> str:
+        """PR under review in the current context ('' outside one)"""
+        return _PR_SCOPE.get()
+
+    @staticmethod
+    def _key(service: str, method: str, endpoint: str, params: Optional[Dict], context: str) -> Tuple:
+        query = json.dumps(params or {}, sort_keys=True, default=str)
+        return service, method.upper(), endpoint, query, context
+
+    # -- recording --------------------------------------------------------
+
+    def start_recording(self, path: str) -> None:
+        """
+        Open a new cassette for writing (an existing file is replaced)
+
+        Args:
+            path: Cassette path (.jsonl.gz)
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = gzip.open(self.path, 'wt', encoding='utf-8')
+        self._file.write(json.dumps({
+            'cassette': CASSETTE_VERSION,
+            'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'redact_code': self.redactor.redact_code,
+        }) + '\n')
+        self._started = time.monotonic()
+        self.mode = 'record'
+        logger.info(f"📼 Recording Stash/LLM traffic to {self.path}")
+
+    def record(self, service: str, method: str, endpoint: str, params: Optional[Dict],
+               body: Optional[Dict], status: int, response_body, duration: float,
+               headers: Optional[Dict] = None, context: str = '') -> None:
+        """
+        Append one request/response pair to the cassette
+
+        Args:
+            service: 'stash' or 'ollama'
+            method: HTTP method
+            endpoint: Path relative to the service's API root
+            params: Query parameters
+            body: JSON request body
+            status: HTTP status code
+            response_body: Parsed JSON (or text) response
+            duration: Seconds the request took
+            headers: Response headers worth keeping (e.g. Retry-After)
+            context: Extra discriminator for requests with identical URLs (e.g. file path)
+        """
+        if not self.recording:
+            return
+        redact = self.redactor.apply
+        entry = {
+            'service': service,
+            'method': method.upper(),
+            'endpoint': endpoint,
+            'params': params or {},
+            'context': self._context() + context,
+            'offset': round(time.monotonic() - self._started - duration, 4),
+            'duration': round(duration, 4),
+            'request': redact(body) if body is not None else None,
+            'status': status,
+            'headers': headers or {},
+            'body': redact(response_body),
+        }
+        line = json.dumps(entry, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self.recorded += 1
+            if self.recorded % 50 == 0:
+                self._file.flush()
+
+    # -- replay -----------------------------------------------------------
+
+    def load(self, path: str) -> int:
+        """
+        Load a cassette for replay
+
+        Args:
+            path: Cassette path
+
+        Returns:
+            Number of recordings loaded
+        """
+        self.path = Path(path)
+        recordings = defaultdict(deque)
+        count = 0
+        try:
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if 'cassette' in entry:
+                        continue
+                    key = self._key(entry['service'], entry['method'], entry['endpoint'],
+                                    entry.get('params'), entry.get('context', ''))
+                    recordings[key].append(entry)
+                    count += 1
+        except EOFError:
+            # Recording was interrupted; keep what was flushed
+            logger.warning(f"⚠️  Cassette {self.path} is truncated, replaying {count} recording(s)")
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load cassette {self.path}: {e}")
+        with self._lock:
+            self._recordings = recordings
+            self._last = {}
+        self.mode = 'replay'
+        logger.info(f"📼 Replaying {count} recorded request(s) from {self.path} (speed {self.replay_speed}x)")
+        return count
+
+    def lookup(self, service: str, method: str, endpoint: str, params: Optional[Dict] = None,
+               context: str = '') -> Dict:
+        """
+        Next recorded response for a request
+
+        Args:
+            service: 'stash' or 'ollama'
+            method: HTTP method
+            endpoint: Path relative to the service's API root
+            params: Query parameters
+            context: Same discriminator that was passed to record()
+
+        Returns:
+            Recording with status, headers, body and duration (MISSING if none)
+        """
+        key = self._key(service, method, endpoint, params, self._context() + context)
+        with self._lock:
+            queue = self._recordings.get(key)
+            if queue:
+                entry = queue.popleft()
+                self._last[key] = entry
+            else:
+                entry = self._last.get(key)
+            if entry is None:
+                self.misses[f"{service} {method.upper()} {endpoint}"] += 1
+                return dict(MISSING, duration=0.0)
+            self.replayed += 1
+            return entry
+
+    def replay_delay(self, entry: Dict) -> float:
+        """Seconds to wait before answering with a recording"""
+        if self.replay_speed <= 0:
+            return 0.0
+        return entry.get('duration', 0.0) / self.replay_speed
+
+    def close(self) -> None:
+        """Finish the cassette (recording) and log replay misses"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                logger.info(f"📼 Recorded {self.recorded} request(s) to {self.path}")
+        if self.misses:
+            logger.warning(f"⚠️  {sum(self.misses.values())} request(s) not in cassette: "
+                           f"{dict(self.misses.most_common(5))}")
+
+
+# Process-wide recorder, configured by StashAgentApp
+TRAFFIC = TrafficRecorder()
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Mock Ollama server with a deterministic latency model
+
+Stands in for the /api/chat and /api/tags endpoints OllamaAgent uses, so
+the review pipeline can be benchmarked without a GPU. Each chat request
+costs (scaled by time_scale):
+
+    model load        load_seconds, when the model is not loaded (keep_alive)
+    prompt eval       uncached prompt tokens / prompt_tokens_per_second
+    generation        output tokens / generation_tokens_per_second
+
+Tokens are estimated as 4 characters each. Like llama.cpp, a slot reuses
+the KV cache of the longest common prefix with its previous prompt, so
+only the new suffix is evaluated. At most num_parallel requests run at
+once (OLLAMA_NUM_PARALLEL); others queue, and beyond max_queue the server
+answers 503. Responses carry Ollama's timing fields, can be streamed, and
+can be made malformed on purpose.
+
+Usage:
+    python tests/mock_ollama_server.py --port 11434 --parallel 2 --time-scale 0.1
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class OllamaModel:
+    """Latency and behaviour model of the mock"""
+    models: List[str] = field(default_factory=lambda: ['llama3.1:8b'])
+    load_seconds: float = 3.0
+    prompt_tokens_per_second: float = 1000.0
+    generation_tokens_per_second: float = 40.0
+    response_tokens: int = 150          # typical answer length (capped by num_predict)
+    num_parallel: int = 1               # OLLAMA_NUM_PARALLEL
+    max_queue: int = 512                # OLLAMA_MAX_QUEUE, 503 above
+    keep_alive: float = 300.0           # seconds a model stays loaded after use
+    prefix_cache: bool = True
+    time_scale: float = 1.0             # multiply all sleeps and reported durations
+    approve_rate: float = 0.7
+    malformed_rate: float = 0.0         # fraction of answers that are not valid review JSON
+    error_rate: float = 0.0             # fraction of 500 responses
+    seed: int = 42
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a text"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def parse_keep_alive(value, default: float) -> float:
+    """Seconds from an Ollama keep_alive value ("5m", "1h", 300, 0, -1)"""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return float('inf') if value < 0 else float(value)
+    match = re.fullmatch(r'(-?\d+(?:\.\d+)?)\s*([smh]?)', str(value).strip())
+    if not match:
+        return default
+    seconds = float(match.group(1)) * {'': 1, 's': 1, 'm': 60, 'h': 3600}[match.group(2)]
+    return float('inf') if seconds < 0 else seconds
+
+
+class MockOllama:
+    """Simulated Ollama runner: slots, KV prefix cache, model residency and stats"""
+
+    def __init__(self, model: Optional[OllamaModel] = None):
+        self.model = model or OllamaModel()
+        self.requests = 0
+        self.rejected = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.generated_tokens = 0
+        self.loads = 0
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._slots = threading.Semaphore(max(1, self.model.num_parallel))
+        self._slot_prompts: List[Optional[str]] = [None] * max(1, self.model.num_parallel)
+        self._free_slots = list(range(max(1, self.model.num_parallel)))
+        self._waiting = 0
+        self._loaded_until: Dict[str, float] = {}
+
+    # -- simulation -------------------------------------------------------
+
+    def _sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds * self.model.time_scale)
+
+    def _ensure_loaded(self, name: str, keep_alive: float) -> float:
+        """Load the model if needed; returns the load time in model seconds"""
+        with self._load_lock:
+            now = time.monotonic()
+            load = 0.0
+            if self._loaded_until.get(name, 0) < now:
+                load = self.model.load_seconds
+                self._sleep(load)
+                with self._lock:
+                    self.loads += 1
+            self._loaded_until[name] = time.monotonic() + keep_alive
+            return load
+
+    def _acquire_slot(self, prompt: str) -> Tuple[int, int]:
+        """Take the free slot sharing the longest prefix with prompt -> (slot, cached chars)"""
+        self._slots.acquire()
+        with self._lock:
+            best, best_common = self._free_slots[0], 0
+            for slot in self._free_slots:
+                previous = self._slot_prompts[slot]
+                if not previous or not self.model.prefix_cache:
+                    continue
+                common = 0
+                for a, b in zip(previous, prompt):
+                    if a != b:
+                        break
+                    common += 1
+                if common > best_common:
+                    best, best_common = slot, common
+            self._free_slots.remove(best)
+            return best, best_common
+
+    def _release_slot(self, slot: int, prompt: str) -> None:
+        with self._lock:
+            self._slot_prompts[slot] = prompt
+            self._free_slots.append(slot)
+        self._slots.release()
+
+    def _answer(self, rng: random.Random, system: str, user: str) -> str:
+        """Deterministic review (or inline comments) for a prompt"""
+        if rng.random() < self.model.malformed_rate:
+            return rng.choice([
+                "This pull request looks reasonable overall, nothing blocking.",
+                '{"approve": true, "confidence_score": 8',
+                '{"approve": true}',
+            ])
+
+        if '"comments"' in system and '"approve"' not in system:
+            lines = [int(n) for n in re.findall(r'\[\w+ (\d+)\]', user)]
+            picked = rng.sample(lines, min(len(lines), rng.choice([0, 0, 1, 2])))
+            return json.dumps({'comments': [
+                {'line': line, 'comment': f"Consider extracting line {line} into a helper.",
+                 'severity': rng.choice(['info', 'warning', 'critical'])}
+                for line in sorted(picked)
+            ]})
+
+        approve = rng.random() < self.model.approve_rate
+        return "Here is my review:\n" + json.dumps({
+            'approve': approve,
+            'confidence_score': rng.randrange(75, 99) if approve else rng.randrange(30, 70),
+            'reasoning': "Changes are small and consistent." if approve else "Logic changes lack tests.",
+            'concerns': [] if approve else ["Missing tests for the new branch"],
+        }, ensure_ascii=False)
+
+    def chat(self, body: Dict, emit=None) -> Tuple[int, Dict]:
+        """
+        Run one chat request, holding a slot until generation is done
+
+        Args:
+            body: /api/chat request body
+            emit: Called with each content piece while generating (streaming)
+
+        Returns:
+            (status code, final response dict)
+        """
+        name = body.get('model', '')
+        if name not in self.model.models:
+            return 404, {'error': f"model '{name}' not found, try pulling it first"}
+
+        messages = body.get('messages', [])
+        prompt = ''.join(f"<{m.get('role')}>{m.get('content', '')}" for m in messages)
+        system = next((m.get('content', '') for m in messages if m.get('role') == 'system'), '')
+        user = next((m.get('content', '') for m in reversed(messages) if m.get('role') == 'user'), '')
+        options = body.get('options', {})
+        rng = random.Random(zlib.crc32(f"{self.model.seed}:{prompt}".encode('utf-8')))
+
+        with self._lock:
+            self.requests += 1
+            if self._waiting >= self.model.max_queue:
+                self.rejected += 1
+                return 503, {'error': 'server busy, please try again. maximum pending requests exceeded'}
+            self._waiting += 1
+
+        started = time.monotonic()
+        slot, cached_chars = self._acquire_slot(prompt)
+        with self._lock:
+            self._waiting -= 1
+        try:
+            if rng.random() < self.model.error_rate:
+                return 500, {'error': 'llama runner process has terminated'}
+
+            keep_alive = parse_keep_alive(body.get('keep_alive'), self.model.keep_alive)
+            load = self._ensure_loaded(name, keep_alive)
+
+            prompt_tokens = estimate_tokens(prompt)
+            cached = min(prompt_tokens - 1, cached_chars // CHARS_PER_TOKEN) if cached_chars else 0
+            evaluated = max(1, prompt_tokens - cached)
+            prompt_seconds = evaluated / self.model.prompt_tokens_per_second
+            self._sleep(prompt_seconds)
+
+            content = self._answer(rng, system, user)
+            limit = int(options.get('num_predict', -1))
+            generated = max(estimate_tokens(content), round(rng.gauss(self.model.response_tokens,
+                                                                      self.model.response_tokens / 4)))
+            if limit > 0:
+                generated = min(generated, limit)
+            generation_seconds = generated / self.model.generation_tokens_per_second
+
+            pieces = [content[i:i + 16] for i in range(0, len(content), 16)] or ['']
+            for piece in pieces:
+                self._sleep(generation_seconds / len(pieces))
+                if emit:
+                    emit(piece)
+        finally:
+            self._release_slot(slot, prompt)
+
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached
+            self.generated_tokens += generated
+
+        scale = self.model.time_scale
+        final = {
+            'model': name,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'message': {'role': 'assistant', 'content': content},
+            'done_reason': 'length' if limit > 0 and generated >= limit else 'stop',
+            'done': True,
+            'load_duration': int(load * scale * 1e9),
+            'prompt_eval_count': evaluated,
+            'prompt_eval_duration': int(prompt_seconds * scale * 1e9),
+            'eval_count': generated,
+            'eval_duration': int(generation_seconds * scale * 1e9),
+        }
+        final['total_duration'] = int((time.monotonic() - started) * 1e9)
+        return 200, final
+
+    def tags(self) -> Dict:
+        return {'models': [
+            {'name': name, 'model': name, 'size': 4_920_000_000,
+             'details': {'format': 'gguf', 'parameter_size': '8B', 'quantization_level': 'Q4_K_M'}}
+            for name in self.model.models
+        ]}
+
+
+class MockOllamaServer:
+    """Runs a MockOllama on a local port in a daemon thread"""
+
+    def __init__(self, model: Optional[OllamaModel] = None, host: str = '127.0.0.1', port: int = 0):
+        """
+        Initialize mock server
+
+        Args:
+            model: Latency and behaviour model
+            host: Bind address
+            port: Port (0 picks a free one)
+        """
+        self.ollama = MockOllama(model)
+        self.host = host
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to pass as OLLAMA_BASE_URL"""
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> 'MockOllamaServer':
+        ollama = self.ollama
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _json(self, status: int, payload: Dict) -> None:
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _chunk(self, data: bytes) -> None:
+                self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path.split('?')[0] == '/api/tags':
+                    self._json(200, ollama.tags())
+                else:
+                    self._json(404, {'error': 'not found'})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    self._json(400, {'error': 'invalid JSON body'})
+                    return
+                if self.path.split('?')[0] != '/api/chat':
+                    self._json(404, {'error': 'not found'})
+                    return
+
+                if not body.get('stream', True):
+                    self._json(*ollama.chat(body))
+                    return
+
+                # NDJSON stream: one message piece per line, timings on the last line
+                started = []
+
+                def emit(piece: str) -> None:
+                    if not started:
+                        self.send_response(200)
+                        self.send_header('Content-Type', 'application/x-ndjson')
+                        self.send_header('Transfer-Encoding', 'chunked')
+                        self.end_headers()
+                        started.append(True)
+                    self._chunk(json.dumps({
+                        'model': body.get('model'),
+                        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                        'message': {'role': 'assistant', 'content': piece}, 'done': False,
+                    }).encode('utf-8') + b'\n')
+
+                status, final = ollama.chat(body, emit)
+                if not started:
+                    self._json(status, final)
+                    return
+                last = dict(final, message={'role': 'assistant', 'content': ''})
+                self._chunk(json.dumps(last).encode('utf-8') + b'\n')
+                self.wfile.write(b"0\r\n\r\n")
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name='mock-ollama', daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> 'MockOllamaServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Ollama server with a latency model")
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--model', action='append', help="Model name to serve (repeatable)")
+    parser.add_argument('--parallel', type=int, default=1, help="OLLAMA_NUM_PARALLEL")
+    parser.add_argument('--load-seconds', type=float, default=3.0)
+    parser.add_argument('--prompt-tps', type=float, default=1000.0, help="Prompt eval tokens/s")
+    parser.add_argument('--generation-tps', type=float, default=40.0, help="Generation tokens/s")
+    parser.add_argument('--time-scale', type=float, default=1.0, help="Speed up (<1) or slow down (>1)")
+    parser.add_argument('--malformed-rate', type=float, default=0.0)
+    parser.add_argument('--no-prefix-cache', action='store_true')
+    args = parser.parse_args()
+
+    model = OllamaModel(
+        models=args.model or ['llama3.1:8b'], num_parallel=args.parallel,
+        load_seconds=args.load_seconds, prompt_tokens_per_second=args.prompt_tps,
+        generation_tokens_per_second=args.generation_tps, time_scale=args.time_scale,
+        malformed_rate=args.malformed_rate, prefix_cache=not args.no_prefix_cache,
+    )
+    server = MockOllamaServer(model, host=args.host, port=args.port).start()
+    print(f"Mock Ollama serving {model.models} on {server.url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        o = server.ollama
+        print(f"Requests: {o.requests}, prompt tokens: {o.prompt_tokens} ({o.cached_tokens} cached), "
+              f"generated: {o.generated_tokens}, loads: {o.loads}")
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
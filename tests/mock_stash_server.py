@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""
+Mock Bitbucket Server (Stash) for offline tests and benchmarks
+
+Serves the REST endpoints StashClient and AsyncStashClient use, backed by
+a synthetic, seeded PR corpus. Latency, server errors and rate limiting
+can be injected to measure the agent's throughput and resilience without
+a real Stash.
+
+Usage:
+    python tests/mock_stash_server.py --prs 500 --port 7990 --latency 0.05
+    STASH_URL=http://localhost:7990 STASH_TOKEN=x STASH_USERNAME=gordion python src/main.py --once
+
+In code:
+    with MockStashServer(CorpusSpec(prs=100), StashFaults(latency=0.02)) as server:
+        client = StashClient(server.url, token='x', username='gordion')
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+API_PREFIX = '/rest/api/1.0'
+
+FILE_EXTENSIONS = ['.py', '.java', '.ts', '.go', '.sql', '.yaml', '.md']
+
+
+@dataclass
+class CorpusSpec:
+    """Shape of the synthetic PR corpus"""
+    prs: int = 100
+    projects: int = 3
+    repos_per_project: int = 4
+    files_median: float = 4         # files per PR (log-normal)
+    lines_median: float = 30        # changed lines per file (log-normal)
+    spread: float = 0.9             # log-normal sigma, larger = heavier tail
+    max_files: int = 200
+    context_lines: int = 3
+    username: str = 'gordion'
+    seed: int = 42
+
+
+@dataclass
+class StashFaults:
+    """Injected latency, errors and rate limits"""
+    latency: float = 0.0            # mean seconds added to every request
+    latency_jitter: float = 0.5     # +/- fraction of latency
+    endpoint_latency: Dict[str, float] = field(default_factory=dict)  # e.g. {'diff': 0.2}
+    error_rate: float = 0.0         # fraction of requests answered with 500
+    rate_limit: float = 0.0         # requests per second (0 = unlimited), 429 above
+    burst: int = 10                 # token bucket size for rate_limit
+
+
+class MockStash:
+    """In-memory Stash state: PRs, reviewer statuses, comments and request counts"""
+
+    def __init__(self, spec: Optional[CorpusSpec] = None, faults: Optional[StashFaults] = None):
+        """
+        Initialize mock state and generate the corpus
+
+        Args:
+            spec: Corpus shape
+            faults: Injected faults
+        """
+        self.spec = spec or CorpusSpec()
+        self.faults = faults or StashFaults()
+        self.prs: Dict[Tuple[str, str, int], Dict] = {}
+        self.comments: Dict[Tuple[str, str, int], List[Dict]] = {}
+        self.requests: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.visible_at: Dict[Tuple[str, str, int], float] = {}   # monotonic, reset on push
+        self.verdicts: Dict[Tuple[str, str, int], Tuple[str, float]] = {}  # per revision
+        self._lock = threading.Lock()
+        self._rng = random.Random(self.spec.seed)
+        self._tokens = float(self.faults.burst)
+        self._tokens_at = time.monotonic()
+        self._generate()
+
+    # -- corpus -----------------------------------------------------------
+
+    def _repo_keys(self) -> List[Tuple[str, str]]:
+        return [
+            (f"PRJ{p}", f"repo-{p}-{r}")
+            for p in range(self.spec.projects)
+            for r in range(self.spec.repos_per_project)
+        ]
+
+    def _generate(self) -> None:
+        repos = self._repo_keys()
+        now_ms = int(time.time() * 1000)
+        next_id: Counter = Counter()
+        for i in range(self.spec.prs):
+            project_key, repo_slug = repos[i % len(repos)]
+            next_id[(project_key, repo_slug)] += 1
+            pr_id = next_id[(project_key, repo_slug)]
+            files = min(self.spec.max_files,
+                        max(1, round(self._rng.lognormvariate(math.log(self.spec.files_median), self.spec.spread))))
+            created = now_ms - self._rng.randrange(1, 14 * 86400) * 1000
+            self.prs[(project_key, repo_slug, pr_id)] = {
+                'id': pr_id,
+                'version': 0,
+                'title': f"Change {i}: update {files} file(s)",
+                'description': f"Synthetic pull request {i}",
+                'state': 'OPEN',
+                'open': True,
+                'createdDate': created,
+                'updatedDate': created,
+                'author': {'user': {'name': f"dev{i % 17}", 'displayName': f"Developer {i % 17}"}},
+                'reviewers': [{'user': {'name': self.spec.username}, 'status': 'UNAPPROVED', 'approved': False}],
+                'participants': [],
+                'fromRef': {'id': f"refs/heads/feature-{i}", 'latestCommit': f"{self._rng.getrandbits(160):040x}"},
+                'toRef': {
+                    'id': 'refs/heads/main',
+                    'repository': {'slug': repo_slug, 'project': {'key': project_key}},
+                },
+                '_files': files,
+            }
+            self.visible_at[(project_key, repo_slug, pr_id)] = time.monotonic()
+
+    def push(self, key: Tuple[str, str, int]) -> None:
+        """Simulate a new commit on a PR: new revision, reviewer status reset"""
+        with self._lock:
+            pr = self.prs[key]
+            pr['version'] += 1
+            pr['updatedDate'] = int(time.time() * 1000)
+            pr['fromRef']['latestCommit'] = f"{self._rng.getrandbits(160):040x}"
+            for reviewer in pr['reviewers']:
+                reviewer.update(status='UNAPPROVED', approved=False)
+            self.visible_at[key] = time.monotonic()
+            self.verdicts.pop(key, None)
+
+    def _record_verdict(self, key: Tuple[str, str, int], verdict: str) -> None:
+        """Remember the first verdict on the current revision (caller holds the lock)
+
+        A comment counts only until a reviewer status or decline replaces it.
+        """
+        previous = self.verdicts.get(key)
+        if previous is None or (previous[0] == 'COMMENTED' and verdict != 'COMMENTED'):
+            self.verdicts[key] = (verdict, time.monotonic())
+
+    def _file_diffs(self, key: Tuple[str, str, int]) -> List[Dict]:
+        """Deterministic hunks of a PR revision in /diff and /changes shape"""
+        pr = self.prs[key]
+        rng = random.Random(f"{key}:{pr['fromRef']['latestCommit']}")
+        diffs = []
+        for f in range(pr['_files']):
+            path = f"src/module_{f % 7}/file_{f}{rng.choice(FILE_EXTENSIONS)}"
+            changed = max(1, round(rng.lognormvariate(math.log(self.spec.lines_median), self.spec.spread)))
+            start = rng.randrange(1, 400)
+            removed = changed // 3
+            added = changed - removed
+            context = [
+                {'source': start + n, 'destination': start + n, 'line': f"    context_{f}_{n} = load({n})"}
+                for n in range(self.spec.context_lines)
+            ]
+            base = start + self.spec.context_lines
+            segments = [
+                {'type': 'CONTEXT', 'lines': context},
+                {'type': 'REMOVED', 'lines': [
+                    {'source': base + n, 'destination': base, 'line': f"    old_value_{n} = compute({n})"}
+                    for n in range(removed)
+                ]},
+                {'type': 'ADDED', 'lines': [
+                    {'source': base + removed, 'destination': base + n,
+                     'line': f"    value_{n} = compute_{rng.randrange(9)}(value_{max(0, n - 1)})"}
+                    for n in range(added)
+                ]},
+            ]
+            diffs.append({
+                'source': {'toString': path},
+                'destination': {'toString': path},
+                'hunks': [{
+                    'sourceLine': start,
+                    'sourceSpan': self.spec.context_lines + removed,
+                    'destinationLine': start,
+                    'destinationSpan': self.spec.context_lines + added,
+                    'segments': segments,
+                }],
+            })
+        return diffs
+
+    @staticmethod
+    def _public(pr: Dict) -> Dict:
+        return {k: v for k, v in pr.items() if not k.startswith('_')}
+
+    @staticmethod
+    def _page(values: List, query: Dict) -> Dict:
+        start = int(query.get('start', ['0'])[0])
+        limit = int(query.get('limit', ['25'])[0])
+        page = values[start:start + limit]
+        last = start + limit >= len(values)
+        result = {'values': page, 'size': len(page), 'start': start, 'limit': limit, 'isLastPage': last}
+        if not last:
+            result['nextPageStart'] = start + limit
+        return result
+
+    # -- faults -----------------------------------------------------------
+
+    def _take_token(self) -> bool:
+        if self.faults.rate_limit <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(float(self.faults.burst),
+                               self._tokens + (now - self._tokens_at) * self.faults.rate_limit)
+            self._tokens_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def _delay(self, endpoint: str) -> float:
+        latency = self.faults.endpoint_latency.get(endpoint, self.faults.latency)
+        if latency <= 0:
+            return 0.0
+        jitter = self.faults.latency_jitter
+        with self._lock:
+            return max(0.0, latency * (1 + self._rng.uniform(-jitter, jitter)))
+
+    # -- routing ----------------------------------------------------------
+
+    ROUTES = [
+        ('GET', r'/inbox/pull-requests', 'inbox'),
+        ('GET', r'/users', 'users'),
+        ('GET', r'/application-properties', 'application-properties'),
+        ('GET', r'/projects', 'projects'),
+        ('GET', r'/projects/(?P<p>[^/]+)/repos', 'repos'),
+        ('GET', r'/projects/(?P<p>[^/]+)/repos/(?P<r>[^/]+)/pull-requests', 'pull-requests'),
+        ('GET', r'/projects/(?P<p>[^/]+)/repos/(?P<r>[^/]+)/pull-requests/(?P<id>\d+)', 'details'),
+        ('GET', r'/projects/(?P<p>[^/]+)/repos/(?P<r>[^/]+)/pull-requests/(?P<id>\d+)/changes', 'changes'),
+        ('GET', r'/projects/(?P<p>[^/]+)/repos/(?P<r>[^/]+)/pull-requests/(?P<id>\d+)/diff', 'diff'),
+        ('GET', r'/projects/(?P<p>[^/]+)/repos/(?P<r>[^/]+)/pull-requests/(?P<id>\d+)/activities', 'activities'),
+        ('POST', r'/projects/(?P<p>[^/]+)/repos/(?P<r>[^/]+)/pull-requests/(?P<id>\d+)/comments', 'comments'),
+        ('POST', r'/projects/(?P<p>[^/]+)/repos/(?P<r>[^/]+)/pull-requests/(?P<id>\d+)/approve', 'approve'),
+        ('PUT', r'/projects/(?P<p>[^/]+)/repos/(?P<r>[^/]+)/pull-requests/(?P<id>\d+)/participants/(?P<user>[^/]+)',
+         'participants'),
+        ('POST', r'/projects/(?P<p>[^/]+)/repos/(?P<r>[^/]+)/pull-requests/(?P<id>\d+)/decline', 'decline'),
+    ]
+
+    def handle(self, method: str, path: str, body: Optional[Dict]) -> Tuple[int, Dict, Dict]:
+        """
+        Answer one API request
+
+        Args:
+            method: HTTP method
+            path: Request path including query string
+            body: Parsed JSON body
+
+        Returns:
+            (status code, JSON response, extra headers)
+        """
+        url = urlparse(path)
+        route_path = url.path.split(API_PREFIX, 1)[1] if API_PREFIX in url.path else url.path
+        query = parse_qs(url.query)
+
+        for route_method, pattern, endpoint in self.ROUTES:
+            match = re.fullmatch(pattern, route_path.rstrip('/'))
+            if match and route_method == method:
+                break
+        else:
+            return 404, {'errors': [{'message': f"No mock for {method} {route_path}"}]}, {}
+
+        with self._lock:
+            self.requests[endpoint] += 1
+
+        delay = self._delay(endpoint)
+        if delay:
+            time.sleep(delay)
+
+        if not self._take_token():
+            with self._lock:
+                self.errors['429'] += 1
+            return 429, {'errors': [{'message': 'Rate limit exceeded'}]}, {
+                'Retry-After': str(max(1, math.ceil(1 / self.faults.rate_limit)))
+            }
+
+        if self.faults.error_rate > 0:
+            with self._lock:
+                failed = self._rng.random() < self.faults.error_rate
+            if failed:
+                with self._lock:
+                    self.errors['500'] += 1
+                return 500, {'errors': [{'message': 'Injected server error'}]}, {}
+
+        params = match.groupdict()
+        key = None
+        if 'id' in params:
+            key = (params['p'], params['r'], int(params['id']))
+            if key not in self.prs:
+                return 404, {'errors': [{'message': f"Pull request {key} does not exist"}]}, {}
+
+        return getattr(self, '_' + endpoint.replace('-', '_'))(key, params, query, body or {})
+
+    def _inbox(self, key, params, query, body):
+        with self._lock:
+            values = [
+                self._public(pr) for pr in self.prs.values()
+                if pr['state'] == 'OPEN'
+                and any(r['user']['name'] == self.spec.username for r in pr['reviewers'])
+            ]
+        return 200, self._page(values, query), {}
+
+    def _users(self, key, params, query, body):
+        name = query.get('filter', [self.spec.username])[0]
+        return 200, {'values': [{'name': name, 'slug': name}], 'isLastPage': True}, {}
+
+    def _application_properties(self, key, params, query, body):
+        return 200, {'version': '7.21.0', 'displayName': 'Bitbucket (mock)'}, {}
+
+    def _projects(self, key, params, query, body):
+        projects = sorted({p for p, _ in self._repo_keys()})
+        return 200, self._page([{'key': p} for p in projects], query), {}
+
+    def _repos(self, key, params, query, body):
+        repos = [{'slug': r} for p, r in self._repo_keys() if p == params['p']]
+        return 200, self._page(repos, query), {}
+
+    def _pull_requests(self, key, params, query, body):
+        state = query.get('state', ['OPEN'])[0]
+        with self._lock:
+            values = [
+                self._public(pr) for (p, r, _), pr in self.prs.items()
+                if p == params['p'] and r == params['r'] and (state == 'ALL' or pr['state'] == state)
+            ]
+        return 200, self._page(values, query), {}
+
+    def _details(self, key, params, query, body):
+        with self._lock:
+            return 200, json.loads(json.dumps(self._public(self.prs[key]))), {}
+
+    def _changes(self, key, params, query, body):
+        values = [
+            {'path': {'toString': diff['destination']['toString']}, 'type': 'MODIFY', 'hunks': diff['hunks']}
+            for diff in self._file_diffs(key)
+        ]
+        return 200, self._page(values, query), {}
+
+    def _diff(self, key, params, query, body):
+        return 200, {'diffs': self._file_diffs(key)}, {}
+
+    def _activities(self, key, params, query, body):
+        with self._lock:
+            pr = self.prs[key]
+            values = [{'action': 'OPENED', 'createdDate': pr['createdDate'], 'user': pr['author']['user']}]
+            values += [{'action': 'COMMENTED', 'comment': c, 'user': {'name': self.spec.username}}
+                       for c in self.comments.get(key, [])]
+        return 200, self._page(values[::-1], query), {}
+
+    def _comments(self, key, params, query, body):
+        with self._lock:
+            comments = self.comments.setdefault(key, [])
+            comment = {'id': len(comments) + 1, 'text': body.get('text', ''), 'anchor': body.get('anchor')}
+            comments.append(comment)
+            self._record_verdict(key, 'COMMENTED')
+        return 201, comment, {}
+
+    def _set_reviewer_status(self, key, status: str) -> Dict:
+        with self._lock:
+            pr = self.prs[key]
+            for reviewer in pr['reviewers']:
+                if reviewer['user']['name'] == self.spec.username:
+                    reviewer.update(status=status, approved=status == 'APPROVED')
+                    self._record_verdict(key, status)
+                    return dict(reviewer)
+        return {}
+
+    def _approve(self, key, params, query, body):
+        return 200, self._set_reviewer_status(key, 'APPROVED'), {}
+
+    def _participants(self, key, params, query, body):
+        return 200, self._set_reviewer_status(key, body.get('status', 'UNAPPROVED')), {}
+
+    def _decline(self, key, params, query, body):
+        with self._lock:
+            pr = self.prs[key]
+            if body.get('version', pr['version']) != pr['version']:
+                return 409, {'errors': [{'message': 'PR was updated'}]}, {}
+            pr.update(state='DECLINED', open=False)
+            self._record_verdict(key, 'DECLINED')
+            return 200, self._public(pr), {}
+
+
+class MockStashServer:
+    """Runs a MockStash on a local port in a daemon thread"""
+
+    def __init__(self, spec: Optional[CorpusSpec] = None, faults: Optional[StashFaults] = None,
+                 host: str = '127.0.0.1', port: int = 0):
+        """
+        Initialize mock server
+
+        Args:
+            spec: Corpus shape
+            faults: Injected faults
+            host: Bind address
+            port: Port (0 picks a free one)
+        """
+        self.stash = MockStash(spec, faults)
+        self.host = host
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to pass as STASH_URL (StashClient appends /git)"""
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> 'MockStashServer':
+        stash = self.stash
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _respond(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                try:
+                    body = json.loads(raw) if raw else None
+                except ValueError:
+                    body = None
+                status, payload, headers = stash.handle(self.command, self.path, body)
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _respond
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name='mock-stash', daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> 'MockStashServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Bitbucket Server for offline runs")
+    parser.add_argument('--port', type=int, default=7990)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--prs', type=int, default=100, help="Number of open PRs")
+    parser.add_argument('--files', type=float, default=4, help="Median files per PR")
+    parser.add_argument('--lines', type=float, default=30, help="Median changed lines per file")
+    parser.add_argument('--username', default='gordion', help="Reviewer the PRs are assigned to")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--latency', type=float, default=0.0, help="Mean seconds per request")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of 500 responses")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="Requests per second before 429")
+    args = parser.parse_args()
+
+    spec = CorpusSpec(prs=args.prs, files_median=args.files, lines_median=args.lines,
+                      username=args.username, seed=args.seed)
+    faults = StashFaults(latency=args.latency, error_rate=args.error_rate, rate_limit=args.rate_limit)
+    server = MockStashServer(spec, faults, host=args.host, port=args.port).start()
+    print(f"Mock Stash serving {args.prs} PR(s) on {server.url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"Requests: {dict(server.stash.requests)}")
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
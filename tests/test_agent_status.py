@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test the agent status channel (offline, uses a temporary database)
+"""
+
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from agent_status import StatusReporter
+from database import Database
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_status_is_published_and_commands_are_handled():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / 'history.db'))
+        config = {'status': {'heartbeat_interval': 0.05}}
+        reporter = StatusReporter(db, config, instance_id='agent-1', model='llama3.1:8b')
+        reporter.start()
+        try:
+            reporter.update(state='processing', queue_depth=2)
+            reporter.pr_started({'id': 42, 'title': 'Fix login'})
+            logging.getLogger('test').error("Stash unreachable")
+
+            assert wait_for(lambda: '42' in db.get_agent_statuses()[0]['in_flight'])
+            status = db.get_agent_statuses()[0]
+            assert status['state'] == 'processing' and status['model'] == 'llama3.1:8b'
+            assert 'Stash unreachable' in status['last_error']
+
+            reporter.pr_finished({'id': 42})
+            assert wait_for(lambda: db.get_agent_statuses()[0]['queue_depth'] == 1)
+
+            db.add_agent_command('agent-1', 'run_now')
+            assert reporter.wait(3) and reporter.take_run_now()
+            assert not reporter.take_run_now()
+
+            db.add_agent_command('agent-2', 'stop')
+            db.add_agent_command('agent-1', 'stop')
+            assert wait_for(reporter.stop_requested.is_set)
+            assert db.take_agent_commands('agent-2') == ['stop']
+        finally:
+            reporter.stop()
+
+        assert db.get_agent_statuses()[0]['state'] == 'stopped'
+
+
+if __name__ == '__main__':
+    test_status_is_published_and_commands_are_handled()
+    print("✅ Agent status tests passed")
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Test the review pipeline on both runtimes against the mock Stash and Ollama servers
+(offline, binds local ports)
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+# Add src and tests to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from mock_ollama_server import MockOllamaServer, OllamaModel
+from mock_stash_server import CorpusSpec, MockStashServer
+from traffic_recorder import TRAFFIC
+
+WRITES = ('comments', 'approve', 'participants', 'decline')
+
+TEST_CONFIG = {
+    'logging': {'console': False},
+    'retention': {'enabled': False},
+    'metrics': {'enabled': False},
+    'approval_criteria': {'add_inline_comments_on_reject': True, 'decline_on_reject': False,
+                          'mark_needs_work_on_reject': True},
+}
+
+
+def corpus():
+    return CorpusSpec(prs=12, files_median=2, lines_median=10, seed=7)
+
+
+def model():
+    return OllamaModel(load_seconds=0, time_scale=0.01, approve_rate=0.5)
+
+
+@contextmanager
+def review_app(stash_server, ollama_server, runtime, **config_overrides):
+    """StashAgentApp wired to the mocks, with its database in a temporary directory"""
+    from main import StashAgentApp
+
+    class TestApp(StashAgentApp):
+        def _load_config(self):
+            config = dict(super()._load_config() or {})
+            config.update(TEST_CONFIG, **config_overrides)
+            return config
+
+    env = {
+        'STASH_URL': stash_server.url, 'STASH_TOKEN': 'test', 'STASH_USERNAME': 'gordion',
+        'AI_PROVIDER': 'ollama', 'OLLAMA_URL': ollama_server.url, 'OLLAMA_MODEL': 'llama3.1:8b',
+        'RUNTIME': runtime, 'DRY_RUN': 'false', 'LOG_LEVEL': 'WARNING',
+    }
+    saved = {name: os.environ.get(name) for name in [*env, 'LOG_FILE']}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update(env, LOG_FILE=str(Path(tmp) / 'agent.log'))
+        os.chdir(tmp)
+        app = None
+        try:
+            app = TestApp()
+            yield app
+        finally:
+            if app:
+                app._shutdown()
+            os.chdir(cwd)
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+
+def writes(stash):
+    return sum(stash.requests[endpoint] for endpoint in WRITES)
+
+
+def history(app):
+    app.db_writer.flush()
+    return {(row['project_key'], row['repo_slug'], row['pr_id']): row['status']
+            for row in app.db.get_recent_prs(limit=100)}
+
+
+def test_async_runtime_reviews_and_resumes():
+    with MockStashServer(corpus()) as stash_server, MockOllamaServer(model()) as ollama_server, \
+            review_app(stash_server, ollama_server, 'async') as app:
+        stash = stash_server.stash
+        runtime = app._async_runtime()
+        asyncio.run(runtime.run_once())
+
+        assert set(stash.verdicts) == set(stash.prs)
+        logged = history(app)
+        assert len(logged) == len(stash.prs)
+        expected = {'APPROVED': 'approved', 'NEEDS_WORK': 'needs_work'}
+        assert all(expected[stash.verdicts[key][0]] == status for key, status in logged.items())
+        assert all(app.scheduler.is_rereview(stash.prs[key]) for key in logged)
+
+        # Every revision is logged, so the next cycle writes nothing to Stash
+        before = writes(stash)
+        asyncio.run(runtime.run_once())
+        assert writes(stash) == before
+        assert len(history(app)) == len(stash.prs)
+
+
+def test_jobs_are_logged_only_after_the_history_commit():
+    with MockStashServer(corpus()) as stash_server, MockOllamaServer(model()) as ollama_server, \
+            review_app(stash_server, ollama_server, 'async', database={'flush_interval': 60}) as app:
+        asyncio.run(app._async_runtime().run_once())
+        stages = lambda: {row[0] for row in app.db._connect().execute("SELECT stage FROM pr_jobs")}
+
+        # Verdicts are on Stash but the history rows are still buffered
+        assert stages() == {'approved'}
+        app.db_writer.flush()
+        assert stages() == {'logged'}
+
+
+def test_leases_are_held_until_the_history_commit():
+    with MockStashServer(corpus()) as stash_server, MockOllamaServer(model()) as ollama_server, \
+            review_app(stash_server, ollama_server, 'async', database={'flush_interval': 60},
+                       sharding={'mode': 'lease'}) as app:
+        asyncio.run(app._async_runtime().run_once())
+        conn = app.db._connect()
+
+        # Every PR was logged before its lease was released
+        assert {row[0] for row in conn.execute("SELECT stage FROM pr_jobs")} == {'logged'}
+        assert conn.execute("SELECT COUNT(*) FROM pr_leases").fetchone()[0] == 0
+        assert len(history(app)) == len(stash_server.stash.prs)
+
+
+def test_failed_file_reviews_do_not_block_the_rejection():
+    with MockStashServer(corpus()) as stash_server, MockOllamaServer(model()) as ollama_server, \
+            review_app(stash_server, ollama_server, 'sync') as app:
+        def broken_review(file_path, hunks, repo_slug):
+            raise RuntimeError(f"cannot review {file_path}")
+
+        app.ai_agent.analyze_file_changes = broken_review
+        app.process_pull_requests()
+        stash = stash_server.stash
+
+        rejected = [key for key, (verdict, _) in stash.verdicts.items() if verdict == 'NEEDS_WORK']
+        assert rejected
+        assert all(stash.comments.get(key) for key in rejected)
+        assert len(history(app)) == len(stash.prs)
+
+
+def test_sync_and_async_runtimes_share_decisions():
+    results = {}
+    for runtime in ('sync', 'async'):
+        with MockStashServer(corpus()) as stash_server, MockOllamaServer(model()) as ollama_server, \
+                review_app(stash_server, ollama_server, runtime) as app:
+            if runtime == 'async':
+                asyncio.run(app._async_runtime().run_once())
+            else:
+                app.process_pull_requests()
+            stash = stash_server.stash
+            results[runtime] = (
+                {key: verdict for key, (verdict, _) in stash.verdicts.items()},
+                {key: len(comments) for key, comments in stash.comments.items()},
+                history(app),
+            )
+
+    assert results['sync'] == results['async']
+    verdicts = set(results['sync'][0].values())
+    assert verdicts == {'APPROVED', 'NEEDS_WORK'}
+
+
+def test_replay_matches_recorded_prs_without_touching_the_database():
+    with tempfile.TemporaryDirectory() as tmp:
+        traffic = {'cassette': str(Path(tmp) / 'traffic.jsonl.gz'), 'replay_speed': 0}
+        try:
+            with MockStashServer(corpus()) as stash_server, MockOllamaServer(model()) as ollama_server:
+                # Tracing is off: recordings are keyed by the PR scope alone
+                with review_app(stash_server, ollama_server, 'sync', traffic=dict(traffic, mode='record')) as app:
+                    app.process_pull_requests()
+                    recorded = history(app)
+
+                with review_app(stash_server, ollama_server, 'sync', traffic=dict(traffic, mode='replay')) as app:
+                    before = sum(stash_server.stash.requests.values())
+                    app.process_pull_requests()
+                    assert history(app) == recorded
+                    assert not TRAFFIC.misses
+                    assert sum(stash_server.stash.requests.values()) == before
+                    # Jobs and history went to a throwaway database
+                    assert not Path('data/pr_history.db').exists()
+                    replay_db = app.db.db_path
+                assert not replay_db.exists()
+        finally:
+            TRAFFIC.mode = 'none'
+            TRAFFIC.misses.clear()
+
+
+if __name__ == '__main__':
+    test_async_runtime_reviews_and_resumes()
+    test_jobs_are_logged_only_after_the_history_commit()
+    test_leases_are_held_until_the_history_commit()
+    test_failed_file_reviews_do_not_block_the_rejection()
+    test_sync_and_async_runtimes_share_decisions()
+    test_replay_matches_recorded_prs_without_touching_the_database()
+    print("✅ Async runtime tests passed")
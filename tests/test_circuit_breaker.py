@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test the LLM circuit breaker (offline)
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+def test_opens_after_consecutive_failures_and_fails_fast():
+    states = []
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    breaker.listeners.append(states.append)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # streak broken
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN and states == [OPEN]
+
+    started = time.monotonic()
+    for _ in range(100):
+        assert not breaker.allow()
+    assert time.monotonic() - started < 0.1
+    try:
+        breaker.check()
+        assert False, "open circuit must raise"
+    except CircuitOpenError:
+        pass
+
+
+def test_half_open_probe_closes_or_reopens_with_backoff():
+    healthy = []
+    probes = []
+
+    def probe():
+        probes.append(1)
+        return bool(healthy)
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05, max_reset_timeout=0.15, probe=probe)
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    time.sleep(0.06)
+    assert not breaker.allow()  # probe failed
+    assert breaker.state == OPEN and len(probes) == 1
+    assert breaker._timeout == 0.1
+
+    time.sleep(0.06)
+    assert not breaker.allow() and len(probes) == 1  # still waiting for the doubled timeout
+
+    time.sleep(0.05)
+    healthy.append(True)
+    assert breaker.allow()
+    assert breaker.state == CLOSED and breaker._timeout == 0.05 and len(probes) == 2
+
+
+def test_trip_probe_without_health_check_and_disabled():
+    breaker = CircuitBreaker(reset_timeout=0.01)
+    breaker.trip()
+    assert breaker.state == OPEN
+    time.sleep(0.02)
+    # No probe: one call goes through as the probe, the rest wait for its outcome
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+    breaker.configure({'ai': {'circuit_breaker': {'enabled': False, 'failure_threshold': 1}}})
+    breaker.record_failure()
+    breaker.trip()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+if __name__ == '__main__':
+    test_opens_after_consecutive_failures_and_fails_fast()
+    test_half_open_probe_closes_or_reopens_with_backoff()
+    test_trip_probe_without_health_check_and_disabled()
+    print("✅ Circuit breaker tests passed")
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Test time-boxed review cycles (offline, no Stash required)
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from cycle_scheduler import CycleRunner, DeadlineExceeded, check_deadline, deadline_timeout, pr_deadline
+from pr_scheduler import PRScheduler
+
+
+def make_pr(pr_id, updated=1):
+    return {
+        'id': pr_id,
+        'updatedDate': updated,
+        'toRef': {'repository': {'slug': 'app', 'project': {'key': 'PROJ'}}},
+    }
+
+
+def make_runner(**scheduling):
+    return CycleRunner({'scheduling': scheduling}, check_interval=300)
+
+
+def test_sjf_order_and_carry_over_first():
+    scheduler = PRScheduler({'scheduling': {'aging_rate': 0}}, username='gordion')
+    scheduler.seed_size_hints({('PROJ', 'app', 1): 5000, ('PROJ', 'app', 2): 10, ('PROJ', 'app', 3): 100})
+    runner = make_runner(pr_deadline=0.05)
+    slow = {1}
+    seen = []
+
+    def process(pr):
+        seen.append((pr['id'], threading.current_thread()))
+        if pr['id'] in slow:
+            slow.discard(pr['id'])
+            time.sleep(0.1)
+            check_deadline('approving')
+
+    prs = [make_pr(1), make_pr(2), make_pr(3)]
+    summary = runner.run_cycle(scheduler.order(prs), process)
+    assert [pr_id for pr_id, _ in seen] == [2, 3, 1]
+    assert summary['processed'] == 2 and summary['timed_out'] == 1
+    assert list(runner.carry_over) == [('PROJ', 'app', 1)]
+
+    # The preempted PR jumps the shortest-job-first order next cycle
+    seen.clear()
+    summary = runner.run_cycle(scheduler.order(prs), process)
+    assert [pr_id for pr_id, _ in seen] == [1, 2, 3]
+    assert summary['processed'] == 3 and not runner.carry_over
+
+    # No worker threads: every PR reuses the cycle thread's database connection
+    assert {thread for _, thread in seen} == {threading.current_thread()}
+
+
+def test_deadline_stops_before_side_effects():
+    runner = make_runner(pr_deadline=0.05, max_pr_attempts=2)
+    approved = []
+    calls = []
+
+    def process(pr):
+        calls.append(pr['id'])
+        time.sleep(0.1)
+        check_deadline(f"approving PR #{pr['id']}")
+        approved.append(pr['id'])
+
+    for _ in range(2):
+        summary = runner.run_cycle([make_pr(1)], process)
+        assert summary['timed_out'] == 1
+    assert approved == []
+    assert calls == [1, 1]
+
+    # Out of attempts: skipped until the PR changes
+    summary = runner.run_cycle([make_pr(1)], process)
+    assert summary['skipped'] == 1 and calls == [1, 1]
+
+    runner.pr_deadline = 1
+    summary = runner.run_cycle([make_pr(1, updated=2)], process)
+    assert summary['processed'] == 1 and approved == [1]
+
+
+def test_cycle_budget_carries_over_without_attempts():
+    runner = make_runner(cycle_budget=0.05, max_pr_attempts=1)
+    seen = []
+
+    def process(pr):
+        seen.append(pr['id'])
+        time.sleep(0.1)
+
+    summary = runner.run_cycle([make_pr(1), make_pr(2), make_pr(3)], process)
+    assert seen == [1]
+    assert summary['processed'] == 1 and summary['carried_over'] == 2
+    # Never started, so they do not count towards max_pr_attempts
+    assert [state['attempts'] for state in runner.carry_over.values()] == [0, 0]
+    assert [state['reason'] for state in runner.carry_over.values()] == ['cycle budget exhausted'] * 2
+
+
+def test_request_timeouts_capped_by_deadline():
+    assert deadline_timeout(30, 'GET') == 30
+
+    with pr_deadline(0.5):
+        assert 0 < deadline_timeout(30, 'GET') <= 0.5
+        assert deadline_timeout(0.1, 'GET') == 0.1
+        assert 0 < deadline_timeout(None, 'GET') <= 0.5
+
+    with pr_deadline(0):
+        try:
+            deadline_timeout(30, 'GET')
+            assert False, "expected DeadlineExceeded"
+        except DeadlineExceeded:
+            pass
+
+
+def test_async_deadline_stops_and_cancels():
+    runner = make_runner(pr_deadline=0.05)
+    approved = []
+    stopped = threading.Event()
+
+    def approve(pr):
+        time.sleep(0.1)
+        try:
+            check_deadline('approving')
+        except Exception:
+            stopped.set()
+            raise
+        approved.append(pr['id'])
+
+    async def process(pr):
+        if pr['id'] == 1:
+            # The task is cancelled, but the offloaded call keeps running
+            # until its own checkpoint stops it
+            await asyncio.to_thread(approve, pr)
+        elif pr['id'] == 2:
+            await asyncio.sleep(10)
+        approved.append(pr['id'])
+
+    summary = asyncio.run(runner.run_cycle_async([make_pr(1), make_pr(2), make_pr(3)], process, 3))
+    assert stopped.wait(1)
+    assert approved == [3]
+    assert summary['processed'] == 1 and summary['timed_out'] == 2
+    assert all(state['attempts'] == 1 for state in runner.carry_over.values())
+
+
+def test_async_budget_spent_waiting_is_not_an_attempt():
+    runner = make_runner(cycle_budget=0.1, max_pr_attempts=1)
+    seen = []
+
+    async def process(pr):
+        seen.append(pr['id'])
+
+    async def cycle():
+        # Something else holds the loop past the budget before any PR gets its slot
+        asyncio.get_running_loop().call_soon(time.sleep, 0.15)
+        return await runner.run_cycle_async([make_pr(1), make_pr(2)], process, 2)
+
+    summary = asyncio.run(cycle())
+    assert seen == []
+    assert summary['carried_over'] == 2 and not runner._given_up
+    assert [state['attempts'] for state in runner.carry_over.values()] == [0, 0]
+
+
+if __name__ == '__main__':
+    test_sjf_order_and_carry_over_first()
+    test_deadline_stops_before_side_effects()
+    test_cycle_budget_carries_over_without_attempts()
+    test_request_timeouts_capped_by_deadline()
+    test_async_deadline_stops_and_cancels()
+    test_async_budget_spent_waiting_is_not_an_attempt()
+    print("✅ Cycle scheduler tests passed")
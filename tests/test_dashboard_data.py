@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test the cached dashboard data layer (offline, uses a temporary database)
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from database import Database
+from dashboard_data import DashboardData
+
+
+class CountingDatabase(Database):
+    """Database that counts dashboard queries"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.calls = []
+
+    def get_stats(self, days=7):
+        self.calls.append('stats')
+        return super().get_stats(days)
+
+    def get_recent_prs(self, limit=50):
+        self.calls.append('recent')
+        return super().get_recent_prs(limit)
+
+    def get_prs_after(self, after_id, limit=50):
+        self.calls.append('after')
+        return super().get_prs_after(after_id, limit)
+
+
+def make_record(pr_id):
+    return {'pr_id': pr_id, 'project_key': 'PROJ', 'repo_slug': 'app', 'status': 'approved'}
+
+
+def test_queries_are_cached_until_history_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CountingDatabase(str(Path(tmp) / 'history.db'))
+        data = DashboardData(db, ttl=0)
+        db.add_pr_record(make_record(1))
+
+        assert data.stats(7)['total'] == 1
+        assert data.stats(7)['total'] == 1
+        assert db.calls.count('stats') == 1
+
+        db.add_pr_record(make_record(2))
+        assert data.stats(7)['total'] == 2
+        assert db.calls.count('stats') == 2
+
+
+def test_recent_prs_fetch_only_new_rows():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CountingDatabase(str(Path(tmp) / 'history.db'))
+        data = DashboardData(db, ttl=0)
+        for pr_id in range(1, 4):
+            db.add_pr_record(make_record(pr_id))
+
+        assert [r['pr_id'] for r in data.recent_prs(limit=3)] == [3, 2, 1]
+        db.add_pr_record(make_record(4))
+        assert [r['pr_id'] for r in data.recent_prs(limit=3)] == [4, 3, 2]
+        data.recent_prs(limit=3)
+        assert db.calls == ['recent', 'after']
+
+        db.clear_history()
+        assert data.recent_prs(limit=3) == []
+
+
+def test_yaml_is_reparsed_only_when_modified():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'config.yaml'
+        path.write_text("check_interval: 300\n")
+        data = DashboardData(db=None)
+
+        config = data.load_yaml(path)
+        config['check_interval'] = 60  # callers may modify their copy
+        assert data.load_yaml(path) == {'check_interval': 300}
+        assert data.load_yaml(Path(tmp) / 'missing.yaml') == {}
+
+
+if __name__ == '__main__':
+    test_queries_are_cached_until_history_changes()
+    test_recent_prs_fetch_only_new_rows()
+    test_yaml_is_reparsed_only_when_modified()
+    print("✅ Dashboard data tests passed")
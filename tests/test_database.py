@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test the SQLite connection handling (offline, uses a temporary database)
+"""
+
+import sqlite3
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from database import MIGRATIONS, Database
+
+
+def make_record(pr_id):
+    return {'pr_id': pr_id, 'project_key': 'PROJ', 'repo_slug': 'app',
+            'title': f"PR {pr_id}", 'status': 'approved', 'confidence_score': 90}
+
+
+def test_connection_is_reused_and_tuned():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / 'history.db'))
+
+        conn = db._connect()
+        assert db._connect() is conn
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+        db.close()
+        assert db._connect() is not conn
+
+
+def test_short_lived_threads_reuse_pooled_connections():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / 'history.db'))
+        seen = []
+
+        def query():
+            seen.append(id(db._connect()))
+            db.get_stats(days=1)
+
+        for _ in range(20):
+            thread = threading.Thread(target=query)
+            thread.start()
+            thread.join()
+        assert len(set(seen)) == 1 and len(db._pool) == 1
+
+        # More concurrent threads than the pool keeps: extra connections are closed
+        barrier = threading.Barrier(Database.POOL_SIZE + 3)
+        threads = [threading.Thread(target=lambda: (query(), barrier.wait()))
+                   for _ in range(Database.POOL_SIZE + 3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(db._pool) == Database.POOL_SIZE
+
+        db.close()
+        assert not db._pool
+
+
+def test_concurrent_writers_and_readers():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'history.db')
+        agent, dashboard = Database(path), Database(path)
+        errors = []
+
+        def write(offset):
+            for i in range(50):
+                if not agent.add_pr_record(make_record(offset + i)):
+                    errors.append(offset + i)
+
+        def read():
+            for _ in range(50):
+                dashboard.get_stats(days=1)
+                dashboard.get_recent_prs(limit=10)
+
+        threads = [threading.Thread(target=write, args=(n * 1000,)) for n in range(4)]
+        threads += [threading.Thread(target=read) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert not errors
+        assert dashboard.get_stats(days=1)['total'] == 200
+
+
+
+def test_legacy_database_is_migrated():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'history.db')
+        with sqlite3.connect(path) as conn:
+            conn.execute("""
+                CREATE TABLE pr_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, pr_id INTEGER NOT NULL,
+                    project_key TEXT NOT NULL, repo_slug TEXT NOT NULL, title TEXT, author TEXT,
+                    status TEXT NOT NULL, confidence_score INTEGER, reasoning TEXT, concerns TEXT,
+                    files_changed INTEGER, additions INTEGER, deletions INTEGER, ai_model TEXT,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(project_key, repo_slug, pr_id, timestamp)
+                )
+            """)
+            conn.execute("""
+                INSERT INTO pr_history (pr_id, project_key, repo_slug, status, timestamp)
+                VALUES (1, 'PROJ', 'app', 'approved', '2024-03-01 12:00:00')
+            """)
+
+        db = Database(path)
+        conn = db._connect()
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == MIGRATIONS[-1][0]
+        row = conn.execute("SELECT ts_epoch, day FROM pr_history").fetchone()
+        assert row['ts_epoch'] == 1709294400 and row['day'] == '2024-03-01'
+
+        # Re-opening is a no-op
+        Database(path)
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM pr_history ORDER BY ts_epoch DESC").fetchall()
+        assert 'idx_pr_history_ts' in plan[0][3]
+
+
+
+def test_rollups_match_history():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / 'history.db'))
+        for pr_id, status in enumerate(['approved', 'approved', 'rejected', 'needs_work', 'declined'], 1):
+            db.add_pr_record({**make_record(pr_id), 'status': status, 'files_changed': 2, 'additions': 10})
+
+        stats = db.get_stats(days=1)
+        assert (stats['total'], stats['approved'], stats['rejected'], stats['needs_work'], stats['declined']) == \
+            (5, 2, 1, 1, 1)
+        assert stats['avg_confidence'] == 90 and stats['total_additions'] == 50
+        assert db.get_stats(days=9999) == stats
+        assert db.get_daily_stats(days=1)[-1]['total'] == 5
+        assert db.get_repo_stats(days=1) == [
+            {'project_key': 'PROJ', 'repo_slug': 'app', 'total': 5, 'approved': 2, 'rejected': 3}
+        ]
+
+        # Rebuild from scratch yields the same counters
+        with db._connect() as conn:
+            conn.execute("UPDATE pr_rollup_daily SET total = 0")
+        assert db.rebuild_rollups() == 1
+        assert db.get_stats(days=9999) == stats
+
+
+if __name__ == '__main__':
+    test_connection_is_reused_and_tuned()
+    test_short_lived_threads_reuse_pooled_connections()
+    test_concurrent_writers_and_readers()
+    test_legacy_database_is_migrated()
+    test_rollups_match_history()
+    print("✅ Database tests passed")
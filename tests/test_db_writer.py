@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test the batched database writer (offline, uses a temporary database)
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from database import Database
+from db_writer import BatchedDatabaseWriter
+
+
+class CountingDatabase(Database):
+    """Database that counts write transactions"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.batches = []
+
+    def add_pr_records(self, records):
+        self.batches.append(len(records))
+        return super().add_pr_records(records)
+
+
+def make_record(pr_id):
+    return {'pr_id': pr_id, 'project_key': 'PROJ', 'repo_slug': 'app', 'status': 'approved'}
+
+
+def test_records_are_batched_and_flushed_on_close():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CountingDatabase(str(Path(tmp) / 'history.db'))
+        writer = BatchedDatabaseWriter(db, batch_size=50, flush_interval=60)
+        writer.start()
+
+        for pr_id in range(1, 121):
+            writer.add_pr_record(make_record(pr_id))
+        writer.add_agent_run('started', 'test')
+        writer.close()
+
+        assert sum(db.batches) == 120
+        assert max(db.batches) <= 50 and len(db.batches) <= 4
+        assert db.get_stats(days=1)['total'] == 120
+        assert writer.written == 121 and writer.failed == 0
+
+
+def test_flush_writes_pending_records():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / 'history.db'))
+        writer = BatchedDatabaseWriter(db, batch_size=1000, flush_interval=60)
+        writer.start()
+
+        writer.add_pr_record(make_record(1))
+        assert writer.flush(timeout=5)
+        assert db.get_stats(days=1)['total'] == 1
+        writer.close()
+
+        # Closed writer writes through
+        writer.add_pr_record(make_record(2))
+        assert db.get_stats(days=1)['total'] == 2
+
+
+def test_commit_callbacks_and_per_record_timestamps():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / 'history.db'))
+        writer = BatchedDatabaseWriter(db, batch_size=1000, flush_interval=60)
+        writer.start()
+        committed = []
+
+        writer.add_pr_record({**make_record(1), 'ts_epoch': int(time.time()) - 3600},
+                             on_commit=lambda: committed.append(1))
+        writer.add_pr_record(make_record(2), on_commit=lambda: committed.append(2))
+        assert committed == []  # still buffered
+
+        assert writer.flush(timeout=5)
+        assert committed == [1, 2]
+        rows = {row['pr_id']: row['ts_epoch'] for row in db.get_recent_prs()}
+        assert rows[2] - rows[1] >= 3600  # not stamped with the flush time
+
+        # A failed transaction runs no callbacks
+        db.add_pr_records = lambda records: -1
+        writer.add_pr_record(make_record(3), on_commit=lambda: committed.append(3))
+        writer.close()
+        assert committed == [1, 2] and writer.failed == 1
+
+
+if __name__ == '__main__':
+    test_records_are_batched_and_flushed_on_close()
+    test_flush_writes_pending_records()
+    test_commit_callbacks_and_per_record_timestamps()
+    print("✅ DB writer tests passed")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Test the durable PR job queue (offline, uses a temporary database)
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from database import Database
+from job_queue import JobStore, job_key
+
+
+def make_pr(commit='abc123'):
+    return {'id': 7, 'version': 3, 'fromRef': {'latestCommit': commit}}
+
+
+def test_job_key_changes_with_new_commit():
+    identifiers = ('PROJ', 'app', 7)
+    assert job_key(make_pr(), identifiers) == 'PROJ/app#7@abc123'
+    assert job_key(make_pr('def456'), identifiers) != job_key(make_pr(), identifiers)
+    assert job_key({'id': 7, 'version': 3}, identifiers) == 'PROJ/app#7@v3'
+
+
+def test_job_resumes_after_restart():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / 'jobs.db'))
+        identifiers = ('PROJ', 'app', 7)
+
+        job = JobStore(db).load(make_pr(), identifiers)
+        assert not job.done('fetched')
+        job.advance('fetched', stats={'files_changed': 2})
+        job.advance('analysed', analysis={'approve': True}, should_approve=True)
+
+        # A fresh store (new process) picks up where the last one stopped
+        resumed = JobStore(db).load(make_pr(), identifiers)
+        assert resumed.done('analysed') and not resumed.done('commented')
+        assert resumed.state['analysis'] == {'approve': True}
+        assert resumed.state['stats'] == {'files_changed': 2}
+
+        # A new commit starts over
+        assert not JobStore(db).load(make_pr('def456'), identifiers).done('fetched')
+
+
+def test_dry_run_does_not_persist_side_effects():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / 'jobs.db'))
+        identifiers = ('PROJ', 'app', 7)
+
+        job = JobStore(db, dry_run=True).load(make_pr(), identifiers)
+        job.advance('analysed', should_approve=False)
+        job.advance('commented')
+        job.advance('logged', status='needs_work')
+
+        assert JobStore(db).load(make_pr(), identifiers).stage == 'analysed'
+
+
+if __name__ == '__main__':
+    test_job_key_changes_with_new_commit()
+    test_job_resumes_after_restart()
+    test_dry_run_does_not_persist_side_effects()
+    print("✅ Job queue tests passed")
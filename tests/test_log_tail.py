@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Test log tailing (offline, uses temporary files)
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from log_tail import LogFollower, tail_lines
+
+
+def write(path, text, mode='a'):
+    with open(path, mode, encoding='utf-8') as f:
+        f.write(text)
+
+
+def test_tail_reads_only_trailing_lines():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'agent.log'
+        write(path, ''.join(f"line {i} ✅\n" for i in range(10000)), 'w')
+
+        assert tail_lines(path, 3, block_size=64) == ['line 9997 ✅', 'line 9998 ✅', 'line 9999 ✅']
+        assert tail_lines(path, 20000) == [f"line {i} ✅" for i in range(10000)]
+
+
+def test_follower_appends_and_handles_partial_lines():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'agent.log'
+        follower = LogFollower(path, max_lines=5)
+        assert follower.read() is None
+
+        write(path, "a\nb\nhalf")
+        assert follower.read(10) == ['a', 'b', 'half']
+        write(path, " done\nc\n")
+        assert follower.read(10) == ['a', 'b', 'half done', 'c']
+        write(path, "d\ne\nf\n")
+        assert follower.read(3) == ['d', 'e', 'f']
+        assert len(follower.read(10)) == 5
+
+
+def test_follower_survives_rotation_and_truncation():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'agent.log'
+        follower = LogFollower(path)
+        write(path, "old 1\nold 2\n")
+        assert follower.read(10) == ['old 1', 'old 2']
+
+        os.rename(path, Path(tmp) / 'agent.log.1')
+        write(path, "new 1\n", 'w')
+        assert follower.read(10) == ['new 1']
+
+        write(path, "x\n", 'w')
+        assert follower.read(10) == ['x']
+
+
+if __name__ == '__main__':
+    test_tail_reads_only_trailing_lines()
+    test_follower_appends_and_handles_partial_lines()
+    test_follower_survives_rotation_and_truncation()
+    print("✅ Log tail tests passed")
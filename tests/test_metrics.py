@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test metrics and the Prometheus endpoint (offline, binds a local port)
+"""
+
+import sys
+import urllib.request
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from metrics import Counter, Histogram, MetricsServer, Registry
+
+
+def test_labelled_metrics_render_prometheus_text():
+    registry = Registry(namespace='test')
+    requests = registry.counter('requests_total', 'Requests', ['method', 'status'])
+    requests.labels('GET', 200).inc()
+    requests.labels(method='GET', status='200').inc(2)
+    requests.labels('POST', 'error').inc()
+
+    latency = registry.histogram('latency_seconds', 'Latency', ['endpoint'], buckets=(0.1, 1))
+    latency.labels('/inbox').observe(0.05)
+    latency.labels('/inbox').observe(0.5)
+
+    depth = registry.gauge('queue_depth', 'Queue depth')
+    depth.set_function(lambda: 7)
+
+    text = registry.render()
+    assert '# TYPE test_requests_total counter' in text
+    assert 'test_requests_total{method="GET",status="200"} 3' in text
+    assert 'test_requests_total{method="POST",status="error"} 1' in text
+    assert 'test_latency_seconds_bucket{endpoint="/inbox",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{endpoint="/inbox",le="+Inf"} 2' in text
+    assert 'test_latency_seconds_count{endpoint="/inbox"} 2' in text
+    assert 'test_queue_depth 7' in text
+
+
+def test_registry_returns_existing_metric():
+    registry = Registry()
+    first = registry.histogram('cycle_duration_seconds', 'Cycle')
+    assert registry.histogram('cycle_duration_seconds', 'Cycle') is first
+
+    try:
+        registry.counter('cycle_duration_seconds')
+        assert False, "type mismatch should raise"
+    except ValueError:
+        pass
+
+
+def test_labels_are_required_when_declared():
+    counter = Counter('calls_total', 'Calls', ['call'])
+    try:
+        counter.inc()
+        assert False, "labelled counter without labels should raise"
+    except ValueError:
+        pass
+
+    histogram = Histogram('plain_seconds', 'Plain', buckets=(1, 10))
+    histogram.observe(3)
+    assert histogram.count == 1
+    assert histogram.percentile(0.5) == 10
+
+
+def test_server_serves_metrics():
+    registry = Registry(namespace='test')
+    registry.counter('hits_total', 'Hits').inc()
+
+    server = MetricsServer(registry, host='127.0.0.1', port=0)
+    assert server.start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5) as response:
+            assert response.status == 200
+            assert 'test_hits_total 1' in response.read().decode('utf-8')
+
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{server.port}/other", timeout=5)
+            assert False, "unknown path should 404"
+        except urllib.error.HTTPError as e:
+            assert e.code == 404
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    test_labelled_metrics_render_prometheus_text()
+    test_registry_returns_existing_metric()
+    test_labels_are_required_when_declared()
+    test_server_serves_metrics()
+    print("✅ Metrics tests passed")
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test the mock Ollama server (offline, binds a local port)
+"""
+
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+# Add tests to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from mock_ollama_server import MockOllamaServer, OllamaModel
+
+SYSTEM = 'You review pull requests. Answer with JSON: {"approve": true, "confidence_score": 0}'
+FAST = dict(load_seconds=0.5, prompt_tokens_per_second=2000, generation_tokens_per_second=400,
+            response_tokens=40, time_scale=0.1)
+
+
+def chat(server, user, system=SYSTEM, stream=False, model='llama3.1:8b'):
+    body = {'model': model, 'stream': stream,
+            'messages': [{'role': 'system', 'content': system}, {'role': 'user', 'content': user}]}
+    request = urllib.request.Request(server.url + '/api/chat', data=json.dumps(body).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'}, method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            raw = response.read().decode('utf-8')
+            if stream:
+                return response.status, [json.loads(line) for line in raw.splitlines() if line]
+            return response.status, json.loads(raw)
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def review_json(content):
+    return json.loads(content[content.find('{'):content.rfind('}') + 1])
+
+
+def test_tags_and_review_answer():
+    with MockOllamaServer(OllamaModel(**FAST)) as server:
+        with urllib.request.urlopen(server.url + '/api/tags', timeout=5) as response:
+            assert json.loads(response.read())['models'][0]['name'] == 'llama3.1:8b'
+
+        status, data = chat(server, "PR: Add caching\n+ cache = {}")
+        assert status == 200 and data['done']
+        review = review_json(data['message']['content'])
+        assert {'approve', 'confidence_score', 'reasoning', 'concerns'} <= set(review)
+        for field in ('load_duration', 'prompt_eval_count', 'prompt_eval_duration',
+                      'eval_count', 'eval_duration', 'total_duration'):
+            assert data[field] > 0
+
+        # Same prompt, same answer
+        assert chat(server, "PR: Add caching\n+ cache = {}")[1]['message'] == data['message']
+
+        comments = chat(server, "[Satır 3] + a\n[Satır 9] + b",
+                        system='Return JSON: {"comments": [{"line": 1, "comment": ""}]}')[1]
+        lines = {c['line'] for c in json.loads(comments['message']['content'])['comments']}
+        assert lines <= {3, 9}
+
+        assert chat(server, "x", model='missing:1b')[0] == 404
+
+
+def test_model_load_and_prefix_cache():
+    with MockOllamaServer(OllamaModel(**FAST)) as server:
+        first = chat(server, "first PR " * 50)[1]
+        second = chat(server, "second PR " * 50)[1]
+
+        assert server.ollama.loads == 1
+        assert first['load_duration'] > 0 and second['load_duration'] == 0
+        # The shared system prompt is served from the slot's KV cache
+        assert second['prompt_eval_count'] < first['prompt_eval_count']
+        assert server.ollama.cached_tokens > 0
+
+    model = OllamaModel(prefix_cache=False, **FAST)
+    with MockOllamaServer(model) as server:
+        chat(server, "first PR " * 50)
+        chat(server, "second PR " * 50)
+        assert server.ollama.cached_tokens == 0
+
+
+def test_streaming_and_malformed_answers():
+    with MockOllamaServer(OllamaModel(**FAST)) as server:
+        status, lines = chat(server, "PR: stream me", stream=True)
+        assert status == 200 and len(lines) > 2
+        assert not any(line['done'] for line in lines[:-1]) and lines[-1]['done']
+        content = ''.join(line['message']['content'] for line in lines)
+        assert 'approve' in review_json(content)
+
+    with MockOllamaServer(OllamaModel(malformed_rate=1.0, **FAST)) as server:
+        for i in range(5):
+            content = chat(server, f"PR {i}")[1]['message']['content']
+            try:
+                assert 'confidence_score' not in review_json(content)
+            except ValueError:
+                pass
+
+
+def test_parallel_slots_bound_concurrency():
+    def elapsed(parallel):
+        with MockOllamaServer(OllamaModel(num_parallel=parallel, **FAST)) as server:
+            chat(server, "warm up")
+            threads = [threading.Thread(target=chat, args=(server, f"PR {i}")) for i in range(4)]
+            started = time.monotonic()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return time.monotonic() - started
+
+    assert elapsed(1) > 1.6 * elapsed(4)
+
+
+if __name__ == '__main__':
+    test_tags_and_review_answer()
+    test_model_load_and_prefix_cache()
+    test_streaming_and_malformed_answers()
+    test_parallel_slots_bound_concurrency()
+    print("✅ Mock Ollama server tests passed")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test the mock Bitbucket Server (offline, binds a local port)
+"""
+
+import json
+import sys
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+# Add src and tests to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from job_queue import job_key
+from mock_stash_server import CorpusSpec, MockStashServer, StashFaults
+from pr_analyzer import calculate_pr_stats
+
+API = '/git/rest/api/1.0'
+
+
+def call(server, method, path, body=None):
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    request = urllib.request.Request(server.url + API + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_corpus_and_review_flow():
+    with MockStashServer(CorpusSpec(prs=30, seed=1)) as server:
+        status, inbox = call(server, 'GET', '/inbox/pull-requests?role=REVIEWER&limit=100')
+        assert status == 200 and len(inbox['values']) == 30
+
+        pr = inbox['values'][0]
+        repo = pr['toRef']['repository']
+        base = f"/projects/{repo['project']['key']}/repos/{repo['slug']}/pull-requests/{pr['id']}"
+
+        _, changes = call(server, 'GET', base + '/changes?limit=1000')
+        _, diff = call(server, 'GET', base + '/diff?contextLines=3')
+        assert len(changes['values']) == len(diff['diffs']) >= 1
+        assert changes['values'][0]['hunks'][0]['segments'][2]['type'] == 'ADDED'
+
+        # Same revision, same content
+        assert call(server, 'GET', base + '/diff')[1] == diff
+
+        assert call(server, 'POST', base + '/comments', {'text': 'LGTM'})[0] == 201
+        assert call(server, 'POST', base + '/approve')[0] == 200
+        assert call(server, 'GET', base)[1]['reviewers'][0]['status'] == 'APPROVED'
+        key = (repo['project']['key'], repo['slug'], pr['id'])
+        assert server.stash.verdicts[key][0] == 'APPROVED'
+        activities = call(server, 'GET', base + '/activities')[1]['values']
+        assert activities[0]['action'] == 'COMMENTED'
+
+        # A push is a new revision with a reset review
+        before = job_key(pr, key)
+        server.stash.push(key)
+        details = call(server, 'GET', base)[1]
+        assert job_key(details, key) != before
+        assert details['reviewers'][0]['status'] == 'UNAPPROVED'
+        assert key not in server.stash.verdicts
+
+        status, _ = call(server, 'PUT', base + '/participants/gordion', {'status': 'NEEDS_WORK'})
+        assert status == 200
+        assert call(server, 'POST', base + '/decline', {'version': 0})[0] == 409
+        assert call(server, 'POST', base + '/decline', {'version': details['version']})[0] == 200
+        assert len(call(server, 'GET', '/inbox/pull-requests?limit=100')[1]['values']) == 29
+
+        assert server.stash.requests['inbox'] == 2
+        assert call(server, 'GET', '/projects/X/repos/y/pull-requests/999')[0] == 404
+
+
+def test_size_shape_is_configurable():
+    small = MockStashServer(CorpusSpec(prs=200, files_median=2, lines_median=10)).stash
+    large = MockStashServer(CorpusSpec(prs=200, files_median=20, lines_median=80)).stash
+
+    def total_files(stash):
+        return sum(pr['_files'] for pr in stash.prs.values())
+
+    assert total_files(large) > 5 * total_files(small)
+
+    key = next(iter(large.prs))
+    files = large._file_diffs(key)
+    stats = calculate_pr_stats({'changes': files, 'diff': ''})
+    assert stats['files_changed'] == large.prs[key]['_files']
+
+
+def test_faults_are_injected():
+    with MockStashServer(CorpusSpec(prs=5), StashFaults(rate_limit=1, burst=2)) as server:
+        codes = [call(server, 'GET', '/inbox/pull-requests')[0] for _ in range(5)]
+        assert codes[:2] == [200, 200]
+        assert 429 in codes
+        assert server.stash.errors['429'] >= 1
+
+    with MockStashServer(CorpusSpec(prs=5), StashFaults(error_rate=1.0)) as server:
+        assert call(server, 'GET', '/inbox/pull-requests')[0] == 500
+
+
+if __name__ == '__main__':
+    test_corpus_and_review_flow()
+    test_size_shape_is_configurable()
+    test_faults_are_injected()
+    print("✅ Mock Stash server tests passed")
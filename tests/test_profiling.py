@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test runtime profiling hooks (offline, writes to a temporary directory)
+"""
+
+import json
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from agent_status import StatusReporter
+from profiling import Profiler, SamplingProfiler
+from tracing import TRACER, traced
+
+PR = {'id': 7, 'toRef': {'repository': {'slug': 'app', 'project': {'key': 'PRJ'}}}}
+
+
+class NullExporter:
+    def export(self, trace):
+        pass
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+def test_sampler_writes_folded_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name='busy worker')
+    worker.start()
+    sampler = SamplingProfiler(interval=0.002, thread_ids={worker.ident})
+    sampler.start()
+    time.sleep(0.2)
+    samples = sampler.stop()
+    stop.set()
+    worker.join()
+
+    assert samples
+    assert all(stack.startswith('busy_worker;') for stack in samples)
+    assert any('busy_loop (test_profiling.py' in stack for stack in samples)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'out.folded'
+        sampler.write_folded(path)
+        stack, count = path.read_text(encoding='utf-8').splitlines()[0].rsplit(' ', 1)
+        assert int(count) >= 1 and ';' in stack
+
+
+def test_window_is_triggered_by_dashboard_command():
+    with tempfile.TemporaryDirectory() as tmp:
+        profiler = Profiler()
+        profiler.configure({'profiling': {'output_dir': tmp, 'sample_interval': 0.005}})
+
+        status = StatusReporter(db=None, config={})
+        status.register_command('profile', profiler.handle_command)
+        status.register_command('profile_pr', profiler.handle_command)
+
+        status._handle_command('profile:0.2')
+        assert not profiler.start_window(1)  # one window at a time
+        deadline = time.time() + 5
+        while not list(Path(tmp).glob('*-window.folded')) and time.time() < deadline:
+            time.sleep(0.05)
+        assert list(Path(tmp).glob('profile-*-window.folded'))
+
+        status._handle_command('profile_pr:PRJ/app/7')
+        assert 'PRJ/app/7' in profiler._armed
+
+        disabled = Profiler()
+        disabled.configure({'profiling': {'enabled': False}})
+        assert not disabled.start_window(0.1)
+
+
+def test_armed_pr_review_is_profiled_per_stage():
+    @traced('decide')
+    def decide():
+        data = [str(i) * 10 for i in range(20000)]
+        return len(data)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        profiler = Profiler()
+        profiler.configure({'profiling': {'output_dir': tmp}})
+        previous = TRACER.exporters
+        TRACER.exporters = [NullExporter()]
+        try:
+            with TRACER.trace('review_pr', pr_id=7), profiler.pr_session(PR) as profiled:
+                assert profiled is False
+
+            profiler.arm_pr('PRJ/app/7')
+            with TRACER.trace('review_pr', pr_id=7), profiler.pr_session(PR) as profiled:
+                assert profiled is True
+                decide()
+            assert not profiler._armed and not TRACER.hooks
+        finally:
+            TRACER.exporters = previous
+
+        prof = list(Path(tmp).glob('profile-*-PRJ-app-7.prof'))
+        assert len(prof) == 1
+        assert prof[0].with_suffix('.folded').exists()
+
+        summary = json.loads(prof[0].with_suffix('.json').read_text(encoding='utf-8'))
+        assert summary['pr'] == 'PRJ-app-7'
+        assert [stage['stage'] for stage in summary['stages']] == ['decide']
+        assert summary['stages'][0]['cpu_s'] > 0
+        assert summary['peak_traced_kb'] > 100
+        assert summary['top_allocations']
+
+        import pstats
+        stats = pstats.Stats(str(prof[0]))
+        assert any(func[2] == 'decide' for func in stats.stats)
+
+
+if __name__ == '__main__':
+    test_sampler_writes_folded_stacks()
+    test_window_is_triggered_by_dashboard_command()
+    test_armed_pr_review_is_profiled_per_stage()
+    print("✅ Profiling tests passed")
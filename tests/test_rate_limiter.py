@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Test Stash rate limiting, adaptive concurrency and retries (offline, fake responses)
+"""
+
+import asyncio
+import sys
+import time
+from email.utils import formatdate
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from cycle_scheduler import DeadlineExceeded, check_deadline, pr_deadline
+from rate_limiter import AdaptiveConcurrency, StashThrottle, TokenBucket, retry_after_seconds
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def scripted(*statuses):
+    """Request function answering with the given statuses (exceptions are raised)"""
+    calls = []
+
+    def request():
+        status = statuses[min(len(calls), len(statuses) - 1)]
+        calls.append(status)
+        if isinstance(status, Exception):
+            raise status
+        return FakeResponse(*status) if isinstance(status, tuple) else FakeResponse(status)
+
+    request.calls = calls
+    return request
+
+
+def test_token_bucket_spaces_requests_after_burst():
+    bucket = TokenBucket(rate=100, burst=5)
+    waits = [bucket.reserve() for _ in range(10)]
+    assert waits[:5] == [0.0] * 5
+    assert 0.04 < waits[-1] <= 0.051
+
+    bucket.pause(0.5)
+    assert bucket.reserve() >= 0.45
+
+    unlimited = TokenBucket(rate=0, burst=1)
+    assert [unlimited.reserve() for _ in range(100)] == [0.0] * 100
+
+
+def test_concurrency_is_aimd():
+    limiter = AdaptiveConcurrency(initial=4, minimum=1, maximum=6, latency_target=1.0, cooldown=0)
+    for _ in range(4):
+        assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+
+    for _ in range(4):
+        limiter.release(0.1, overloaded=False)
+    assert 4.9 < limiter.limit < 5.1  # +1 per window of fast responses
+
+    assert limiter.try_acquire()
+    limiter.release(0.1, overloaded=True)
+    assert 2.4 < limiter.limit < 2.6  # halved
+
+    assert limiter.try_acquire()
+    limiter.release(5.0, overloaded=False)  # slow counts as congestion
+    assert 1.2 < limiter.limit < 1.3
+
+    limiter.cooldown = 60
+    limiter.limit = 4.0
+    limiter._last_decrease = float('-inf')
+    for _ in range(3):
+        assert limiter.try_acquire()
+    for _ in range(3):
+        limiter.release(0.1, overloaded=True)
+    assert limiter.limit == 2.0  # one decrease per cooldown
+    assert limiter.in_flight == 0
+
+
+def test_retries_honour_method_and_retry_after():
+    throttle = StashThrottle(max_retries=3, retry_base=0.001, retry_cap=0.1, latency_target=0)
+
+    request = scripted(503, 502, 200)
+    assert throttle.send('GET', request).status_code == 200
+    assert request.calls == [503, 502, 200]
+
+    # POSTs are retried only on 429
+    request = scripted(503, 200)
+    assert throttle.send('POST', request).status_code == 503
+    request = scripted((429, {'Retry-After': '0.05'}), 200)
+    started = time.monotonic()
+    assert throttle.send('POST', request).status_code == 200
+    assert time.monotonic() - started >= 0.05
+
+    # Gives up after max_retries and returns the last response
+    request = scripted(429)
+    assert throttle.send('GET', request).status_code == 429
+    assert len(request.calls) == 4
+
+    # Connection errors: retried for idempotent methods only
+    request = scripted(ConnectionError('reset'), 200)
+    assert throttle.send('GET', request, errors=(ConnectionError,)).status_code == 200
+    request = scripted(ConnectionError('reset'), 200)
+    try:
+        throttle.send('POST', request, errors=(ConnectionError,))
+        assert False, "POST connection error must not be retried"
+    except ConnectionError:
+        pass
+    assert throttle.concurrency.in_flight == 0
+
+    disabled = StashThrottle(enabled=False)
+    request = scripted(503, 200)
+    assert disabled.send('GET', request).status_code == 503
+
+
+def test_retry_after_is_capped_and_stops_at_the_deadline():
+    throttle = StashThrottle(max_retries=1, retry_base=0.001, retry_cap=0.05, latency_target=0)
+
+    # Retry-After: 3600 waits retry_cap, and pauses the bucket no longer
+    request = scripted((429, {'Retry-After': '3600'}), 200)
+    started = time.monotonic()
+    assert throttle.send('GET', request).status_code == 200
+    assert time.monotonic() - started < 1
+    assert throttle.bucket.reserve() < 0.06
+
+    # A backoff that would outlast the PR deadline stops the PR instead
+    throttle.retry_cap = 30
+    request = scripted((429, {'Retry-After': '10'}), 200)
+    started = time.monotonic()
+    with pr_deadline(0.5):
+        try:
+            throttle.send('GET', request)
+            assert False, "expected DeadlineExceeded"
+        except DeadlineExceeded:
+            pass
+        assert time.monotonic() - started < 0.5
+        assert request.calls == [(429, {'Retry-After': '10'})]
+        # Expired early, so later checkpoints stop the PR too
+        try:
+            check_deadline('approving')
+            assert False, "expected DeadlineExceeded"
+        except DeadlineExceeded:
+            pass
+    assert throttle.concurrency.in_flight == 0
+
+
+def test_timeouts_and_connection_errors_lower_the_limit():
+    throttle = StashThrottle(initial_concurrency=8, max_retries=0, latency_target=0)
+    for error in (TimeoutError('read'), ConnectionError('reset')):
+        limit = throttle.concurrency.limit
+        throttle.concurrency._last_decrease = float('-inf')
+        try:
+            throttle.send('GET', scripted(error), errors=(TimeoutError, ConnectionError))
+            assert False, "expected the error"
+        except (TimeoutError, ConnectionError):
+            pass
+        assert throttle.concurrency.limit == limit * 0.5
+
+
+def test_async_requests_respect_concurrency_limit():
+    throttle = StashThrottle(initial_concurrency=3, max_concurrency=3, latency_target=0)
+    active = []
+    peak = []
+
+    async def request():
+        active.append(1)
+        peak.append(len(active))
+        await asyncio.sleep(0.01)
+        active.pop()
+        return FakeResponse(200)
+
+    async def run():
+        return await asyncio.gather(*(throttle.send_async('GET', request) for _ in range(20)))
+
+    responses = asyncio.run(run())
+    assert all(r.status_code == 200 for r in responses)
+    assert max(peak) == 3
+    assert throttle.concurrency.in_flight == 0
+
+
+def test_retry_after_forms():
+    assert retry_after_seconds({'Retry-After': '7'}) == 7.0
+    assert 28 < retry_after_seconds({'Retry-After': formatdate(time.time() + 30, usegmt=True)}) <= 30
+    assert retry_after_seconds({'Retry-After': formatdate(time.time() - 30, usegmt=True)}) == 0.0
+    assert retry_after_seconds({'Retry-After': 'soon'}) == 0.0
+    assert retry_after_seconds({}) == 0.0 and retry_after_seconds(None) == 0.0
+
+
+def test_async_waiters_are_woken_by_release():
+    limiter = AdaptiveConcurrency(initial=1, minimum=1, maximum=1, latency_target=0)
+
+    async def run():
+        await limiter.acquire_async()
+        waiter = asyncio.ensure_future(limiter.acquire_async())
+        await asyncio.sleep(0.05)
+        assert not waiter.done() and len(limiter._async_waiters) == 1
+
+        released = time.monotonic()
+        limiter.release(0.0, overloaded=False)
+        await waiter
+        assert time.monotonic() - released < 0.01
+        assert limiter.in_flight == 1 and not limiter._async_waiters
+
+        # A cancelled waiter does not leak
+        cancelled = asyncio.ensure_future(limiter.acquire_async())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        assert not limiter._async_waiters
+        limiter.release(0.0, overloaded=False)
+        assert limiter.in_flight == 0
+
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+    test_token_bucket_spaces_requests_after_burst()
+    test_concurrency_is_aimd()
+    test_retries_honour_method_and_retry_after()
+    test_retry_after_is_capped_and_stops_at_the_deadline()
+    test_timeouts_and_connection_errors_lower_the_limit()
+    test_async_requests_respect_concurrency_limit()
+    test_retry_after_forms()
+    test_async_waiters_are_woken_by_release()
+    print("✅ Rate limiter tests passed")
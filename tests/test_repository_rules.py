@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Test repository rules matching, prompt context and hot reload (offline, uses a temporary rules file)
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from repository_rules import RepositoryRulesManager
+
+RULES = """
+repositories:
+  billing:
+    description: "Billing service"
+    tech_stack:
+      language: "java"
+      framework: "spring"
+    rules:
+      - "Use BigDecimal for money"
+    prompts:
+      pr_analysis: |
+        Check currency rounding.
+      code_review: |
+        Flag floating point arithmetic.
+  bare: {}
+"""
+
+
+def test_prompt_context_is_stable_per_repository():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'repository_rules.yaml'
+        path.write_text(RULES, encoding='utf-8')
+        manager = RepositoryRulesManager(str(path))
+
+        context = manager.get_prompt_context('billing', 'pr_analysis')
+        assert context.startswith('Repository: billing - Billing service')
+        assert '- language: java' in context and '- Use BigDecimal for money' in context
+        assert context.endswith('Check currency rounding.')
+        assert 'floating point' not in context
+
+        # Same bytes every time, so the LLM can reuse the cached prefix
+        assert manager.get_prompt_context('billing', 'pr_analysis') == context
+        assert RepositoryRulesManager(str(path)).get_prompt_context('billing', 'pr_analysis') == context
+
+        review = manager.get_prompt_context('billing', 'code_review')
+        assert review.endswith('Flag floating point arithmetic.') and review != context
+
+        assert manager.get_prompt_context('unknown', 'pr_analysis') == ""
+        assert manager.get_prompt_context('bare', 'pr_analysis') == ""
+        assert RepositoryRulesManager(str(Path(tmp) / 'missing.yaml')).get_prompt_context('billing', 'x') == ""
+
+
+def test_glob_and_regex_keys_resolve_through_index():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'repository_rules.yaml'
+        entries = [f"  svc-{i}:\n    priority: {i}\n" for i in range(300)]
+        entries += [
+            '  "payments-*":\n    priority: 5\n',
+            '  "re:^(web|mobile)-app$":\n    priority: 7\n',
+            '  "*":\n    priority: 1.5\n',
+            '  "re:([":\n    priority: 9\n',  # invalid, ignored
+        ]
+        path.write_text("repositories:\n" + "".join(entries), encoding='utf-8')
+        manager = RepositoryRulesManager(str(path))
+
+        assert manager.get_repository_config('svc-123')['priority'] == 123
+        assert manager.get_repository_config('payments-api')['priority'] == 5
+        assert manager.get_repository_config('mobile-app')['priority'] == 7
+        assert manager.get_repository_config('mobile-app-2')['priority'] == 1.5  # regex is anchored
+        assert manager.get_repository_config('anything')['priority'] == 1.5
+        assert manager.get_prompt_context('payments-api', 'pr_analysis') == 'Repository: payments-api'
+
+        version = manager._current()
+        assert len(version.exact) == 300 and len(version.patterns) == 3
+
+
+def test_patterns_with_inline_flags_and_groups():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'repository_rules.yaml'
+        path.write_text(RULES, encoding='utf-8')
+        manager = RepositoryRulesManager(str(path), reload_interval=0)
+        assert manager.get_repository_config('billing')
+
+        # Each key is compiled on its own: flags, backreferences and named groups all work
+        path.write_text("""
+repositories:
+  "re:(?i)^web-.*":
+    priority: 2
+  "api-*":
+    priority: 3
+  're:(a)\\1-svc':
+    priority: 4
+  "re:(?P<team>core)-(?P=team)":
+    priority: 5
+  "re:(?P<team>x+)":
+    priority: 6
+""", encoding='utf-8')
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        assert manager.get_repository_config('WEB-shop')['priority'] == 2
+        assert manager.get_repository_config('api-gw')['priority'] == 3
+        assert manager.get_repository_config('aa-svc')['priority'] == 4
+        assert manager.get_repository_config('core-core')['priority'] == 5
+        assert manager.get_repository_config('xxx')['priority'] == 6
+        assert manager.get_repository_config('billing') is None
+        assert manager.version == 2
+
+        # A structurally invalid file keeps the last good version
+        path.write_text("repositories:\n  - web\n", encoding='utf-8')
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2_000_000_000))
+        assert manager.get_repository_config('api-gw')['priority'] == 3
+        assert manager.version == 2
+
+
+def test_rules_reload_when_file_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'repository_rules.yaml'
+        path.write_text(RULES, encoding='utf-8')
+        manager = RepositoryRulesManager(str(path), reload_interval=0)
+        before = manager.get_prompt_context('billing', 'pr_analysis')
+        assert manager.version == 1
+
+        path.write_text(RULES.replace('Use BigDecimal for money', 'Store cents as integers'), encoding='utf-8')
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        after = manager.get_prompt_context('billing', 'pr_analysis')
+        assert 'Store cents as integers' in after and after != before
+        assert manager.version == 2
+
+        # A broken edit keeps the last good rules
+        path.write_text("repositories: [unclosed", encoding='utf-8')
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2_000_000_000))
+        assert manager.get_prompt_context('billing', 'pr_analysis') == after
+        assert manager.version == 2
+
+        # So does an entry that is not a mapping
+        path.write_text(RULES + '  app: "just a string"\n', encoding='utf-8')
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2_500_000_000))
+        assert manager.get_prompt_context('app', 'pr_analysis') == ''
+        assert manager.get_prompt_context('billing', 'pr_analysis') == after
+        assert manager.version == 2
+
+        # A bad file at startup leaves no rules rather than crashing lookups
+        fresh = RepositoryRulesManager(str(path), reload_interval=0)
+        assert fresh.get_repository_config('app') is None and fresh.version == 0
+
+        # Checks are rate limited
+        path.write_text(RULES, encoding='utf-8')
+        slow = RepositoryRulesManager(str(path), reload_interval=60)
+        path.write_text(RULES.replace('billing', 'invoicing'), encoding='utf-8')
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 3_000_000_000))
+        assert slow.get_repository_config('billing') and slow.version == 1
+
+
+if __name__ == '__main__':
+    test_prompt_context_is_stable_per_repository()
+    test_glob_and_regex_keys_resolve_through_index()
+    test_patterns_with_inline_flags_and_groups()
+    test_rules_reload_when_file_changes()
+    print("✅ Repository rules tests passed")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test history retention (offline, uses a temporary database)
+"""
+
+import gzip
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from database import Database
+from retention import RetentionManager
+
+DAY = 86400
+
+
+def seed(db, ages_in_days):
+    """Insert one approved record per age, with a long reasoning text"""
+    now = int(time.time())
+    for pr_id, age in enumerate(ages_in_days, 1):
+        db.add_pr_record({'pr_id': pr_id, 'project_key': 'PROJ', 'repo_slug': 'app',
+                          'status': 'approved', 'confidence_score': 80,
+                          'reasoning': 'looks good ' * 100, 'concerns': []})
+    with db._connect() as conn:
+        for pr_id, age in enumerate(ages_in_days, 1):
+            epoch = now - age * DAY
+            conn.execute("UPDATE pr_history SET ts_epoch = ?, timestamp = datetime(?, 'unixepoch') "
+                         "WHERE pr_id = ?", (epoch, epoch, pr_id))
+    db.rebuild_rollups()
+
+
+def test_compaction_and_table_archive_keep_statistics():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / 'history.db'))
+        seed(db, [0, 40, 200, 300])
+        before = db.get_stats(days=9999)
+        db.save_pr_job('PROJ/app#1@old', 'PROJ', 'app', 1, 'logged', {})
+        db.save_pr_job('PROJ/app#2@new', 'PROJ', 'app', 2, 'fetched', {})
+        conn = db._connect()
+        conn.execute("UPDATE pr_jobs SET updated_at = ? WHERE pr_id = 1", (time.time() - 20 * DAY,))
+        conn.commit()
+
+        config = {'retention': {'detail_days': 180, 'compress_after_days': 30, 'archive': 'table',
+                                'job_days': 14}}
+        summary = RetentionManager(db, config).run()
+
+        assert summary['compressed'] == 3 and summary['archived'] == 2 and summary['jobs'] == 1
+        assert db.get_pr_job('PROJ/app#1@old') is None and db.get_pr_job('PROJ/app#2@new')
+        assert conn.execute("SELECT COUNT(*) FROM pr_history").fetchone()[0] == 2
+        assert conn.execute("SELECT COUNT(*) FROM pr_history_archive").fetchone()[0] == 2
+        assert db.get_stats(days=9999) == before
+        assert db.get_recent_prs()[1]['reasoning'] == 'looks good ' * 100
+
+        # Rebuilding rollups keeps the compacted days
+        db.rebuild_rollups()
+        assert db.get_stats(days=9999) == before
+
+
+def test_file_archive_and_interval():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / 'history.db'))
+        seed(db, [0, 400])
+
+        config = {'retention': {'detail_days': 180, 'archive': 'file', 'archive_dir': tmp}}
+        manager = RetentionManager(db, config)
+        manager.run_if_due()
+
+        files = list(Path(tmp).glob('pr_history-*.jsonl.gz'))
+        assert len(files) == 1
+        with gzip.open(files[0], 'rt', encoding='utf-8') as f:
+            archived = [json.loads(line) for line in f]
+        assert [row['pr_id'] for row in archived] == [2]
+        assert db._connect().execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+        # Not due again within interval_hours
+        seed(db, [500])
+        manager.run_if_due()
+        assert db._connect().execute("SELECT COUNT(*) FROM pr_history WHERE ts_epoch < ?",
+                                     (time.time() - 180 * DAY,)).fetchone()[0] == 1
+
+
+if __name__ == '__main__':
+    test_compaction_and_table_archive_keep_statistics()
+    test_file_archive_and_interval()
+    print("✅ Retention tests passed")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test PR queue scheduling (offline, no Stash required)
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from pr_scheduler import PRScheduler
+
+
+class StaticRules:
+    """Minimal stand-in for RepositoryRulesManager"""
+
+    def __init__(self, repositories):
+        self.repositories = repositories
+
+    def get_repository_config(self, repository_name):
+        return self.repositories.get(repository_name)
+
+
+def make_pr(pr_id, repo='app', age_minutes=0, reviewers=None):
+    created = (time.time() - age_minutes * 60) * 1000
+    return {
+        'id': pr_id,
+        'createdDate': created,
+        'reviewers': reviewers or [],
+        'toRef': {'repository': {'slug': repo, 'project': {'key': 'PROJ'}}},
+    }
+
+
+def make_scheduler(repositories=None, **scheduling):
+    config = {'scheduling': scheduling}
+    return PRScheduler(config, rules_manager=StaticRules(repositories or {}), username='gordion')
+
+
+def test_small_prs_first():
+    scheduler = make_scheduler(aging_rate=0)
+    scheduler.seed_size_hints({('PROJ', 'app', 1): 5000, ('PROJ', 'app', 2): 10})
+
+    ordered = scheduler.order([make_pr(1), make_pr(2)])
+    assert [pr['id'] for pr in ordered] == [2, 1]
+
+
+def test_aging_prevents_starvation():
+    scheduler = make_scheduler(aging_rate=10)
+    scheduler.seed_size_hints({('PROJ', 'app', 1): 2000, ('PROJ', 'app', 2): 10})
+    now = time.time()
+
+    # An old createdDate alone does not jump the queue
+    assert [pr['id'] for pr in scheduler.order([make_pr(1, age_minutes=300), make_pr(2)], now)] == [2, 1]
+
+    # Big PR has been waiting in the queue for 5 hours, the small one just arrived
+    scheduler.order([make_pr(1), make_pr(3)], now)
+    ordered = scheduler.order([make_pr(2), make_pr(1)], now + 300 * 60)
+    assert [pr['id'] for pr in ordered] == [1, 2]
+
+
+def test_lone_pr_ages_from_first_queueing():
+    scheduler = make_scheduler(aging_rate=10)
+    scheduler.seed_size_hints({('PROJ', 'app', 1): 2000, ('PROJ', 'app', 2): 10})
+    now = time.time()
+
+    # PR 1 waits alone in the inbox for 5 hours before PR 2 arrives
+    assert [pr['id'] for pr in scheduler.order([make_pr(1)], now)] == [1]
+    ordered = scheduler.order([make_pr(2), make_pr(1)], now + 300 * 60)
+    assert [pr['id'] for pr in ordered] == [1, 2]
+
+
+def test_repo_priority_and_rereview():
+    scheduler = make_scheduler(
+        repositories={'payments': {'priority': 4}},
+        aging_rate=0, default_size=400, rereview_factor=0.5
+    )
+    reviewed = [{'user': {'name': 'gordion'}, 'status': 'NEEDS_WORK'}]
+
+    ordered = scheduler.order([
+        make_pr(1, repo='app'),
+        make_pr(2, repo='app', reviewers=reviewed),
+        make_pr(3, repo='payments'),
+    ])
+    assert [pr['id'] for pr in ordered] == [3, 2, 1]
+
+
+def test_only_completed_reviews_are_rereviews():
+    scheduler = make_scheduler(aging_rate=0)
+    scheduler.record_size(make_pr(1), 100)
+    assert not scheduler.is_rereview(make_pr(1))
+
+    scheduler.record_review(make_pr(1))
+    assert scheduler.is_rereview(make_pr(1))
+
+    scheduler.seed_size_hints({('PROJ', 'app', 2): 50})
+    assert scheduler.is_rereview(make_pr(2))
+
+
+def test_disabled_keeps_api_order():
+    scheduler = make_scheduler(enabled=False)
+    scheduler.seed_size_hints({('PROJ', 'app', 1): 5000})
+
+    ordered = scheduler.order([make_pr(1), make_pr(2)])
+    assert [pr['id'] for pr in ordered] == [1, 2]
+
+
+if __name__ == '__main__':
+    test_small_prs_first()
+    test_aging_prevents_starvation()
+    test_lone_pr_ages_from_first_queueing()
+    test_repo_priority_and_rereview()
+    test_only_completed_reviews_are_rereviews()
+    test_disabled_keeps_api_order()
+    print("✅ Scheduler tests passed")
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Test multi-instance sharding (offline, uses a temporary database)
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from database import Database
+from sharding import ConsistentHashRing, ShardCoordinator
+
+
+def make_pr(pr_id, repo='app'):
+    return {'id': pr_id, 'toRef': {'repository': {'slug': repo, 'project': {'key': 'PROJ'}}}}
+
+
+def test_hash_ring_is_stable_and_balanced():
+    ring = ConsistentHashRing([0, 1, 2])
+    keys = [f"PROJ/repo-{i}" for i in range(3000)]
+
+    owners = [ring.get_node(key) for key in keys]
+    other_process_ring = ConsistentHashRing([0, 1, 2])
+    assert owners == [other_process_ring.get_node(key) for key in keys]
+    for node in (0, 1, 2):
+        assert 700 < owners.count(node) < 1300
+
+
+def test_hash_mode_partitions_prs():
+    prs = [make_pr(i, repo=f"repo-{i}") for i in range(1, 201)]
+    seen = []
+    for index in range(3):
+        config = {'sharding': {'mode': 'hash', 'shard_count': 3, 'shard_index': index}}
+        seen.extend(pr['id'] for pr in ShardCoordinator(config, db=None).filter(prs))
+
+    assert sorted(seen) == list(range(1, 201))
+
+
+def test_lease_claim_and_expiry():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / 'leases.db'))
+
+        assert db.claim_pr_lease('PROJ/app#1', 'a', ttl=60)
+        assert db.claim_pr_lease('PROJ/app#1', 'a', ttl=60)  # re-entrant
+        assert not db.claim_pr_lease('PROJ/app#1', 'b', ttl=60)
+
+        assert db.release_pr_lease('PROJ/app#1', 'a')
+        assert db.claim_pr_lease('PROJ/app#1', 'b', ttl=0.01)
+        time.sleep(0.05)
+        assert db.claim_pr_lease('PROJ/app#1', 'a', ttl=60)  # expired lease taken over
+        assert db.renew_pr_leases(['PROJ/app#1'], 'b', ttl=60) == 0
+
+
+if __name__ == '__main__':
+    test_hash_ring_is_stable_and_balanced()
+    test_hash_mode_partitions_prs()
+    test_lease_claim_and_expiry()
+    print("✅ Sharding tests passed")
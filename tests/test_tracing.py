@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test tracing spans and exporters (offline, uses a temporary database)
+"""
+
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from database import Database
+from tracing import DatabaseExporter, JsonlExporter, Tracer, TRACER, traced
+
+
+class ListExporter:
+    def __init__(self):
+        self.traces = []
+
+    def export(self, trace):
+        self.traces.append(trace)
+
+
+def test_spans_nest_and_export_once_per_trace():
+    exporter = ListExporter()
+    tracer = Tracer([exporter])
+
+    with tracer.span('outside'):
+        pass
+    assert tracer.add_span('outside', 1.0) is None
+
+    with tracer.trace('review_pr', pr_id=7) as root:
+        with tracer.span('decide') as decide:
+            chat = tracer.add_span('chat analysis', 0.5, model='m')
+            tracer.add_span('prompt_eval', 0.2, end=chat.start + 0.2, parent=chat, tokens=100)
+        try:
+            with tracer.span('log_pr'):
+                raise RuntimeError("boom")
+        except RuntimeError:
+            pass
+
+    assert tracer.flush()
+    assert len(exporter.traces) == 1
+
+    waterfall = exporter.traces[0].waterfall()
+    names = [span['name'] for span in waterfall['spans']]
+    assert names[0] == 'review_pr'
+    assert set(names) == {'review_pr', 'decide', 'chat analysis', 'prompt_eval', 'log_pr'}
+
+    by_name = {span['name']: span for span in waterfall['spans']}
+    assert by_name['decide']['parent_id'] == root.span_id
+    assert by_name['chat analysis']['parent_id'] == decide.span_id
+    assert by_name['prompt_eval']['parent_id'] == chat.span_id
+    assert by_name['log_pr']['status'] == 'error'
+    assert waterfall['attributes'] == {'pr_id': 7}
+
+
+def test_context_follows_asyncio_tasks_and_decorator():
+    exporter = ListExporter()
+    tracer = Tracer([exporter])
+
+    async def fetch(name):
+        with tracer.span(name):
+            await asyncio.sleep(0.01)
+
+    async def review():
+        with tracer.trace('review_pr', pr_id=1):
+            await asyncio.gather(fetch('changes'), fetch('diff'))
+            await asyncio.to_thread(lambda: tracer.add_span('threaded', 0.01))
+
+    asyncio.run(review())
+    tracer.flush()
+
+    spans = exporter.traces[0].waterfall()['spans']
+    root_id = spans[0]['span_id']
+    assert sorted(span['name'] for span in spans[1:]) == ['changes', 'diff', 'threaded']
+    assert all(span['parent_id'] == root_id for span in spans[1:])
+
+    @traced('decorated')
+    def work():
+        span = TRACER.current()
+        return span.name if span else None
+
+    assert work() is None
+    previous = TRACER.exporters
+    TRACER.exporters = [ListExporter()]
+    try:
+        with TRACER.trace('review_pr'):
+            assert work() == 'decorated'
+    finally:
+        TRACER.exporters = previous
+
+
+def test_waterfall_is_stored_in_database_and_jsonl():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(str(Path(tmp) / 'test.db'))
+        jsonl = Path(tmp) / 'traces.jsonl'
+        tracer = Tracer([DatabaseExporter(db), JsonlExporter(str(jsonl))])
+
+        with tracer.trace('review_pr', project_key='PRJ', repo_slug='app', pr_id=42):
+            with tracer.span('decide'):
+                time.sleep(0.01)
+        with tracer.trace('poll'):
+            pass
+        assert tracer.flush()
+
+        traces = db.get_pr_traces('PRJ', 'app', 42)
+        assert len(traces) == 1
+        assert [span['name'] for span in traces[0]['spans']] == ['review_pr', 'decide']
+        assert traces[0]['spans'][1]['duration'] >= 0.01
+
+        lines = [json.loads(line) for line in jsonl.read_text(encoding='utf-8').splitlines()]
+        assert len(lines) == 3
+        assert {line['name'] for line in lines} == {'review_pr', 'decide', 'poll'}
+
+        assert db.purge_pr_traces(time.time() + 1) == 1
+        assert db.get_pr_traces('PRJ', 'app', 42) == []
+        db.close()
+
+
+if __name__ == '__main__':
+    test_spans_nest_and_export_once_per_trace()
+    test_context_follows_asyncio_tasks_and_decorator()
+    test_waterfall_is_stored_in_database_and_jsonl()
+    print("✅ Tracing tests passed")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Test traffic recording, redaction and replay (offline, uses a temporary cassette)
+"""
+
+import gzip
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from traffic_recorder import MISSING, TrafficRecorder
+
+DIFF = {'diffs': [{'hunks': [{'segments': [{'type': 'ADDED', 'lines': [
+    {'destination': 3, 'line': 'password = "hunter2"  # TODO'},
+]}]}]}]}
+
+
+def record_cassette(path, **config):
+    recorder = TrafficRecorder()
+    recorder.configure({'traffic': dict({'mode': 'record', 'cassette': str(path)}, **config)})
+
+    recorder.record('stash', 'GET', '/inbox/pull-requests', {'limit': 100}, None, 200, {'values': [1]}, 0.2)
+    recorder.record('stash', 'GET', '/inbox/pull-requests', {'limit': 100}, None, 200, {'values': [1, 2]}, 0.4)
+    recorder.record('stash', 'GET', '/projects/P/repos/r/pull-requests/1/diff', None, None, 200, DIFF, 0.1,
+                    headers={'Content-Type': 'application/json'})
+    chat = {'model': 'm', 'messages': [{'role': 'user', 'content': 'Review: token=abc123'}]}
+    recorder.record('ollama', 'POST', '/api/chat', None, chat, 200, {'message': {'content': '{"approve": true}'}},
+                    2.0, context='src/a.py')
+    recorder.record('stash', 'GET', '/users', {'filter': 'bot'}, None, 200,
+                    {'values': [{'displayName': 'Jane Doe', 'auth': 'Bearer s3cr3t.tok'}]}, 0.1)
+    recorder.close()
+    return recorder
+
+
+def test_recording_is_compressed_and_redacted():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'traffic.jsonl.gz'
+        recorder = record_cassette(path, redact_keys=['displayName'])
+        assert recorder.recorded == 5
+
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            lines = [json.loads(line) for line in f]
+        header, entries = lines[0], lines[1:]
+        assert header['cassette'] == 1 and len(entries) == 5
+
+        diff_line = entries[2]['body']['diffs'][0]['hunks'][0]['segments'][0]['lines'][0]['line']
+        original = DIFF['diffs'][0]['hunks'][0]['segments'][0]['lines'][0]['line']
+        assert 'hunter2' not in diff_line and len(diff_line) == len(original)
+        assert entries[2]['headers'] == {'Content-Type': 'application/json'}
+
+        assert 'abc123' not in entries[3]['request']['messages'][0]['content']
+        assert entries[3]['body']['message']['content'] == '{"approve": true}'
+        assert entries[3]['context'] == 'src/a.py'
+
+        user = entries[4]['body']['values'][0]
+        assert 'Jane' not in user['displayName'] and 's3cr3t' not in user['auth']
+
+        # Secrets are scrubbed even with code redaction off
+        record_cassette(path, redact_code=False)
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            text = f.read()
+        assert '# TODO' in text
+        assert 'hunter2' not in text and 'abc123' not in text and 's3cr3t' not in text
+
+
+def test_replay_order_context_and_timing():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'traffic.jsonl.gz'
+        record_cassette(path)
+
+        replayer = TrafficRecorder()
+        replayer.configure({'traffic': {'mode': 'replay', 'cassette': str(path), 'replay_speed': 4}})
+        assert replayer.replaying and not replayer.recording
+
+        inbox = [replayer.lookup('stash', 'GET', '/inbox/pull-requests', {'limit': 100}) for _ in range(3)]
+        assert [len(entry['body']['values']) for entry in inbox] == [1, 2, 2]
+        assert replayer.replay_delay(inbox[1]) == 0.1
+
+        # Different query parameters, or a different file, are different requests
+        assert replayer.lookup('stash', 'GET', '/inbox/pull-requests', {'limit': 25})['status'] == 404
+        missing = replayer.lookup('ollama', 'POST', '/api/chat', context='src/b.py')
+        assert missing['status'] == MISSING['status']
+        assert replayer.lookup('ollama', 'POST', '/api/chat', context='src/a.py')['status'] == 200
+        assert sum(replayer.misses.values()) == 2
+
+
+def make_pr(pr_id):
+    return {'id': pr_id, 'toRef': {'repository': {'slug': 'r', 'project': {'key': 'P'}}}}
+
+
+def test_recordings_are_keyed_by_pr_under_review():
+    # Tracing is off (no exporters), the PR scope does not depend on it
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'traffic.jsonl.gz'
+        recorder = TrafficRecorder()
+        recorder.start_recording(str(path))
+        for pr_id, verdict in ((1, True), (2, False)):
+            with recorder.pr_scope(make_pr(pr_id)):
+                recorder.record('ollama', 'POST', '/api/chat', None, {}, 200, {'approve': verdict}, 1.0)
+        recorder.close()
+
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            assert [json.loads(line).get('context') for line in f][1:] == ['P/r#1', 'P/r#2']
+
+        replayer = TrafficRecorder()
+        replayer.load(str(path))
+        # Replayed in the opposite order, each PR still gets its own answer
+        with replayer.pr_scope(make_pr(2)):
+            assert replayer.lookup('ollama', 'POST', '/api/chat')['body'] == {'approve': False}
+        with replayer.pr_scope(make_pr(1)):
+            assert replayer.lookup('ollama', 'POST', '/api/chat')['body'] == {'approve': True}
+
+
+def test_truncated_cassette_keeps_flushed_recordings():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'traffic.jsonl.gz'
+        recorder = TrafficRecorder()
+        recorder.start_recording(str(path))
+        for i in range(60):
+            recorder.record('stash', 'GET', f"/item/{i}", None, None, 200, {'i': i}, 0.0)
+        # Simulate a crash: the gzip stream is never finished
+        recorder._file.flush()
+        data = path.read_bytes()
+        recorder.close()
+        path.write_bytes(data)
+
+        replayer = TrafficRecorder()
+        assert replayer.load(str(path)) >= 50
+        assert replayer.lookup('stash', 'GET', '/item/0')['body'] == {'i': 0}
+
+
+if __name__ == '__main__':
+    test_recording_is_compressed_and_redacted()
+    test_replay_order_context_and_timing()
+    test_recordings_are_keyed_by_pr_under_review()
+    test_truncated_cassette_keeps_flushed_recordings()
+    print("✅ Traffic recorder tests passed")